@@ -0,0 +1,240 @@
+"""Command latency and throughput against simulated BMCs
+
+Drives the command layer (FanControl, SensorPoller, FleetRunner) against
+local simulated BMCs with configurable network latency and loss, reports
+p50/p95/p99 per scenario and writes the results as JSON:
+
+    python benchmarks/commands.py --latency 0.002 --loss 0.01 --label v0.1.3
+    python benchmarks/commands.py --compare benchmarks/results/v0.1.3.json
+
+Scenarios: single zone write, preset (two zone writes), the same preset
+repeated (elided by the state cache), sensor poll, and fleet preset
+fan-out at 1/10/100/1000 hosts. The lan backend talks RMCP+
+over UDP; the openipmi backend goes through its ioctl path against a fake
+/dev/ipmi0; the simulated backend calls the BMC in-process, which
+isolates the overhead of the command layer itself.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fan_lord.config import DEFAULT_CONFIG  # noqa: E402
+from fan_lord.core import FanControl  # noqa: E402
+from fan_lord.fleet import FleetHost, FleetRunner, percentile  # noqa: E402
+from fan_lord.lan import LanBackend  # noqa: E402
+from fan_lord.openipmi import OpenIPMIBackend  # noqa: E402
+from fan_lord.sensors import SensorPoller  # noqa: E402
+from fan_lord.simulator import (  # noqa: E402
+    FakeIPMIDevice,
+    SimulatedBackend,
+    SimulatedBMC,
+    SimulatorServer,
+)
+
+FLEET_SIZES = (1, 10, 100, 1000)
+
+
+def stats(samples, unit="ms"):
+    return {
+        "n": len(samples),
+        "p50": round(percentile(samples, 0.50), 3),
+        "p95": round(percentile(samples, 0.95), 3),
+        "p99": round(percentile(samples, 0.99), 3),
+        "mean": round(sum(samples) / len(samples), 3),
+        "max": round(max(samples), 3),
+        "unit": unit,
+    }
+
+
+def measure(operation, iterations, warmup=5):
+    """Milliseconds per call of operation()"""
+    for _ in range(warmup):
+        operation()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def wait_all(pending):
+    for command in pending:
+        result = command.wait()
+        if not result.ok:
+            raise result.error
+
+
+def bench_backend(name, backend, args, results):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["command_log"]["enabled"] = False
+    control = FanControl(config, backend=backend)
+    duty = iter(range(10**9))
+    try:
+        results[f"{name}/single_write"] = stats(
+            measure(lambda: wait_all([control.set_duty(0, 30 + next(duty) % 70)]), args.iterations)
+        )
+        presets = iter(["silent", "performance"] * args.iterations)
+        results[f"{name}/preset"] = stats(
+            measure(lambda: wait_all(control.apply_preset(next(presets))), args.iterations)
+        )
+        # Same preset again, answered by the state cache
+        results[f"{name}/preset_repeat"] = stats(
+            measure(lambda: wait_all(control.apply_preset("silent")), args.iterations)
+        )
+        poller = SensorPoller(backend, cache_dir=os.path.join(args.home, "sdr-cache"))
+        results[f"{name}/sensor_poll"] = stats(measure(poller.poll_once, args.iterations))
+    finally:
+        control.close()
+
+
+def bench_fleet(server, size, args, results):
+    hosts = []
+    for _ in range(size):
+        host, port = server.add(SimulatedBMC())
+        hosts.append(FleetHost(host, port, "ADMIN", "ADMIN"))
+    runner = FleetRunner(
+        hosts,
+        max_workers=args.fleet_workers,
+        host_timeout=args.fleet_host_timeout,
+        request_timeout=args.timeout,
+    )
+    host_latencies = []
+    wall = []
+    failed = 0
+    for run in range(args.fleet_runs):
+        start = time.perf_counter()
+        fleet_results = runner.apply_preset("silent" if run % 2 else "performance")
+        wall.append((time.perf_counter() - start) * 1000)
+        host_latencies.extend(r.latency * 1000 for r in fleet_results if r.ok)
+        failed += sum(not r.ok for r in fleet_results)
+    results[f"fleet/{size}/host"] = stats(host_latencies)
+    results[f"fleet/{size}/total"] = stats(wall)
+    results[f"fleet/{size}/total"]["failed"] = failed
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{'scenario':<26} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, s in results.items():
+        print(
+            f"{name:<26} {s['n']:>6} {s['p50']:>9.3f} {s['p95']:>9.3f} "
+            f"{s['p99']:>9.3f} {s['max']:>9.3f} {s['unit']}"
+        )
+
+
+def compare(base, results, threshold):
+    """Print p50/p95 changes against a previous run, returns the regressions"""
+    regressions = []
+    print(f"\n{'scenario':<26} {'base p95':>10} {'p95':>10} {'change':>8}")
+    for name, s in results.items():
+        old = base["results"].get(name)
+        if old is None or not old["p95"]:
+            continue
+        change = (s["p95"] - old["p95"]) / old["p95"] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<26} {old['p95']:>10.3f} {s['p95']:>10.3f} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.0, help="one-way reply delay in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of datagrams dropped")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=0.2, help="request timeout before a retry")
+    parser.add_argument("--backends", default="lan,openipmi,simulated")
+    parser.add_argument("--fleet-sizes", default=",".join(map(str, FLEET_SIZES)))
+    parser.add_argument("--fleet-runs", type=int, default=5)
+    parser.add_argument("--fleet-workers", type=int, default=DEFAULT_CONFIG["fleet_workers"])
+    parser.add_argument("--fleet-host-timeout", type=float, default=DEFAULT_CONFIG["fleet_host_timeout"])
+    parser.add_argument("--label", help="name of the result file, defaults to the git revision")
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/<label>.json")
+    parser.add_argument("--compare", help="previous result file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="p95 regression in percent")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        args.home = home
+        os.environ["FAN_LORD_HOME"] = home
+        with SimulatorServer(args.latency, args.loss, args.seed) as server:
+            for name in args.backends.split(","):
+                if name == "lan":
+                    host, port = server.add(SimulatedBMC())
+                    backend = LanBackend(
+                        host, "ADMIN", "ADMIN", port=port, timeout=args.timeout, keepalive_interval=0
+                    )
+                elif name == "openipmi":
+                    device = FakeIPMIDevice(SimulatedBMC())
+                    backend = OpenIPMIBackend(
+                        "/dev/ipmi0", open_device=device.open, ioctl=device.ioctl
+                    )
+                elif name == "simulated":
+                    backend = SimulatedBackend(SimulatedBMC())
+                else:
+                    parser.error(f"unknown backend {name}")
+                bench_backend(name, backend, args, results)
+            for size in map(int, args.fleet_sizes.split(",")):
+                if size:
+                    bench_fleet(server, size, args, results)
+
+    revision = git_revision()
+    label = args.label or revision or "local"
+    report = {
+        "label": label,
+        "revision": revision,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            key: getattr(args, key)
+            for key in ("latency", "loss", "seed", "iterations", "timeout", "fleet_runs", "fleet_workers")
+        },
+        "results": results,
+    }
+    print_results(results)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{label}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base["params"] != report["params"]:
+            print("Note: parameters differ from the compared run")
+        if compare(base, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Refresh cost of the fleet dashboard table
+
+Fills the dashboard model with --hosts hosts, shows it sorted by the
+hottest temperature, then applies --rounds refreshes in which every
+host changed and times each batch including the repaint. Exits with
+status 1 if the median batch takes longer than --budget-ms.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/dashboard.py --hosts 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import Qt  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from fan_lord.dashboard import HostStatus  # noqa: E402
+from fan_lord.fleet import FleetHost  # noqa: E402
+from fan_lord.gui.dashboard import COLUMNS, HostFilterProxy, HostTableModel, host_table  # noqa: E402
+
+
+def refresh(statuses, rng):
+    for status in statuses:
+        status.mode = rng.choice((0, 1))
+        status.duties = {0: rng.randint(30, 100), 1: rng.randint(30, 100)}
+        status.hottest = ("CPU Temp", rng.randint(35, 90))
+        status.error = "Timeout" if rng.random() < 0.01 else None
+        status.updated = time.time()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--budget-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    rng = random.Random(args.seed)
+    statuses = [HostStatus(FleetHost(f"10.0.{i // 250}.{i % 250 + 1}")) for i in range(args.hosts)]
+    refresh(statuses, rng)
+    model = HostTableModel(COLUMNS)
+    proxy = HostFilterProxy()
+    proxy.setSourceModel(model)
+    view = host_table(proxy)
+    view.sortByColumn(COLUMNS.index("hottest"), Qt.SortOrder.DescendingOrder)
+    view.resize(1000, 700)
+    view.show()
+
+    start = time.perf_counter()
+    model.set_statuses(statuses)
+    app.processEvents()
+    print(f"load {args.hosts} rows: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    times = []
+    for _ in range(args.rounds):
+        refresh(statuses, rng)
+        start = time.perf_counter()
+        model.apply_updates(statuses)
+        app.processEvents()
+        # Offscreen, processEvents() does not paint: draw the rows once
+        view.viewport().repaint()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    median = times[len(times) // 2]
+    print(f"refresh all rows: median {median:.1f} ms, max {times[-1]:.1f} ms")
+
+    start = time.perf_counter()
+    proxy.set_text("10.0.7.")
+    app.processEvents()
+    print(f"filter: {(time.perf_counter() - start) * 1000:.1f} ms, {proxy.rowCount()} rows shown")
+    return 1 if median > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Time of a subnet discovery sweep against simulated BMCs
+
+Binds --bmcs simulated BMCs spread over a loopback /16, sweeps the whole
+/16 with Presence Pings and reports how long it took and what was found.
+Exits with status 1 if the sweep takes longer than --budget seconds or
+misses a BMC.
+
+    python benchmarks/discovery.py --bmcs 500 --rate 10000
+"""
+import argparse
+import ipaddress
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fan_lord.discovery import SubnetScanner, count_targets, expand_targets  # noqa: E402
+from fan_lord.simulator import SimulatedBMC, SimulatorServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--network", default="127.66.0.0/16", help="a loopback range")
+    parser.add_argument("--port", type=int, default=6623)
+    parser.add_argument("--bmcs", type=int, default=500)
+    parser.add_argument("--rate", type=int, default=10000, help="probes per second")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=30.0, help="seconds")
+    args = parser.parse_args()
+
+    network = ipaddress.ip_network(args.network)
+    step = max(1, (network.num_addresses - 2) // args.bmcs)
+    server = SimulatorServer()
+    expected = set()
+    for i in range(args.bmcs):
+        address = str(network.network_address + 1 + i * step)
+        expected.add(server.add(SimulatedBMC(), address, args.port))
+    with server:
+        scanner = SubnetScanner(rate=args.rate, timeout=args.timeout, retries=args.retries)
+        start = time.perf_counter()
+        responders = scanner.scan(expand_targets([args.network], [args.port]))
+        elapsed = time.perf_counter() - start
+    found = {(r.host, r.port) for r in responders}
+    identified = sum(1 for r in responders if r.ipmi_v2 is not None)
+    print(f"addresses:  {count_targets([args.network])}, {args.bmcs} BMCs")
+    print(f"sweep:      {elapsed:.1f} s, {scanner.sent} probes sent, {scanner.received} replies")
+    print(f"found:      {len(found)}, identified {identified}, missed {len(expected - found)}")
+    if elapsed > args.budget or expected - found:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
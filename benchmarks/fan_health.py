@@ -0,0 +1,75 @@
+"""Time of one fleet fan health pass
+
+Builds --hosts boards with --fans fans and --window poll cycles of
+RPM and duty, plants a few worn fans and times analyze(). Exits with
+status 1 if a pass takes longer than --budget-ms or misses a worn fan.
+
+    python benchmarks/fan_health.py --hosts 1000 --fans 8 --window 60
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fan_lord.fan_health import FanSamples, fan_zone  # noqa: E402
+
+
+def build(hosts, fans, window, models, worn, seed):
+    rng = np.random.default_rng(seed)
+    names = [f"FAN{i + 1}" for i in range(fans - 2)] + ["FANA", "FANB"]
+    samples = FanSamples(window)
+    # RPM per percent duty of each fan slot, per model
+    nominal = rng.uniform(18, 35, (models, fans))
+    planted = {(int(h), int(f)) for h, f in zip(rng.integers(0, hosts, worn), rng.integers(0, fans, worn))}
+    # FANB shares the peripheral zone with FANA, make sure it wears too
+    planted.add((int(rng.integers(0, hosts)), names.index("FANB")))
+    for _ in range(window):
+        duties = rng.integers(30, 100, (hosts, 2))
+        noise = rng.normal(1.0, 0.03, (hosts, fans))
+        cycle = {}
+        for h in range(hosts):
+            model = h % models
+            rpms = {}
+            for f, name in enumerate(names):
+                zone = fan_zone(name)
+                wear = 0.7 if (h, f) in planted else 1.0
+                rpms[name] = float(nominal[model, f] * duties[h, zone] * noise[h, f] * wear)
+            cycle[f"host{h}"] = (f"model{model}", rpms, {0: int(duties[h, 0]), 1: int(duties[h, 1])})
+        samples.add_cycle(cycle)
+    return samples, {(f"host{h}", names[f]) for h, f in planted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--fans", type=int, default=8)
+    parser.add_argument("--window", type=int, default=60, help="poll cycles")
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--worn", type=int, default=10, help="fans planted 30%% slow")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    samples, planted = build(args.hosts, args.fans, args.window, args.models, args.worn, args.seed)
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        suspects = samples.analyze()
+        times.append((time.perf_counter() - start) * 1000)
+    median = sorted(times)[len(times) // 2]
+    found = {(s.host, s.fan) for s in suspects}
+    print(f"fans:           {args.hosts * args.fans} x {args.window} samples")
+    print(f"analyze median: {median:.1f} ms (max {max(times):.1f})")
+    print(f"suspects:       {len(found)}, planted {len(planted)}, missed {len(planted - found)}")
+    if median > args.budget_ms or planted - found:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
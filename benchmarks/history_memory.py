@@ -0,0 +1,92 @@
+"""Memory and redraw cost of the sensor history
+
+Feeds --days of samples at --interval seconds into History for --sensors
+sensors and reports bytes per sensor after the first day and at the end,
+next to a list of (timestamp, value) tuples holding one day of samples.
+Exits with status 1 if memory kept growing after the first day or a
+sensor needs more than --budget-kb.
+
+    python benchmarks/history_memory.py --sensors 16 --days 7
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fan_lord.history import History  # noqa: E402
+
+DAY = 86400
+
+
+def feed(history, names, start, end, interval):
+    t = start
+    while t < end:
+        for n, name in enumerate(names):
+            history.add(name, t, 40 + 20 * math.sin(t / 3600 + n))
+        t += interval
+
+
+def series_cost(history, name, now, span, points, repeat=20):
+    """Median seconds to fetch a chart series"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        series = history.series(name, now - span, points)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2], len(series[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=16)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--points", type=int, default=800, help="chart width in pixels")
+    parser.add_argument("--budget-kb", type=float, default=128)
+    args = parser.parse_args()
+
+    names = [f"sensor{n}" for n in range(args.sensors)]
+    start = 1_700_000_000.0
+
+    tracemalloc.start()
+    history = History(args.interval)
+    feed(history, names, start, start + DAY, args.interval)
+    first_day = tracemalloc.get_traced_memory()[0]
+    feed(history, names, start + DAY, start + args.days * DAY, args.interval)
+    final = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    samples = [(start + i * args.interval, 40.0 + i % 7) for i in range(int(DAY / args.interval))]
+    naive = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del samples
+
+    per_sensor = final / args.sensors / 1024
+    print(f"sensors:            {args.sensors}, {args.days} days at {args.interval:g} s")
+    print(f"history per sensor: {first_day / args.sensors / 1024:.1f} KiB after 1 day, "
+          f"{per_sensor:.1f} KiB after {args.days} days (arrays: {history.nbytes / args.sensors / 1024:.1f} KiB)")
+    print(f"list of tuples:     {naive / 1024:.1f} KiB per sensor per day")
+
+    now = start + args.days * DAY
+    for label, span in (("1h", 3600), ("24h", DAY), ("7d", 7 * DAY), ("30d", 30 * DAY)):
+        seconds, count = series_cost(history, names[0], now, span, args.points)
+        print(f"series {label:>4}:        {count:5d} points in {seconds * 1e3:.2f} ms")
+
+    failed = False
+    # Allow some slack for the running buckets and dict growth
+    if final > first_day * 1.05 + 64 * 1024:
+        print("FAIL: memory kept growing after the first day")
+        failed = True
+    if per_sensor > args.budget_kb:
+        print(f"FAIL: {per_sensor:.1f} KiB per sensor over budget {args.budget_kb:g} KiB")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Application overhead of the command paths, measured on a replayed session
+
+Runs a fixed workload (presets, a slider drag, sensor polls and the
+temperature curve control loop) once against a simulated BMC over the
+LAN while recording the traffic, then again against the recording:
+
+- fast replay answers at once, so it measures only Fan Lord's own cost
+- realtime replay waits the recorded latency, so it should come out
+  close to the recorded run
+
+    python benchmarks/replay.py --latency 0.002
+    python benchmarks/replay.py --recording session.rec --profile replay.prof
+
+--recording reuses (or, when missing, creates) a recording so runs on
+different revisions replay identical traffic. --profile writes cProfile
+stats of the fast replay.
+"""
+import argparse
+import copy
+import cProfile
+import math
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fan_lord.config import DEFAULT_CONFIG  # noqa: E402
+from fan_lord.control import controller_from_config  # noqa: E402
+from fan_lord.core import FanControl  # noqa: E402
+from fan_lord.fleet import percentile  # noqa: E402
+from fan_lord.lan import LanBackend  # noqa: E402
+from fan_lord.recording import RecordingBackend, ReplayBackend  # noqa: E402
+from fan_lord.sensors import SensorPoller  # noqa: E402
+from fan_lord.simulator import SimulatedBMC, SimulatorServer  # noqa: E402
+
+SCENARIOS = ("preset", "slider_drag", "sensor_poll", "control_loop")
+
+
+def wait_all(pending):
+    for command in pending:
+        command.wait()
+
+
+def run_workload(backend, iterations, home, bmc=None):
+    """Milliseconds per iteration of each scenario
+
+    bmc, when given, gets a varying CPU temperature so the control loop
+    actually writes; replays see the same readings from the recording.
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["command_log"]["enabled"] = False
+    config["watchdog"]["interval"] = 0
+    config["sensor_interval"] = 0
+    control = FanControl(config, backend=backend)
+    poller = SensorPoller(control.backend, cache_dir=os.path.join(home, "sdr-cache"))
+    pending = []
+    controller = controller_from_config(
+        config["control"], lambda zone, duty: pending.append(control.set_duty(zone, duty))
+    )
+    samples = {name: [] for name in SCENARIOS}
+
+    def timed(name, operation):
+        start = time.perf_counter()
+        operation()
+        samples[name].append((time.perf_counter() - start) * 1000)
+
+    def drag():
+        # Slider moved through 20 positions; queued writes coalesce
+        wait_all([control.set_duty(1, 30 + (step * 3) % 60) for step in range(20)])
+
+    def control_step():
+        controller.on_readings(poller.poll_once())
+        wait_all(pending)
+        pending.clear()
+
+    try:
+        for i in range(iterations):
+            if bmc is not None:
+                bmc.temperatures["CPU Temp"] = 55 + 25 * math.sin(i / 5)
+            preset = "silent" if i % 2 else "performance"
+            timed("preset", lambda: wait_all(control.apply_preset(preset)))
+            timed("slider_drag", drag)
+            timed("sensor_poll", poller.poll_once)
+            timed("control_loop", control_step)
+    finally:
+        control.close()
+    return samples
+
+
+def record(path, args, home):
+    with SimulatorServer(args.latency, 0.0, args.seed) as server:
+        bmc = SimulatedBMC()
+        host, port = server.add(bmc)
+        lan = LanBackend(host, "ADMIN", "ADMIN", port=port, keepalive_interval=0)
+        backend = RecordingBackend(lan, path)
+        samples = run_workload(backend, args.iterations, home, bmc)
+        count = backend.writer.count
+    print(f"recorded {count} requests to {path} ({os.path.getsize(path)} bytes)")
+    return samples
+
+
+def print_row(label, samples):
+    for name in SCENARIOS:
+        values = samples[name]
+        print(
+            f"{label:<10} {name:<14} {percentile(values, 0.50):>9.3f} "
+            f"{percentile(values, 0.95):>9.3f} {sum(values):>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated one-way delay")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--recording", help="recording to replay, created if missing")
+    parser.add_argument("--realtime", action="store_true", help="also replay at recorded latency")
+    parser.add_argument("--profile", help="write cProfile stats of the fast replay here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["FAN_LORD_HOME"] = home
+        path = args.recording or os.path.join(home, "session.rec")
+        print(f"{'run':<10} {'scenario':<14} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10}")
+        if not os.path.exists(path):
+            print_row("recorded", record(path, args, home))
+
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler is not None:
+            profiler.enable()
+        fast = run_workload(ReplayBackend(path), args.iterations, home)
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        print_row("fast", fast)
+        if args.realtime:
+            print_row("realtime", run_workload(ReplayBackend(path, realtime=True), args.iterations, home))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
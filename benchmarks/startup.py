@@ -0,0 +1,93 @@
+"""Startup time of the headless command line
+
+Runs `python -m fan_lord set` against a local simulated BMC and reports the
+wall time and the import time of fan_lord.cli. Exits with status 1 if any
+Qt module is imported on the way, or if the median is over --budget-ms.
+
+    python benchmarks/startup.py --runs 20 --budget-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fan_lord.simulator import SimulatedBMC, SimulatorServer  # noqa: E402
+
+QT_PREFIXES = ("PyQt6", "PyQt5", "PySide6", "PySide2", "fan_lord.gui")
+
+
+def imported_modules(stderr):
+    """(module, cumulative microseconds) from -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules.append((name.strip(), int(cumulative)))
+    return modules
+
+
+def run_once(env, args):
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "fan_lord", *args],
+        env=env,
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"fan_lord {' '.join(args)} failed: {process.stderr[-500:]}")
+    return elapsed, imported_modules(process.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, help="fail if the median is slower")
+    args = parser.parse_args()
+
+    bmc = SimulatedBMC()
+    with SimulatorServer() as server, tempfile.TemporaryDirectory() as home:
+        host, port = server.add(bmc)
+        with open(os.path.join(home, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {"backend": "lan", "host": host, "port": port, "password": "ADMIN"}, f
+            )
+        env = dict(os.environ, FAN_LORD_HOME=home, PYTHONPATH=ROOT)
+
+        wall = []
+        imports = []
+        leaked = set()
+        for i in range(args.runs):
+            elapsed, modules = run_once(env, ["set", "--zone", "cpu", "--duty", str(30 + i % 10)])
+            wall.append(elapsed * 1000)
+            imports.extend(us / 1000 for name, us in modules if name == "fan_lord.cli")
+            leaked.update(name for name, _ in modules if name.startswith(QT_PREFIXES))
+
+    median = statistics.median(wall)
+    print(f"runs:           {args.runs}")
+    print(f"wall median:    {median:.1f} ms (min {min(wall):.1f}, max {max(wall):.1f})")
+    print(f"import fan_lord.cli: {statistics.median(imports):.1f} ms")
+
+    failed = False
+    if leaked:
+        print(f"FAIL: Qt imported by the headless path: {', '.join(sorted(leaked))}")
+        failed = True
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"FAIL: median {median:.1f} ms over budget {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
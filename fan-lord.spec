@@ -46,3 +46,48 @@ exe = EXE(
     icon='fan-lord.ico',  # 设置程序图标
     version='file_version_info.txt',  # 版本信息文件
 )
+
+# 命令行版本 fan-lord.exe: 不打包 Qt，保留控制台
+cli = Analysis(
+    ['fan_lord/__main__.py'],
+    pathex=['.'],
+    binaries=[],
+    datas=[
+        ('IPMICFG-Win.exe', '.'),
+        ('pmdll.dll', '.'),
+    ],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['PyQt6'],
+    win_no_prefer_redirects=False,
+    win_private_assemblies=False,
+    cipher=block_cipher,
+    noarchive=False,
+)
+
+cli_pyz = PYZ(cli.pure, cli.zipped_data, cipher=block_cipher)
+
+cli_exe = EXE(
+    cli_pyz,
+    cli.scripts,
+    cli.binaries,
+    cli.zipfiles,
+    cli.datas,
+    [],
+    name='fan-lord',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=True,
+    disable_windowed_traceback=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='fan-lord.ico',
+    version='file_version_info.txt',
+)
@@ -0,0 +1 @@
+"""Fan Lord core: IPMI transports and fan control logic shared by GUI and tools"""
@@ -0,0 +1,6 @@
+import sys
+
+# Absolute, so PyInstaller can build fan-lord.exe from this file as a script
+from fan_lord.cli import main
+
+sys.exit(main())
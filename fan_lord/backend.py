@@ -0,0 +1,141 @@
+"""Pluggable IPMI transports"""
+import os
+import re
+import subprocess
+import sys
+
+from .config import get_base_path
+from .ipmi import IPMIError, IPMITimeout
+
+HEX_BYTE = re.compile(r"\b[0-9a-fA-F]{2}\b")
+
+
+class Backend:
+    """Base class for IPMI transports
+
+    raw() sends one request and returns the response data with the
+    completion code already checked and stripped. exclusive backends are
+    the only writer to their BMC from this machine.
+    """
+
+    name = "base"
+    exclusive = True
+
+    def __init__(self):
+        self.host = "localhost"
+
+    def raw(self, request, timeout=None):
+        raise NotImplementedError
+
+    def raw_many(self, requests, timeout=None):
+        """Send several independent requests as one batch
+
+        Returns one entry per request: the response data, or the IPMIError
+        raised for it. Backends that can pipeline requests override this.
+        """
+        results = []
+        for request in requests:
+            try:
+                results.append(self.raw(request, timeout))
+            except IPMIError as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.host}>"
+
+
+def default_ipmicfg_path():
+    """Path of the bundled IPMICFG-Win.exe"""
+    return os.path.join(get_base_path(), "IPMICFG-Win.exe")
+
+
+class IPMICFGBackend(Backend):
+    """Runs the Supermicro IPMICFG tool once per request"""
+
+    name = "ipmicfg"
+
+    def __init__(self, exe_path=None):
+        super().__init__()
+        self.exe_path = exe_path or default_ipmicfg_path()
+
+    def raw(self, request, timeout=None):
+        args = [self.exe_path, "-raw"] + str(request).split()
+        # Don't flash a console window for every command
+        flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        try:
+            result = subprocess.run(
+                args,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                creationflags=flags,
+            )
+        except subprocess.TimeoutExpired:
+            raise IPMITimeout(f"IPMICFG timed out after {timeout}s")
+        except OSError as e:
+            raise IPMIError(f"Failed to run IPMICFG: {e}")
+        if result.returncode != 0:
+            raise IPMIError(result.stderr.strip() or result.stdout.strip())
+        return bytes(int(b, 16) for b in HEX_BYTE.findall(result.stdout))
+
+
+def default_backend():
+    """In-band backend of this platform"""
+    return "ipmicfg" if sys.platform == "win32" else "openipmi"
+
+
+def create_backend(config):
+    """Build the backend selected in the configuration
+
+    "replay" answers from a recording instead; "record" writes the traffic
+    of the selected backend to a recording.
+    """
+    if config.get("replay"):
+        from .recording import ReplayBackend
+
+        return ReplayBackend(config["replay"], realtime=config.get("replay_realtime", False))
+    backend = _create_transport(config)
+    if config.get("record"):
+        from .recording import RecordingBackend
+
+        backend = RecordingBackend(backend, config["record"])
+    return backend
+
+
+def _create_transport(config):
+    kind = config["backend"] or default_backend()
+    if kind == "ipmicfg":
+        return IPMICFGBackend(config.get("ipmicfg_path"))
+    if kind == "openipmi":
+        from .openipmi import OpenIPMIBackend
+
+        return OpenIPMIBackend(config.get("ipmi_device"), timeout=config["command_timeout"] or 5.0)
+    if kind == "daemon":
+        from .daemon import DaemonBackend
+
+        return DaemonBackend(config.get("daemon_address"))
+    if kind == "lan":
+        from .lan import LanBackend
+
+        return LanBackend(
+            config["host"],
+            username=config["username"],
+            password=config["password"],
+            port=config["port"],
+            cipher_suite=config["cipher_suite"],
+            timeout=config["timeout"],
+            retries=config["retries"],
+            keepalive_interval=config["keepalive_interval"],
+            session_timeout=config["session_timeout"],
+        )
+    raise ValueError(f"Unknown backend: {kind}")
@@ -0,0 +1,179 @@
+"""What a board supports: fan zones and OEM fan commands, probed once and cached
+
+X9, X10, X11 and X12 boards differ in how many fan zones they have and in
+which of the Supermicro fan commands their firmware answers. Probing reads
+only, never writes: the fan mode and the duty of every candidate zone are
+read in one batch, and a zone exists when its duty read succeeds.
+
+The result is cached on disk by BMC GUID and re-probed only when the
+firmware revision changes. The last result per host is kept as well, so
+the GUI can lay out its sliders before the BMC has answered at all.
+"""
+import json
+import os
+
+from .config import get_data_dir
+from .ipmi import (
+    CPU_ZONE,
+    PERIPHERAL_ZONE,
+    IPMIError,
+    get_device_id_request,
+    get_duty_request,
+    get_fan_mode_request,
+    get_system_guid_request,
+)
+
+# Zones 0x00-0x07 are probed; Supermicro boards use at most four
+PROBE_ZONES = 8
+DEFAULT_ZONES = (CPU_ZONE, PERIPHERAL_ZONE)
+
+
+class BoardCapabilities:
+    """Identity of a board and the fan zones and commands it answers"""
+
+    def __init__(
+        self,
+        manufacturer=0,
+        product=0,
+        firmware="",
+        guid="",
+        zones=DEFAULT_ZONES,
+        fan_mode=True,
+        duty_readback=True,
+        probed=False,
+    ):
+        self.manufacturer = manufacturer
+        self.product = product
+        # "1.73"; together with the GUID decides whether to re-probe
+        self.firmware = firmware
+        self.guid = guid
+        self.zones = tuple(zones)
+        # Whether Get Fan Mode and reading back zone duties are supported
+        self.fan_mode = fan_mode
+        self.duty_readback = duty_readback
+        # False for the defaults assumed before a board was ever probed
+        self.probed = probed
+
+    @property
+    def model(self):
+        """Manufacturer and product ID, as in SDRRepository.identity"""
+        return f"{self.manufacturer:06x}-{self.product:04x}"
+
+    def to_dict(self):
+        data = dict(self.__dict__)
+        data["zones"] = list(self.zones)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        return f"<BoardCapabilities {self.model} fw {self.firmware} zones={list(self.zones)}>"
+
+
+def parse_device_id(response):
+    """(manufacturer, product, firmware) from a Get Device ID response"""
+    if len(response) < 11:
+        raise IPMIError("Truncated Get Device ID response")
+    major = response[2] & 0x7F
+    # The minor revision is BCD
+    firmware = f"{major}.{response[3]:02x}"
+    manufacturer = response[6] | response[7] << 8 | response[8] << 16
+    product = response[9] | response[10] << 8
+    return manufacturer, product, firmware
+
+
+def probe(backend, timeout=None):
+    """(zones, fan mode supported, duty readback supported) of a board
+
+    A board that answers no duty read at all is assumed to have the
+    usual CPU and peripheral zones.
+    """
+    zones = range(PROBE_ZONES)
+    responses = backend.raw_many(
+        [get_fan_mode_request()] + [get_duty_request(zone) for zone in zones], timeout
+    )
+    mode = responses[0]
+    found = [
+        zone
+        for zone, response in zip(zones, responses[1:])
+        if not isinstance(response, IPMIError) and response
+    ]
+    fan_mode = not isinstance(mode, IPMIError)
+    if not found:
+        return DEFAULT_ZONES, fan_mode, False
+    return tuple(found), fan_mode, True
+
+
+class CapabilityCache:
+    """Board capabilities of one BMC, from the on-disk cache when current"""
+
+    def __init__(self, backend, cache_dir=None):
+        self.backend = backend
+        self.cache_dir = cache_dir or os.path.join(get_data_dir(), "capabilities")
+        # How often the board had to be probed
+        self.probes = 0
+
+    def last(self):
+        """Capabilities last seen at this host without asking the BMC, defaults if none"""
+        data = self._read(self._host_path())
+        if data is None:
+            return BoardCapabilities()
+        return BoardCapabilities.from_dict(data)
+
+    def load(self, timeout=None, refresh=False):
+        """Identify the board, probing it only if unknown, its firmware changed or refresh"""
+        device, guid = self.backend.raw_many(
+            [get_device_id_request(), get_system_guid_request()], timeout
+        )
+        if isinstance(device, IPMIError):
+            raise device
+        if isinstance(guid, IPMIError):
+            # Not every BMC implements Get System GUID
+            guid = b""
+        manufacturer, product, firmware = parse_device_id(device)
+        key = guid.hex() or f"{manufacturer:06x}-{product:04x}-{self.backend.host}"
+
+        data = self._read(self._path(key))
+        if not refresh and data is not None and data.get("firmware") == firmware:
+            capabilities = BoardCapabilities.from_dict(data)
+        else:
+            self.probes += 1
+            zones, fan_mode, duty_readback = probe(self.backend, timeout)
+            capabilities = BoardCapabilities(
+                manufacturer,
+                product,
+                firmware,
+                guid.hex(),
+                zones,
+                fan_mode,
+                duty_readback,
+                probed=True,
+            )
+            self._write(self._path(key), capabilities)
+        if self._read(self._host_path()) != capabilities.to_dict():
+            self._write(self._host_path(), capabilities)
+        return capabilities
+
+    def _path(self, key):
+        safe = "".join(c if c.isalnum() or c in "-." else "_" for c in key)
+        return os.path.join(self.cache_dir, f"{safe}.json")
+
+    def _host_path(self):
+        port = getattr(self.backend, "port", 623)
+        host = self.backend.host if port == 623 else f"{self.backend.host}:{port}"
+        return self._path(f"host-{host}")
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, capabilities):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(capabilities.to_dict(), f)
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,347 @@
+"""Command line interface, usable from cron, scripts and service managers
+
+    python -m fan_lord set --zone cpu --duty 40
+    python -m fan_lord preset silent
+    python -m fan_lord auto
+    python -m fan_lord sensors
+    python -m fan_lord capabilities
+    python -m fan_lord events
+    python -m fan_lord daemon
+    python -m fan_lord daemon --serve
+    python -m fan_lord fleet-health hosts.json --interval 60
+    python -m fan_lord discover 10.0.0.0/16 --output hosts.json
+
+Never imports Qt, so it starts quickly and runs without a desktop session.
+"""
+import argparse
+import signal
+import sys
+import threading
+import time
+
+from .config import load_config
+from .core import FanControl, parse_zone
+from .ipmi import IPMIError
+from .presets import PRESETS
+from .sensors import SensorPoller
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fan-lord", description="Supermicro fan control")
+    parser.add_argument("--config", help="path of config.json")
+    parser.add_argument(
+        "--backend", choices=("ipmicfg", "openipmi", "lan", "daemon"), help="override the backend"
+    )
+    parser.add_argument("--host", help="BMC address for the lan backend")
+    parser.add_argument("--port", type=int, help="BMC port for the lan backend")
+    parser.add_argument("--username", help="BMC user for the lan backend")
+    parser.add_argument("--record", metavar="FILE", help="record BMC traffic to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="answer from a recording, no BMC")
+    parser.add_argument(
+        "--realtime", action="store_true", help="replay at the recorded latency"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    set_parser = commands.add_parser("set", help="set the duty cycle of a fan zone")
+    set_parser.add_argument("--zone", required=True, help="cpu, peripheral or a zone number")
+    set_parser.add_argument("--duty", required=True, type=int, help="duty cycle in percent")
+
+    preset_parser = commands.add_parser("preset", help="apply a preset to all zones")
+    preset_parser.add_argument("name", choices=sorted(PRESETS))
+
+    commands.add_parser("auto", help="hand the fans back to the BMC")
+    commands.add_parser("sensors", help="print fan and temperature readings")
+    commands.add_parser("events", help="print fan and temperature events since the last run")
+    capabilities_parser = commands.add_parser(
+        "capabilities", help="print the board's fan zones and supported commands"
+    )
+    capabilities_parser.add_argument(
+        "--probe", action="store_true", help="probe the board even if it is cached"
+    )
+
+    daemon_parser = commands.add_parser(
+        "daemon", help="follow the temperature curve until stopped"
+    )
+    daemon_parser.add_argument(
+        "--interval", type=float, help="seconds between sensor polls"
+    )
+    daemon_parser.add_argument(
+        "--keep", action="store_true", help="leave the last duties set on exit"
+    )
+    daemon_parser.add_argument(
+        "--serve", action="store_true", help="let the GUI and scripts share this BMC session"
+    )
+    daemon_parser.add_argument("--address", help="socket or pipe to serve on")
+    daemon_parser.add_argument(
+        "--manual", action="store_true", help="don't follow the temperature curve"
+    )
+    health_parser = commands.add_parser(
+        "fleet-health", help="rank fans spinning slower than their siblings"
+    )
+    health_parser.add_argument("inventory", help="fleet inventory, JSON or host[:port] lines")
+    health_parser.add_argument(
+        "--interval", type=float, default=0, help="seconds between polls, 0 polls once"
+    )
+    health_parser.add_argument(
+        "--window", type=int, default=60, help="poll cycles compared"
+    )
+    health_parser.add_argument(
+        "--deficit", type=float, default=0.2, help="flag fans this much slower (0-1)"
+    )
+    discover_parser = commands.add_parser(
+        "discover", help="find BMCs on subnets with RMCP Presence Ping"
+    )
+    discover_parser.add_argument("networks", nargs="+", help="CIDR ranges or addresses")
+    discover_parser.add_argument(
+        "--ports", default="623", help="UDP ports to probe, e.g. 623 or 6230-6239"
+    )
+    discover_parser.add_argument("--rate", type=int, help="probes per second")
+    discover_parser.add_argument("--timeout", type=float, help="seconds to wait for a reply")
+    discover_parser.add_argument("--retries", type=int, help="resends to silent addresses")
+    discover_parser.add_argument(
+        "--output", metavar="FILE", help="add the BMCs found to this inventory"
+    )
+    return parser
+
+
+def config_from_args(args):
+    config = load_config(args.config)
+    for key in ("backend", "host", "port", "username", "record", "replay"):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    if args.realtime:
+        config["replay_realtime"] = True
+    return config
+
+
+def wait_all(pending):
+    """Wait for queued commands, raises the first error"""
+    for command in pending:
+        result = command.wait()
+        if not result.ok:
+            raise result.error
+
+
+def print_event(event, out):
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.timestamp))
+    print(f"{when} {event.description}", file=out, flush=True)
+
+
+def print_capabilities(fan_control, args, out):
+    capabilities = fan_control.load_capabilities(refresh=args.probe)
+    supported = {True: "supported", False: "not supported"}
+    print(f"{'Board':<14} {capabilities.model}", file=out)
+    print(f"{'Firmware':<14} {capabilities.firmware}", file=out)
+    print(f"{'GUID':<14} {capabilities.guid or 'N/A'}", file=out)
+    print(f"{'Fan zones':<14} {', '.join(str(z) for z in capabilities.zones)}", file=out)
+    print(f"{'Fan mode':<14} {supported[capabilities.fan_mode]}", file=out)
+    print(f"{'Duty readback':<14} {supported[capabilities.duty_readback]}", file=out)
+
+
+def run_daemon(fan_control, args, out):
+    if args.interval:
+        fan_control.config["sensor_interval"] = args.interval
+    if not fan_control.config["sensor_interval"] and not args.manual:
+        raise ValueError("The daemon needs sensor_interval > 0")
+    stop = threading.Event()
+    for name in ("SIGINT", "SIGTERM"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), lambda *_: stop.set())
+
+    def log_duties(duties):
+        for zone, duty in duties.items():
+            print(f"zone {zone}: {duty}%", file=out, flush=True)
+
+    def log_error(error):
+        print(f"sensor read failed: {error}", file=sys.stderr, flush=True)
+
+    def log_events(events):
+        for event in events:
+            print_event(event, out)
+
+    def log_events_error(error):
+        print(f"event log read failed: {error}", file=sys.stderr, flush=True)
+
+    def log_event(event):
+        print(
+            f"zone {event.zone}: {event.kind}, target {event.target}%, BMC has {event.actual}%",
+            file=out,
+            flush=True,
+        )
+
+    def log_breaker(breaker):
+        print(f"BMC {breaker.name}: {breaker.state}", file=sys.stderr, flush=True)
+
+    def log_board(capabilities):
+        zones = ", ".join(str(zone) for zone in capabilities.zones)
+        print(
+            f"board {capabilities.model} firmware {capabilities.firmware}, fan zones {zones}",
+            file=out,
+            flush=True,
+        )
+
+    fan_control.breaker.add_listener(log_breaker)
+    fan_control.discover(log_board)
+    fan_control.start_events(log_events, log_events_error)
+    server = fan_control.start_metrics()
+    if server is not None:
+        print(f"metrics at http://{server.address}:{server.port}/metrics", file=sys.stderr)
+    fan_control.add_curve_listener(log_duties)
+    fan_control.set_curve(not args.manual)
+    fan_control.start_sensors(error_callback=log_error)
+    fan_control.start_watchdog(log_event)
+    daemon = None
+    if args.serve:
+        from .daemon import DaemonServer
+
+        daemon = DaemonServer(fan_control, args.address or fan_control.config["daemon_address"])
+        daemon.start()
+        print(f"serving on {daemon.address}", file=sys.stderr, flush=True)
+    try:
+        stop.wait()
+    finally:
+        if daemon is not None:
+            daemon.stop()
+    fan_control.set_curve(False)
+    if not args.keep:
+        wait_all([fan_control.auto()])
+    if fan_control.state_cache is not None:
+        stats = fan_control.state_cache.stats()
+        print(
+            f"state cache: {stats['hits']} writes skipped, {stats['misses']} sent",
+            file=out,
+        )
+
+
+def run_fleet_health(config, args, out):
+    # NumPy is only needed here
+    from .fan_health import FleetFanHealth
+    from .fleet import FleetRunner, load_inventory
+    from .resilience import retry_policy
+
+    hosts = load_inventory(
+        args.inventory, {"username": config["username"], "password": config["password"]}
+    )
+    runner = FleetRunner(
+        hosts,
+        max_workers=config["fleet_workers"],
+        host_timeout=config["fleet_host_timeout"],
+        request_timeout=config["timeout"],
+        retries=config["retries"],
+        retry=retry_policy(config["resilience"]),
+    )
+    health = FleetFanHealth(runner, args.window, deficit=args.deficit)
+    stop = threading.Event()
+    for name in ("SIGINT", "SIGTERM"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), lambda *_: stop.set())
+    while True:
+        results = health.poll()
+        failed = sum(1 for r in results if not r.ok)
+        suspects = health.analyze()
+        print(
+            f"{len(results) - failed}/{len(results)} hosts read, {len(suspects)} suspect fans",
+            file=out,
+            flush=True,
+        )
+        for s in suspects:
+            print(
+                f"  {s.host:<24} {s.fan:<8} {s.deficit:>4.0%} slow "
+                f"({s.efficiency:.0f} RPM/% vs {s.expected:.0f}, model {s.model})",
+                file=out,
+                flush=True,
+            )
+        if not args.interval or stop.wait(args.interval):
+            return
+
+
+def run_discover(config, args, out):
+    from .discovery import (
+        SubnetScanner,
+        count_targets,
+        expand_targets,
+        merge_inventory,
+        parse_ports,
+    )
+
+    ports = parse_ports(args.ports)
+    options = dict(config["discovery"])
+    for key in ("rate", "timeout", "retries"):
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+    targets = expand_targets(args.networks, ports)
+    print(f"probing {count_targets(args.networks, ports)} addresses", file=out, flush=True)
+    scanner = SubnetScanner(**options)
+    for name in ("SIGINT", "SIGTERM"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), lambda *_: scanner.cancel())
+    started = time.monotonic()
+    responders = scanner.scan(targets)
+    for r in responders:
+        if r.ipmi_v2 is None:
+            auth = "no authentication capabilities"
+        else:
+            auth = "IPMI 2.0" if r.ipmi_v2 else "IPMI 1.5"
+            if r.auth_types:
+                auth += f", {'/'.join(r.auth_types)}"
+        print(f"  {r.host + ':' + str(r.port):<24} {r.latency * 1000:6.1f} ms  {auth}", file=out)
+    print(
+        f"{len(responders)} BMCs found in {time.monotonic() - started:.1f} s "
+        f"({scanner.sent} probes sent)",
+        file=out,
+    )
+    if args.output:
+        defaults = {"username": config["username"], "password": config["password"]}
+        added = merge_inventory(args.output, responders, defaults)
+        print(f"{added} new hosts added to {args.output}", file=out)
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    fleet_commands = {"fleet-health": run_fleet_health, "discover": run_discover}
+    if args.command in fleet_commands:
+        try:
+            fleet_commands[args.command](config_from_args(args), args, out)
+        except (OSError, ValueError) as e:
+            print(f"fan-lord: {e}", file=sys.stderr)
+            return 1
+        return 0
+    try:
+        fan_control = FanControl(config_from_args(args))
+    except ValueError as e:
+        print(f"fan-lord: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.command in ("set", "preset") and fan_control.watchdog is not None:
+            # Look up the board so writes respect its learned duty floors
+            fan_control.watchdog.identify()
+        if args.command == "set":
+            wait_all([fan_control.set_duty(parse_zone(args.zone), args.duty)])
+        elif args.command == "preset":
+            try:
+                # Cover every zone of the board, from the cache unless the firmware changed
+                fan_control.load_capabilities()
+            except IPMIError:
+                pass
+            wait_all(fan_control.apply_preset(args.name))
+        elif args.command == "auto":
+            wait_all([fan_control.auto()])
+        elif args.command == "sensors":
+            for reading in SensorPoller(fan_control.backend).poll_once():
+                value = f"{reading.value:g} {reading.unit}" if reading.available else "N/A"
+                print(f"{reading.name:<20} {value}", file=out)
+        elif args.command == "events":
+            for event in fan_control.events().poll_once():
+                print_event(event, out)
+        elif args.command == "capabilities":
+            print_capabilities(fan_control, args, out)
+        elif args.command == "daemon":
+            run_daemon(fan_control, args, out)
+    except (IPMIError, ValueError) as e:
+        print(f"fan-lord: {e}", file=sys.stderr)
+        return 1
+    finally:
+        fan_control.close()
+    return 0
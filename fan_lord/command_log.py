@@ -0,0 +1,61 @@
+"""JSON-lines logs rotated by size: every executed IPMI command, BMC events"""
+import json
+import logging
+import logging.handlers
+import os
+
+from .config import get_data_dir
+
+
+def result_record(result):
+    """One log line for a CommandResult"""
+    request = result.request
+    error = result.error
+    latency = result.latency
+    return {
+        "time": round(result.submitted, 3),
+        "host": result.host,
+        "netfn": request.netfn,
+        "command": request.command,
+        "data": request.data.hex(),
+        "latency_ms": None if latency is None else round(latency * 1000, 3),
+        "ok": result.ok,
+        "response": None if result.response is None else result.response.hex(),
+        "error": None if error is None else str(error),
+        "completion_code": getattr(error, "completion_code", None),
+    }
+
+
+class JsonLinesLog:
+    """Appends one JSON object per line to a file rotated at max_bytes
+
+    `backups` old files are kept (name.1, name.2, ...), so the log never
+    grows without bound.
+    """
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        self.handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+        )
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, data):
+        message = json.dumps(data, separators=(",", ":"))
+        self.handler.handle(logging.makeLogRecord({"msg": message, "levelno": logging.INFO}))
+
+    def close(self):
+        self.handler.close()
+
+
+class CommandLog(JsonLinesLog):
+    """Appends one JSON object per executed command to commands.jsonl
+
+    Add log.record as a CommandExecutor listener.
+    """
+
+    def __init__(self, path=None, max_bytes=5 * 1024 * 1024, backups=3):
+        super().__init__(path or os.path.join(get_data_dir(), "commands.jsonl"), max_bytes, backups)
+
+    def record(self, result):
+        self.write(result_record(result))
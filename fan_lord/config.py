@@ -0,0 +1,194 @@
+"""Configuration file and data directory helpers"""
+import json
+import os
+import sys
+
+DEFAULT_CONFIG = {
+    # ipmicfg: bundled IPMICFG-Win.exe, openipmi: Linux kernel driver
+    # (/dev/ipmi0), lan: persistent RMCP+ session, daemon: a running
+    # "fan_lord daemon --serve"; None picks ipmicfg on Windows and
+    # openipmi elsewhere
+    "backend": None,
+    "ipmicfg_path": None,
+    # None uses fan-lord.sock in $XDG_RUNTIME_DIR or the data directory,
+    # \\.\pipe\fan-lord on Windows
+    "daemon_address": None,
+    # None uses the first of /dev/ipmi0, /dev/ipmi/0, /dev/ipmidev/0
+    "ipmi_device": None,
+    # Write all BMC traffic to this recording file, or answer from one
+    # instead of a BMC (at the recorded latency with replay_realtime)
+    "record": None,
+    "replay": None,
+    "replay_realtime": False,
+    "host": None,
+    "port": 623,
+    "username": "ADMIN",
+    "password": "",
+    # None picks the strongest cipher suite available
+    "cipher_suite": None,
+    "timeout": 1.0,
+    "retries": 2,
+    "keepalive_interval": 30,
+    "session_timeout": 60,
+    # Budget for one command including time spent queued, in seconds
+    "command_timeout": 5.0,
+    # Maximum writes per second per zone while dragging a slider in live mode
+    "live_rate": 4,
+    # Fleet operations: hosts handled at once and time budget per host
+    "fleet_workers": 64,
+    "fleet_host_timeout": 5.0,
+    # Fleet dashboard: seconds between polls of every host, and how long
+    # host updates are gathered before the table is refreshed
+    "dashboard_interval": 5.0,
+    "dashboard_flush_ms": 250,
+    # Seconds between sensor polls, 0 disables polling
+    "sensor_interval": 5.0,
+    # Seconds between checks whether the cached SDR repository is still current
+    "sdr_refresh": 600,
+    # Seconds a confirmed duty/mode is trusted to skip identical writes, 0 disables
+    "state_cache_ttl": 30,
+    # Read back zone duties every interval seconds (0 disables) and re-apply
+    # them when the BMC overrides; after `retries` overrides of the same duty
+    # the zone floor is raised by floor_step and remembered per board
+    "watchdog": {
+        "interval": 3.0,
+        "retries": 2,
+        "floor_step": 5,
+        "max_backoff": 60.0,
+    },
+    # Idempotent fan writes and read-backs that got no answer are retried
+    # up to `attempts` times with jittered exponential backoff (base_delay
+    # doubling up to max_delay) within command_timeout; after
+    # failure_threshold unanswered requests in a row a BMC gets no commands
+    # for reset_timeout seconds, then one probe decides whether to resume
+    "resilience": {
+        "attempts": 3,
+        "base_delay": 0.1,
+        "max_delay": 1.0,
+        "failure_threshold": 3,
+        "reset_timeout": 10.0,
+    },
+    # Prometheus endpoint at http://address:port/metrics, port 0 disables
+    "metrics": {
+        "address": "127.0.0.1",
+        "port": 0,
+    },
+    # Lines kept in the window's status log
+    "status_log_lines": 1000,
+    # JSON-lines log of every command in the data directory, rotated by size
+    "command_log": {
+        "enabled": True,
+        "max_bytes": 5 * 1024 * 1024,
+        "backups": 3,
+    },
+    # Read new System Event Log entries every interval seconds (0 disables);
+    # fan and temperature events go to the status log and to events.jsonl
+    # in the data directory, rotated like the command log
+    "sel": {
+        "interval": 30.0,
+        "max_bytes": 1024 * 1024,
+        "backups": 3,
+    },
+    # Subnet discovery: probes sent per second, probes awaiting a reply at
+    # once, seconds to wait for a reply and resends to silent addresses
+    "discovery": {
+        "rate": 10000,
+        "window": 16384,
+        "timeout": 1.0,
+        "retries": 1,
+    },
+    # Sensor history kept in memory: raw samples for raw_seconds, then
+    # per-minute and per-hour min/max/mean buckets
+    "history": {
+        "raw_seconds": 3600,
+        "minutes": 1440,
+        "hours": 720,
+    },
+    # Raise a zone ahead of the temperature when the host load jumps: gain
+    # duty points per unit of load above a baseline that catches up with
+    # the load in time_constant seconds. Load is the higher of /proc/stat
+    # CPU utilization and RAPL package power / tdp (None reads the power
+    # limit); Linux only, and only useful when Fan Lord runs on the server
+    "feed_forward": {
+        "enabled": False,
+        "zone": 0,
+        "gain": 30,
+        "time_constant": 60,
+        "max_boost": 50,
+        "tdp": None,
+    },
+    # Temperature driven fan control, each zone uses a "curve" of
+    # [temperature, duty] points or a "pid" section with a setpoint
+    "control": {
+        "hysteresis_up": 1,
+        "hysteresis_down": 5,
+        "failsafe_duty": 100,
+        "zones": {
+            "cpu": {
+                "zone": 0,
+                "sensors": ["CPU Temp"],
+                "curve": [[40, 30], [60, 45], [75, 75], [85, 100]],
+            },
+            "peripheral": {
+                "zone": 1,
+                "sensors": ["System Temp", "Peripheral Temp"],
+                "curve": [[35, 30], [50, 50], [65, 100]],
+            },
+        },
+    },
+}
+
+
+def get_base_path():
+    """Directory holding bundled resources (IPMICFG-Win.exe, icons)"""
+    if getattr(sys, "frozen", False):
+        # If running as executable
+        return sys._MEIPASS
+    # If running as Python script
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_config_dir():
+    """Per-user configuration directory"""
+    if os.environ.get("FAN_LORD_HOME"):
+        return os.environ["FAN_LORD_HOME"]
+    if sys.platform == "win32":
+        root = os.environ.get("APPDATA", os.path.expanduser("~"))
+    else:
+        root = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+    return os.path.join(root, "fan-lord")
+
+
+def get_data_dir():
+    """Per-user directory for caches and logs, created on demand"""
+    if os.environ.get("FAN_LORD_HOME"):
+        path = os.environ["FAN_LORD_HOME"]
+    elif sys.platform == "win32":
+        root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        path = os.path.join(root, "fan-lord")
+    else:
+        root = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share"))
+        path = os.path.join(root, "fan-lord")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_config_path():
+    """Location of config.json, overridable with FAN_LORD_CONFIG"""
+    return os.environ.get("FAN_LORD_CONFIG") or os.path.join(
+        get_config_dir(), "config.json"
+    )
+
+
+def load_config(path=None):
+    """Load config.json on top of the defaults"""
+    config = dict(DEFAULT_CONFIG)
+    path = path or get_config_path()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                # Sections are merged so a partial section keeps the other defaults
+                if isinstance(value, dict) and isinstance(config.get(key), dict):
+                    value = {**config[key], **value}
+                config[key] = value
+    return config
@@ -0,0 +1,303 @@
+"""Closed-loop fan control driven by temperatures"""
+import bisect
+import math
+
+from .sdr import SENSOR_TYPE_TEMPERATURE
+
+
+class FanCurve:
+    """Piecewise linear temperature -> duty mapping, flat beyond the end points"""
+
+    def __init__(self, points):
+        if not points:
+            raise ValueError("A fan curve needs at least one point")
+        points = sorted((float(t), float(d)) for t, d in points)
+        self.temperatures = [t for t, _ in points]
+        self.duties = [d for _, d in points]
+
+    def __call__(self, temperature, dt=None):
+        i = bisect.bisect_right(self.temperatures, temperature)
+        if i == 0:
+            return self.duties[0]
+        if i == len(self.temperatures):
+            return self.duties[-1]
+        t0, t1 = self.temperatures[i - 1], self.temperatures[i]
+        d0, d1 = self.duties[i - 1], self.duties[i]
+        return d0 + (d1 - d0) * (temperature - t0) / (t1 - t0)
+
+    def reset(self):
+        pass
+
+
+class PIDController:
+    """PID loop holding a temperature setpoint
+
+    A positive error (too hot) raises the duty. The integral is clamped so
+    it can't wind up while the output sits at a limit, and the derivative
+    acts on the measurement to avoid kicks when the setpoint changes.
+    """
+
+    def __init__(self, setpoint, kp=4.0, ki=0.1, kd=0.0, min_duty=30, max_duty=100):
+        self.setpoint = setpoint
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.min_duty = min_duty
+        self.max_duty = max_duty
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_temperature = None
+
+    def __call__(self, temperature, dt=1.0):
+        error = temperature - self.setpoint
+        derivative = 0.0
+        if self.last_temperature is not None and dt:
+            derivative = (temperature - self.last_temperature) / dt
+        self.last_temperature = temperature
+
+        output = self.min_duty + self.kp * error + self.ki * self.integral + self.kd * derivative
+        # Only integrate while that doesn't push the output further past a limit
+        if (output < self.max_duty or error < 0) and (output > self.min_duty or error > 0):
+            self.integral += error * (dt or 0.0)
+            output = self.min_duty + self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(self.min_duty, min(self.max_duty, output))
+
+
+class Hysteresis:
+    """Lets a new duty through only when it moved far enough
+
+    Increases of at least `up` points pass immediately so the fans react to
+    heat right away; decreases need at least `down` points, which keeps the
+    fans from hunting around a temperature boundary.
+    """
+
+    def __init__(self, up=1, down=5):
+        self.up = up
+        self.down = down
+
+    def __call__(self, current, target):
+        if current is None or target >= current + self.up or target <= current - self.down:
+            return target
+        return current
+
+
+class LoadFeedForward:
+    """Extra duty for a rise in host load, before the temperature follows
+
+    The boost is gain points per unit of load above a moving baseline that
+    follows the load with time_constant seconds. A burst raises the duty
+    at once; while it lasts the baseline catches up and the boost decays
+    smoothly, by which time the temperature curve has taken over. A falling
+    load gives no negative boost.
+    """
+
+    def __init__(self, gain=30, time_constant=60, max_boost=50):
+        self.gain = gain
+        self.time_constant = time_constant
+        self.max_boost = max_boost
+        self.reset()
+
+    def reset(self):
+        self.baseline = None
+        self.boost = 0.0
+
+    def __call__(self, load, dt=1.0):
+        if load is None:
+            self.boost = 0.0
+            return self.boost
+        if self.baseline is None:
+            self.baseline = load
+        self.boost = min(self.max_boost, self.gain * max(0.0, load - self.baseline))
+        if self.time_constant:
+            self.baseline += (load - self.baseline) * (1 - math.exp(-(dt or 0.0) / self.time_constant))
+        else:
+            self.baseline = load
+        return self.boost
+
+
+class ZoneControl:
+    """Policy for one fan zone: which sensors feed it and how they map to duty
+
+    feed_forward, when set, adds a boost for rising host load on top of the
+    temperature policy.
+    """
+
+    def __init__(self, zone, sensors, policy, min_duty=30, max_duty=100, feed_forward=None):
+        self.zone = zone
+        self.sensors = list(sensors)
+        self.policy = policy
+        self.min_duty = min_duty
+        self.max_duty = max_duty
+        self.feed_forward = feed_forward
+
+    def reset(self):
+        self.policy.reset()
+        if self.feed_forward is not None:
+            self.feed_forward.reset()
+
+    def target(self, temperatures, dt, load=None):
+        """Duty for the hottest of the zone's sensors, None if none is readable"""
+        values = [temperatures[name] for name in self.sensors if temperatures.get(name) is not None]
+        if not values:
+            return None
+        duty = self.policy(max(values), dt)
+        if self.feed_forward is not None:
+            duty += self.feed_forward(load, dt)
+        return int(round(max(self.min_duty, min(self.max_duty, duty))))
+
+
+class FanController:
+    """Turns temperatures into zone duty cycles
+
+    write(zone, duty) is only called when a zone's target passes the
+    hysteresis filter, so a steady temperature costs no BMC writes. If the
+    sensors of a zone can't be read the zone falls back to failsafe_duty.
+    load_source() is sampled once per poll for zones with a feed-forward.
+    """
+
+    def __init__(self, zones, write, hysteresis=None, failsafe_duty=100, load_source=None):
+        self.zones = list(zones)
+        self.write = write
+        self.hysteresis = hysteresis or Hysteresis()
+        self.failsafe_duty = failsafe_duty
+        self.load_source = load_source
+        # Zone -> last duty written
+        self.duties = {}
+        self.writes = 0
+        self.last_timestamp = None
+
+    def reset(self):
+        """Forget written duties so the next step writes every zone"""
+        self.duties = {}
+        self.last_timestamp = None
+        for zone in self.zones:
+            zone.reset()
+
+    def step(self, temperatures, dt=1.0, load=None):
+        """Run one control step, returns {zone: duty} for the zones written"""
+        written = {}
+        for zone in self.zones:
+            target = zone.target(temperatures, dt, load)
+            if target is None:
+                target = self.failsafe_duty
+            current = self.duties.get(zone.zone)
+            duty = self.hysteresis(current, target)
+            if duty != current:
+                self.write(zone.zone, duty)
+                self.duties[zone.zone] = duty
+                self.writes += 1
+                written[zone.zone] = duty
+        return written
+
+    def on_readings(self, readings):
+        """SensorPoller listener: step with the temperatures of a poll"""
+        temperatures = {
+            r.name: r.value for r in readings if r.sensor_type == SENSOR_TYPE_TEMPERATURE
+        }
+        timestamp = max((r.timestamp for r in readings), default=None)
+        dt = 1.0
+        if self.last_timestamp is not None and timestamp is not None:
+            dt = max(0.0, timestamp - self.last_timestamp)
+        self.last_timestamp = timestamp
+        load = self.load_source() if self.load_source is not None else None
+        return self.step(temperatures, dt, load)
+
+
+class LoadBoost:
+    """Feed-forward on top of a duty set by hand
+
+    While a base duty is set (a slider or preset), every sensor poll
+    writes base + the feed-forward boost for the host load, through the
+    hysteresis filter like the curve. clear() stops boosting, e.g. while
+    the temperature curve runs, which applies its own feed-forward.
+    """
+
+    def __init__(self, zone, feed_forward, load_source, write, hysteresis=None, max_duty=100):
+        self.zone = zone
+        self.feed_forward = feed_forward
+        self.load_source = load_source
+        self.write = write
+        self.hysteresis = hysteresis or Hysteresis()
+        self.max_duty = max_duty
+        self.base = None
+        self.duty = None
+        self.last_timestamp = None
+
+    def set_base(self, duty):
+        """Duty chosen by hand, returns the duty to write now"""
+        self.base = duty
+        # Keep the boost of the last poll until the next one
+        self.duty = int(round(min(self.max_duty, duty + self.feed_forward.boost)))
+        return self.duty
+
+    def clear(self):
+        self.base = None
+        self.duty = None
+        self.last_timestamp = None
+        self.feed_forward.reset()
+
+    def on_readings(self, readings):
+        """SensorPoller listener"""
+        if self.base is None:
+            return None
+        timestamp = max((r.timestamp for r in readings), default=None)
+        dt = 1.0
+        if self.last_timestamp is not None and timestamp is not None:
+            dt = max(0.0, timestamp - self.last_timestamp)
+        self.last_timestamp = timestamp
+        boost = self.feed_forward(self.load_source(), dt)
+        target = int(round(min(self.max_duty, self.base + boost)))
+        duty = self.hysteresis(self.duty, target)
+        if duty == self.duty:
+            return None
+        self.duty = duty
+        self.write(self.zone, duty)
+        return duty
+
+
+def feed_forward_from_config(config):
+    """LoadFeedForward of the "feed_forward" section, None if disabled"""
+    if not config["enabled"]:
+        return None
+    return LoadFeedForward(config["gain"], config["time_constant"], config["max_boost"])
+
+
+def controller_from_config(config, write, feed_forward=None, load_source=None):
+    """Build a FanController from the "control" section of the configuration
+
+    feed_forward is the "feed_forward" section; when enabled its zone
+    also follows load_source().
+    """
+    zones = []
+    for zone in config["zones"].values():
+        if "pid" in zone:
+            policy = PIDController(
+                min_duty=zone.get("min_duty", 30),
+                max_duty=zone.get("max_duty", 100),
+                **zone["pid"],
+            )
+        else:
+            policy = FanCurve(zone["curve"])
+        zones.append(
+            ZoneControl(
+                zone["zone"],
+                zone["sensors"],
+                policy,
+                min_duty=zone.get("min_duty", 30),
+                max_duty=zone.get("max_duty", 100),
+                feed_forward=(
+                    feed_forward_from_config(feed_forward)
+                    if feed_forward and zone["zone"] == feed_forward["zone"]
+                    else None
+                ),
+            )
+        )
+    return FanController(
+        zones,
+        write,
+        Hysteresis(config["hysteresis_up"], config["hysteresis_down"]),
+        failsafe_duty=config["failsafe_duty"],
+        load_source=load_source,
+    )
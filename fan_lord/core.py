@@ -0,0 +1,322 @@
+"""Fan control session shared by the GUI, the command line and the daemon"""
+import os
+import threading
+
+from .backend import create_backend
+from .capabilities import CapabilityCache
+from .command_log import CommandLog, JsonLinesLog
+from .config import get_data_dir
+from .control import Hysteresis, LoadBoost, controller_from_config, feed_forward_from_config
+from .executor import CommandExecutor
+from .history import History
+from .hostload import HostLoad
+from .ipmi import (
+    CPU_ZONE,
+    FAN_MODE_FULL,
+    PERIPHERAL_ZONE,
+    IPMIError,
+    set_duty_request,
+    set_fan_mode_request,
+)
+from .metrics import FanMetrics, MetricsServer
+from .presets import preset_duties
+from .resilience import CircuitBreaker, ResilientBackend, retry_policy
+from .sel import SelPoller, event_record
+from .sensors import SensorPoller
+from .state_cache import CachingBackend, StateCache
+from .watchdog import DutyWatchdog
+
+ZONES = {"cpu": CPU_ZONE, "peripheral": PERIPHERAL_ZONE}
+
+
+def parse_zone(value):
+    """Zone number from a name ("cpu", "peripheral") or a number"""
+    if isinstance(value, str) and value.lower() in ZONES:
+        return ZONES[value.lower()]
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Unknown zone: {value}") from None
+
+
+class FanControl:
+    """Owns the BMC backend, command executor, sensor poller and fan curve
+
+    Commands run on the executor's worker thread; writes to the same zone
+    replace each other while queued. callback(result) is called for every
+    executed command, curve_callback({zone: duty}) whenever the temperature
+    curve changes a duty. Every request goes through a circuit breaker, so
+    an unresponsive BMC fails commands at once instead of after a timeout.
+
+    A backend that is not exclusive (the daemon) is shared with other
+    clients: its duties are not cached or watched here, and duty writes of
+    other clients reach the curve listeners too.
+
+    capabilities holds the board's fan zones as last seen at this host
+    until discover() has asked the BMC.
+    """
+
+    def __init__(self, config, callback=None, backend=None):
+        self.config = config
+        self.backend = backend or create_backend(config)
+        exclusive = self.backend.exclusive
+        resilience = config["resilience"]
+        self.breaker = CircuitBreaker(
+            self.backend.host, resilience["failure_threshold"], resilience["reset_timeout"]
+        )
+        self.backend = ResilientBackend(self.backend, self.breaker, retry_policy(resilience))
+        self.state_cache = None
+        if config["state_cache_ttl"] and exclusive:
+            # Skip writes of a duty or mode the BMC already has
+            self.state_cache = StateCache(config["state_cache_ttl"])
+            self.backend = CachingBackend(self.backend, self.state_cache)
+        self.capability_cache = CapabilityCache(self.backend)
+        self.capabilities = self.capability_cache.last()
+        self.executor = CommandExecutor(
+            self.backend, timeout=config["command_timeout"], callback=callback
+        )
+        self.command_log = None
+        if config["command_log"]["enabled"]:
+            self.command_log = CommandLog(
+                max_bytes=config["command_log"]["max_bytes"],
+                backups=config["command_log"]["backups"],
+            )
+            self.executor.add_listener(self.command_log.record)
+        # Set up by start_metrics(), only the GUI and the daemon serve metrics
+        self.metrics = None
+        self.metrics_server = None
+        self.host_load = None
+        self.load_boost = None
+        feed_forward = config["feed_forward"]
+        if feed_forward["enabled"]:
+            # One load reader: the curve samples it while it runs, the boost otherwise
+            self.host_load = HostLoad(feed_forward["tdp"])
+            control = config["control"]
+            self.load_boost = LoadBoost(
+                feed_forward["zone"],
+                feed_forward_from_config(feed_forward),
+                self.host_load,
+                self._write_duty,
+                Hysteresis(control["hysteresis_up"], control["hysteresis_down"]),
+            )
+        self.controller = controller_from_config(
+            config["control"], self._write_curve_duty, feed_forward, self.host_load
+        )
+        self.curve_listeners = []
+        self.curve_enabled = False
+        self.poller = None
+        self.sel_poller = None
+        self.event_log = None
+        self.history = None
+        self.watchdog = None
+        if config["watchdog"]["interval"] and exclusive:
+            self.watchdog = DutyWatchdog(self.backend, self._submit_duty, **config["watchdog"])
+        if not exclusive:
+            self.backend.add_duty_listener(self._on_shared_duties)
+
+    def submit(self, request, key=None, timeout=None, callback=None):
+        """Queue a request; timeout overrides command_timeout for this command"""
+        return self.executor.submit(request, key=key, timeout=timeout, callback=callback)
+
+    def set_duty(self, zone, duty, timeout=None, callback=None):
+        """Queue a duty cycle write, replacing any queued write to the same zone
+
+        The duty is raised to the floor learned for this board, if any, and
+        boosted while the host load rises when feed_forward is enabled.
+        """
+        if self.load_boost is not None and zone == self.load_boost.zone and not self.curve_enabled:
+            duty = self.load_boost.set_base(duty)
+        return self._write_duty(zone, duty, timeout, callback)
+
+    def _write_duty(self, zone, duty, timeout=None, callback=None):
+        if self.watchdog is not None:
+            duty = self.watchdog.set_target(zone, duty)
+        return self._submit_duty(zone, duty, timeout, callback)
+
+    def _submit_duty(self, zone, duty, timeout=None, callback=None):
+        return self.submit(
+            set_duty_request(zone, duty), key=("duty", zone), timeout=timeout, callback=callback
+        )
+
+    def apply_preset(self, name, callback=None):
+        """Queue the zone writes of a preset, returns the pending commands
+
+        Covers the fan zones of the board as far as they are known.
+        """
+        return [
+            self.set_duty(zone, duty, callback=callback)
+            for zone, duty in preset_duties(name, self.capabilities.zones).items()
+        ]
+
+    def auto(self, callback=None):
+        """Hand the fans back to the BMC"""
+        if self.watchdog is not None:
+            self.watchdog.clear()
+        if self.load_boost is not None:
+            self.load_boost.clear()
+        return self.submit(set_fan_mode_request(FAN_MODE_FULL), key=("mode",), callback=callback)
+
+    def load_capabilities(self, refresh=False):
+        """Identify the board and its fan zones
+
+        Only probes the board when it is unknown, its firmware changed or
+        refresh is set.
+        """
+        self.capabilities = self.capability_cache.load(self.config["command_timeout"], refresh)
+        return self.capabilities
+
+    def discover(self, callback=None, error_callback=None):
+        """load_capabilities() on a background thread
+
+        callback(capabilities) is called once they are known,
+        error_callback(error) if the BMC didn't answer.
+        """
+
+        def run():
+            try:
+                capabilities = self.load_capabilities()
+            except IPMIError as e:
+                if error_callback is not None:
+                    error_callback(e)
+                return
+            if callback is not None:
+                callback(capabilities)
+
+        thread = threading.Thread(target=run, name="capability-discovery", daemon=True)
+        thread.start()
+        return thread
+
+    def start_sensors(self, callback=None, error_callback=None):
+        """Start polling sensors, returns None if polling is disabled"""
+        interval = self.config["sensor_interval"]
+        if not interval:
+            return None
+        self.history = History(interval, **self.config["history"])
+        if hasattr(self.backend, "sensor_feed"):
+            # The daemon pushes its own poller's readings
+            self.poller = self.backend.sensor_feed(self.history.on_readings, error_callback)
+        else:
+            self.poller = SensorPoller(
+                self.backend,
+                interval=interval,
+                sdr_refresh=self.config["sdr_refresh"],
+                callback=self.history.on_readings,
+                error_callback=error_callback,
+            )
+        if callback is not None:
+            self.poller.add_listener(callback)
+        if self.metrics is not None:
+            self.poller.add_listener(self.metrics.on_readings)
+        if self.load_boost is not None:
+            self.poller.add_listener(self.load_boost.on_readings)
+        if self.curve_enabled:
+            self.poller.add_listener(self.controller.on_readings)
+        return self.poller.start()
+
+    def events(self):
+        """The SEL poller; every event it finds is appended to events.jsonl"""
+        if self.sel_poller is None:
+            sel = self.config["sel"]
+            self.event_log = JsonLinesLog(
+                os.path.join(get_data_dir(), "events.jsonl"), sel["max_bytes"], sel["backups"]
+            )
+            self.sel_poller = SelPoller(
+                self.backend, interval=sel["interval"], callback=self._log_events
+            )
+        return self.sel_poller
+
+    def start_events(self, callback=None, error_callback=None):
+        """Start reading new SEL entries, returns None if disabled
+
+        callback(events) gets the fan and temperature events of each pass
+        that found new ones.
+        """
+        if not self.config["sel"]["interval"]:
+            return None
+        poller = self.events()
+        poller.error_callback = error_callback
+        if callback is not None:
+            poller.add_listener(callback)
+        return poller.start()
+
+    def _log_events(self, events):
+        for event in events:
+            self.event_log.write(event_record(event, self.backend.host))
+
+    def start_watchdog(self, callback=None):
+        """Start reading back duties, returns None if the watchdog is disabled"""
+        if self.watchdog is None:
+            return None
+        if callback is not None:
+            self.watchdog.add_listener(callback)
+        return self.watchdog.start()
+
+    def add_curve_listener(self, callback):
+        self.curve_listeners.append(callback)
+
+    def set_curve(self, enabled):
+        """Start or stop following the temperature curve on every sensor poll"""
+        if enabled == self.curve_enabled:
+            return
+        self.curve_enabled = enabled
+        if self.load_boost is not None:
+            # The curve has its own feed-forward; a slider or preset sets a new base
+            self.load_boost.clear()
+        if self.poller is None:
+            return
+        if enabled:
+            # Write every zone on the next poll
+            self.controller.reset()
+            self.poller.add_listener(self.controller.on_readings)
+        else:
+            self.poller.remove_listener(self.controller.on_readings)
+
+    def _write_curve_duty(self, zone, duty):
+        # Runs on the sensor poller thread
+        self._write_duty(zone, duty)
+        for listener in self.curve_listeners:
+            listener({zone: duty})
+
+    def _on_shared_duties(self, duties):
+        # Runs on the daemon client's reader thread
+        for listener in self.curve_listeners:
+            listener(duties)
+
+    def start_metrics(self):
+        """Serve Prometheus metrics if "metrics" has a port, returns the MetricsServer
+
+        For long-running modes only: one-shot commands leave the port to the
+        GUI or daemon that serves it. Raises ValueError if the port is taken.
+        """
+        address, port = self.config["metrics"]["address"], self.config["metrics"]["port"]
+        if not port or self.metrics_server is not None:
+            return self.metrics_server
+        metrics = FanMetrics(self.backend.host, self.executor, self.state_cache, self.breaker)
+        try:
+            self.metrics_server = MetricsServer(metrics.registry, address, port).start()
+        except OSError as e:
+            raise ValueError(f"Cannot serve metrics on {address}:{port}: {e}") from None
+        self.metrics = metrics
+        self.executor.add_listener(metrics.on_result)
+        if self.poller is not None:
+            self.poller.add_listener(metrics.on_readings)
+        return self.metrics_server
+
+    def close(self):
+        """Stop polling, finish queued commands and release the BMC session"""
+        if self.poller is not None:
+            self.poller.stop()
+            self.poller = None
+        if self.sel_poller is not None:
+            self.sel_poller.stop()
+            self.sel_poller = None
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        self.executor.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.backend.close()
+        if self.command_log is not None:
+            self.command_log.close()
+        if self.event_log is not None:
+            self.event_log.close()
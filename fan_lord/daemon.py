@@ -0,0 +1,529 @@
+"""Local daemon owning the BMC session, shared by the GUI, CLI and scripts
+
+    python -m fan_lord daemon --serve
+    python -m fan_lord --backend daemon preset silent
+
+The daemon listens on a Unix socket (a named pipe on Windows) through
+multiprocessing.connection, authenticated with a per-user key in the data
+directory. Messages are JSON objects. Requests carry an id and get one
+reply with the same id:
+
+    {"id": 1, "op": "raw", "netfn": 48, "command": 112, "data": "66010028"}
+    {"id": 2, "op": "set_duty", "zone": 0, "duty": 40}
+    {"id": 3, "op": "preset", "name": "silent"}
+    {"id": 4, "op": "auto"}
+    {"id": 5, "op": "state"}
+
+Every client's commands go through the daemon's single executor, so they
+are serialized and queued writes to the same zone coalesce. Clients are
+pushed events instead of polling the BMC themselves: "state" on connect,
+then "duties", "mode", "readings", "command", "watchdog" and "breaker".
+"""
+import itertools
+import json
+import os
+import sys
+import threading
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from .backend import Backend
+from .command_log import result_record
+from .config import get_data_dir
+from .executor import CommandCancelled
+from .ipmi import IPMIError, IPMITimeout, Request
+from .resilience import CircuitOpen
+from .sdr import SensorRecord
+from .sensors import SensorReading
+from .state_cache import classify
+
+ERRORS = {
+    "IPMITimeout": IPMITimeout,
+    "CommandCancelled": CommandCancelled,
+    "CircuitOpen": CircuitOpen,
+}
+
+
+def default_address():
+    if sys.platform == "win32":
+        return r"\\.\pipe\fan-lord"
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or get_data_dir(), "fan-lord.sock")
+
+
+def address_family(address):
+    return "AF_PIPE" if address.startswith("\\\\") else "AF_UNIX"
+
+
+def load_authkey(create=False):
+    """The key clients prove they belong to the daemon's user with"""
+    path = os.path.join(get_data_dir(), "daemon.key")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        if not create:
+            raise
+    key = os.urandom(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def encode_readings(readings):
+    return [
+        {"record": r.record.to_dict(), "value": r.value, "timestamp": r.timestamp}
+        for r in readings
+    ]
+
+
+def decode_readings(data):
+    return [
+        SensorReading(SensorRecord.from_dict(r["record"]), r["value"], r["timestamp"])
+        for r in data
+    ]
+
+
+def error_reply(error):
+    return {
+        "ok": False,
+        "error": str(error),
+        "error_type": type(error).__name__,
+        "completion_code": getattr(error, "completion_code", None),
+    }
+
+
+def result_reply(result):
+    if result.ok:
+        return {"ok": True, "response": result.response.hex()}
+    return error_reply(result.error)
+
+
+def reply_error(reply):
+    """The IPMIError a failed reply stands for"""
+    error_type = ERRORS.get(reply.get("error_type"), IPMIError)
+    if error_type is IPMIError:
+        return IPMIError(reply["error"], reply.get("completion_code"))
+    return error_type(reply["error"])
+
+
+class _Peer:
+    """One connection, sends are serialized"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, message):
+        data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            if self.closed:
+                return False
+            try:
+                self.conn.send_bytes(data)
+                return True
+            except (OSError, ValueError):
+                self.closed = True
+                return False
+
+    def receive(self):
+        return json.loads(self.conn.recv_bytes())
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.conn.close()
+
+
+class DaemonServer:
+    """Accepts local clients and runs their commands on a FanControl
+
+    Start sensors (and the watchdog) on fan_control before start() so
+    their results are pushed to clients.
+    """
+
+    def __init__(self, fan_control, address=None):
+        self.fan_control = fan_control
+        self.address = address or default_address()
+        self.family = address_family(self.address)
+        self.clients = []
+        self.duties = {}
+        self.mode = None
+        self.readings = []
+        self.lock = threading.Lock()
+        self.listener = None
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self.family == "AF_UNIX" and os.path.exists(self.address):
+            try:
+                Client(self.address, self.family, authkey=load_authkey()).close()
+            except (OSError, EOFError, AuthenticationError):
+                # Left behind by a daemon that did not shut down cleanly
+                os.unlink(self.address)
+            else:
+                raise ValueError(f"A daemon is already listening on {self.address}")
+        self.listener = Listener(self.address, self.family, authkey=load_authkey(create=True))
+        if self.family == "AF_UNIX":
+            os.chmod(self.address, 0o600)
+        fan_control = self.fan_control
+        fan_control.executor.add_listener(self._on_result)
+        fan_control.breaker.add_listener(self._on_breaker)
+        if fan_control.poller is not None:
+            fan_control.poller.add_listener(self._on_readings)
+        if fan_control.watchdog is not None:
+            fan_control.watchdog.add_listener(self._on_watchdog)
+        self._thread = threading.Thread(target=self._accept_loop, name="daemon-accept", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self.listener is None:
+            return
+        self._stopping = True
+        try:
+            # accept() does not return when the listener is closed under it
+            Client(self.address, self.family, authkey=load_authkey()).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+        self._thread.join()
+        self.listener.close()
+        self.listener = None
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.close()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "host": self.fan_control.backend.host,
+                "duties": {str(zone): duty for zone, duty in self.duties.items()},
+                "mode": self.mode,
+                "readings": self.readings,
+                "curve": self.fan_control.curve_enabled,
+            }
+
+    def broadcast(self, event):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.send(event)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._stopping:
+                    return
+                continue
+            if self._stopping:
+                conn.close()
+                return
+            client = _Peer(conn)
+            client.send({"event": "state", **self.snapshot()})
+            with self.lock:
+                self.clients.append(client)
+            threading.Thread(
+                target=self._serve_client, args=(client,), name="daemon-client", daemon=True
+            ).start()
+
+    def _serve_client(self, client):
+        try:
+            while not client.closed:
+                self._handle(client, client.receive())
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            client.close()
+
+    def _handle(self, client, message):
+        message_id = message.get("id")
+
+        def reply(result):
+            client.send({"id": message_id, **result_reply(result)})
+
+        fan_control = self.fan_control
+        op = message.get("op")
+        try:
+            if op == "raw":
+                self._submit_raw(
+                    Request(message["netfn"], message["command"], bytes.fromhex(message.get("data", ""))),
+                    message.get("timeout"),
+                    reply,
+                )
+            elif op == "set_duty":
+                fan_control.set_duty(int(message["zone"]), int(message["duty"]), callback=reply)
+            elif op == "preset":
+                self._apply_preset(message["name"], lambda r: client.send({"id": message_id, **r}))
+            elif op == "auto":
+                fan_control.auto(callback=reply)
+            elif op == "state":
+                client.send({"id": message_id, "ok": True, **self.snapshot()})
+            else:
+                raise ValueError(f"Unknown op: {op}")
+        except (KeyError, TypeError, ValueError) as e:
+            client.send({"id": message_id, **error_reply(IPMIError(f"Bad request: {e}"))})
+
+    def _submit_raw(self, request, timeout, callback):
+        fan_control = self.fan_control
+        kind = classify(request)
+        if kind is not None and kind[2] is not None:
+            if kind[0] == "duty":
+                # Same path as local writes: duty floors, watchdog target, coalescing
+                fan_control.set_duty(kind[1], kind[2], timeout, callback)
+                return
+            if fan_control.watchdog is not None:
+                fan_control.watchdog.clear()
+            fan_control.submit(request, key=("mode",), timeout=timeout, callback=callback)
+            return
+        fan_control.submit(request, timeout=timeout, callback=callback)
+
+    def _apply_preset(self, name, send):
+        results = []
+        lock = threading.Lock()
+        pending = None
+
+        def done(result):
+            with lock:
+                results.append(result)
+                if len(results) < len(pending):
+                    return
+            errors = [r.error for r in results if not r.ok]
+            send(error_reply(errors[0]) if errors else {"ok": True})
+
+        pending = self.fan_control.apply_preset(name, callback=done)
+
+    def _on_result(self, result):
+        self.broadcast({"event": "command", **result_record(result)})
+        kind = classify(result.request)
+        if not result.ok or kind is None or kind[2] is None:
+            return
+        target, zone, value = kind
+        with self.lock:
+            if target == "duty":
+                self.duties[zone] = value
+            else:
+                self.mode = value
+        if target == "duty":
+            self.broadcast({"event": "duties", "duties": {str(zone): value}})
+        else:
+            self.broadcast({"event": "mode", "mode": value})
+
+    def _on_readings(self, readings):
+        encoded = encode_readings(readings)
+        with self.lock:
+            self.readings = encoded
+        self.broadcast({"event": "readings", "readings": encoded})
+
+    def _on_watchdog(self, event):
+        self.broadcast({"event": "watchdog", **vars(event)})
+
+    def _on_breaker(self, breaker):
+        self.broadcast(
+            {"event": "breaker", "host": breaker.name, "state": breaker.state,
+             "reset_timeout": breaker.reset_timeout}
+        )
+
+
+class DaemonClient:
+    """Connection to a running daemon
+
+    call() sends a request and waits for its reply; listeners get every
+    pushed event as a dict, from the client's reader thread.
+    """
+
+    def __init__(self, address=None, timeout=10.0):
+        self.address = address or default_address()
+        self.timeout = timeout
+        try:
+            conn = Client(self.address, address_family(self.address), authkey=load_authkey())
+        except (OSError, EOFError, AuthenticationError) as e:
+            raise IPMIError(f"Cannot reach the fan-lord daemon at {self.address}: {e}")
+        self.peer = _Peer(conn)
+        self.ids = itertools.count(1)
+        # id -> [Event, reply]
+        self.pending = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self._read_loop, name="daemon-client", daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return self.peer.closed
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def call(self, message, timeout=None):
+        """Send a request, returns the reply dict"""
+        message_id = next(self.ids)
+        waiter = [threading.Event(), None]
+        with self.lock:
+            self.pending[message_id] = waiter
+        if not self.peer.send({"id": message_id, **message}):
+            with self.lock:
+                self.pending.pop(message_id, None)
+            raise IPMIError("Lost the connection to the fan-lord daemon")
+        if not waiter[0].wait(timeout or self.timeout):
+            with self.lock:
+                self.pending.pop(message_id, None)
+            raise IPMITimeout("The fan-lord daemon did not answer")
+        return waiter[1]
+
+    def _read_loop(self):
+        try:
+            while True:
+                message = self.peer.receive()
+                if "id" in message:
+                    with self.lock:
+                        waiter = self.pending.pop(message["id"], None)
+                    if waiter is not None:
+                        waiter[1] = message
+                        waiter[0].set()
+                    continue
+                for listener in list(self.listeners):
+                    try:
+                        listener(message)
+                    except Exception:
+                        traceback.print_exc()
+        except (EOFError, OSError, ValueError):
+            pass
+        self.peer.closed = True
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for waiter in pending.values():
+            waiter[1] = error_reply(IPMIError("Lost the connection to the fan-lord daemon"))
+            waiter[0].set()
+
+    def close(self):
+        self.peer.close()
+
+
+class DaemonSensorFeed:
+    """Sensor readings pushed by the daemon, with SensorPoller's interface"""
+
+    def __init__(self, backend, callback=None, error_callback=None):
+        self.backend = backend
+        self.readings = {}
+        self.last_error = None
+        self.listeners = [callback] if callback else []
+        self.error_callback = error_callback
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def latest(self):
+        return list(self.readings.values())
+
+    def on_readings(self, readings):
+        self.readings = {reading.name: reading for reading in readings}
+        for listener in list(self.listeners):
+            try:
+                listener(readings)
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        self.backend.feeds.append(self)
+        if self.backend.readings:
+            self.on_readings(self.backend.readings)
+        return self
+
+    def stop(self):
+        if self in self.backend.feeds:
+            self.backend.feeds.remove(self)
+
+
+class DaemonBackend(Backend):
+    """Sends requests through a running daemon instead of to the BMC
+
+    Not exclusive: other clients write through the same daemon, so local
+    state caches and watchdogs are left to the daemon. Reconnects once
+    when the daemon was restarted.
+    """
+
+    name = "daemon"
+    exclusive = False
+
+    def __init__(self, address=None, timeout=10.0):
+        super().__init__()
+        self.address = address
+        self.timeout = timeout
+        self.client = None
+        self.duty_listeners = []
+        self.feeds = []
+        self.readings = []
+        self.state = {}
+        self.lock = threading.Lock()
+        try:
+            self._connect()
+        except IPMIError as e:
+            raise ValueError(str(e)) from None
+        self.host = self.state.get("host") or "daemon"
+
+    def _connect(self):
+        client = DaemonClient(self.address, self.timeout)
+        client.add_listener(self._on_event)
+        reply = client.call({"op": "state"})
+        self.client = client
+        self._on_event({"event": "state", **reply})
+
+    def add_duty_listener(self, callback):
+        """Call callback({zone: duty}) when any client's duty write succeeds"""
+        self.duty_listeners.append(callback)
+
+    def sensor_feed(self, callback=None, error_callback=None):
+        return DaemonSensorFeed(self, callback, error_callback)
+
+    def _on_event(self, event):
+        kind = event.get("event")
+        if kind == "state":
+            self.state = event
+            self.readings = decode_readings(event.get("readings", []))
+        elif kind == "readings":
+            self.readings = decode_readings(event["readings"])
+            for feed in list(self.feeds):
+                feed.on_readings(self.readings)
+        if kind in ("state", "duties") and event.get("duties"):
+            duties = {int(zone): duty for zone, duty in event["duties"].items()}
+            for listener in list(self.duty_listeners):
+                listener(duties)
+
+    def raw(self, request, timeout=None):
+        message = {
+            "op": "raw",
+            "netfn": request.netfn,
+            "command": request.command,
+            "data": request.data.hex(),
+            "timeout": timeout,
+        }
+        with self.lock:
+            if self.client.closed:
+                self._connect()
+            client = self.client
+        # Leave the daemon time to report its own timeout
+        reply = client.call(message, timeout + 1.0 if timeout else None)
+        if reply["ok"]:
+            return bytes.fromhex(reply["response"])
+        raise reply_error(reply)
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
@@ -0,0 +1,156 @@
+"""Fleet status polling behind the dashboard
+
+FleetMonitor reads fan mode, zone duties and the hottest temperature of
+every inventory host through a FleetRunner, over and over, and reports a
+HostStatus per host as it finishes. Nothing here imports Qt; the
+dashboard batches the statuses into model updates.
+"""
+import threading
+import time
+
+from .ipmi import (
+    CPU_ZONE,
+    FAN_MODE_FULL,
+    FAN_MODE_HEAVY_IO,
+    FAN_MODE_OPTIMAL,
+    FAN_MODE_STANDARD,
+    PERIPHERAL_ZONE,
+    IPMIError,
+    IPMITimeout,
+    get_duty_request,
+    get_fan_mode_request,
+)
+from .sdr import SENSOR_TYPE_TEMPERATURE, SDRRepository
+from .sensors import read_sensors
+
+MODE_NAMES = {
+    FAN_MODE_STANDARD: "standard",
+    FAN_MODE_FULL: "full",
+    FAN_MODE_OPTIMAL: "optimal",
+    FAN_MODE_HEAVY_IO: "heavy_io",
+}
+
+
+class HostStatus:
+    """Last known state of one fleet host
+
+    A failed poll keeps the previous mode, duties and temperature and only
+    sets error, so the dashboard still shows what the host last reported.
+    """
+
+    def __init__(self, host, model=None):
+        self.host = host
+        self.name = host.name
+        self.model = host.model or model
+        self.mode = None
+        self.duties = {}
+        # (sensor name, °C) of the hottest readable temperature sensor
+        self.hottest = None
+        self.error = None
+        # time.time() of the last successful poll
+        self.updated = None
+
+    @property
+    def mode_name(self):
+        if self.mode is None:
+            return None
+        return MODE_NAMES.get(self.mode, f"0x{self.mode:02x}")
+
+    def update(self, data, timestamp=None):
+        """Take the result of read_status"""
+        model, mode, duties, hottest = data
+        self.model = self.host.model or model
+        self.mode = mode
+        self.duties = duties
+        self.hottest = hottest
+        self.error = None
+        self.updated = time.time() if timestamp is None else timestamp
+
+    def __repr__(self):
+        return f"<HostStatus {self.name} mode={self.mode_name} duties={self.duties}>"
+
+
+def read_status(backend, deadline, cache_dir=None):
+    """Fleet operation: (model, fan mode, {zone: duty}, hottest) of one host"""
+    repository = SDRRepository(backend, cache_dir)
+    records = [r for r in repository.load() if r.sensor_type == SENSOR_TYPE_TEMPERATURE]
+    model = "-".join(repository.identity.split("-")[:2])
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise IPMITimeout("Host timeout exceeded")
+    zones = (CPU_ZONE, PERIPHERAL_ZONE)
+    responses = backend.raw_many(
+        [get_fan_mode_request()] + [get_duty_request(zone) for zone in zones], remaining
+    )
+    mode = responses[0]
+    if isinstance(mode, IPMIError):
+        raise mode
+    duties = {
+        zone: response[0]
+        for zone, response in zip(zones, responses[1:])
+        if not isinstance(response, IPMIError) and response
+    }
+    readings = [r for r in read_sensors(backend, records, remaining) if r.available]
+    hottest = None
+    if readings:
+        reading = max(readings, key=lambda r: r.value)
+        hottest = (reading.name, reading.value)
+    return model, mode[0] if mode else None, duties, hottest
+
+
+class FleetMonitor:
+    """Polls every host of a FleetRunner every interval seconds
+
+    callback(status) is called from worker threads with the HostStatus of
+    each host as it finishes; statuses are reused between polls. Rounds
+    never overlap, a round slower than interval starts the next at once.
+    """
+
+    def __init__(self, runner, callback, interval=5.0, cache_dir=None):
+        self.runner = runner
+        self.callback = callback
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.statuses = {host.name: HostStatus(host) for host in runner.hosts}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fleet-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.runner.cancel()
+
+    def poll_once(self):
+        self.runner.run(
+            lambda backend, deadline: read_status(backend, deadline, self.cache_dir),
+            self._on_result,
+        )
+
+    def report(self, result):
+        """Record a HostResult of another fleet operation, e.g. applying a preset"""
+        status = self.statuses.get(result.host.name)
+        if status is None or result.ok:
+            return
+        status.error = str(result.error)
+        self.callback(status)
+
+    def _on_result(self, result, done, total):
+        if self._stop.is_set():
+            return
+        status = self.statuses[result.host.name]
+        if result.ok:
+            status.update(result.responses)
+        else:
+            status.error = str(result.error)
+        self.callback(status)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,357 @@
+"""Find BMCs on whole subnets with RMCP Presence Ping
+
+Every address gets an ASF Presence Ping, and every address that answers
+with a Pong advertising IPMI gets a session-less Get Channel
+Authentication Capabilities, which tells whether it speaks IPMI 2.0.
+All probes go out of one non-blocking UDP socket and replies are matched
+by their source address, so thousands of probes are in flight at once:
+
+- `rate` probes per second at most, so a sweep does not flood the network
+- at most `window` probes awaiting a reply at a time
+- a probe that got no reply within `timeout` is resent up to `retries`
+  times, then the address is given up
+
+A /16 takes about 65536 / rate seconds per attempt plus one timeout.
+
+    python -m fan_lord discover 10.0.0.0/16 --output hosts.json
+"""
+import ipaddress
+import json
+import os
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+from . import rmcp
+from .fleet import FleetHost, load_inventory
+from .ipmi import CMD_GET_CHANNEL_AUTH_CAPS, NETFN_APP, get_channel_auth_caps_request
+
+STAGE_PING = 0
+STAGE_AUTH_CAPS = 1
+# Supported entities bit of a Presence Pong: IPMI
+ENTITY_IPMI = 0x80
+AUTH_TYPES = ((0x01, "none"), (0x02, "md2"), (0x04, "md5"), (0x10, "password"), (0x20, "oem"))
+RECEIVE_BUFFER = 4 * 1024 * 1024
+
+
+class Responder:
+    """A BMC that answered the sweep"""
+
+    def __init__(self, host, port, latency):
+        self.host = host
+        self.port = port
+        # Seconds from the first ping to the Pong
+        self.latency = latency
+        # From Get Channel Authentication Capabilities, None if it did not answer
+        self.channel = None
+        self.auth_types = None
+        self.ipmi_v2 = None
+
+    def to_host(self, username="ADMIN", password=""):
+        return FleetHost(self.host, self.port, username, password)
+
+    def to_dict(self):
+        return {
+            "host": self.host,
+            "port": self.port,
+            "latency": round(self.latency, 4),
+            "channel": self.channel,
+            "auth_types": self.auth_types,
+            "ipmi_v2": self.ipmi_v2,
+        }
+
+    def __repr__(self):
+        return f"<Responder {self.host}:{self.port} ipmi_v2={self.ipmi_v2}>"
+
+
+def parse_auth_caps(response):
+    """(channel, auth type names, IPMI 2.0 supported) from the response data"""
+    if len(response) < 4:
+        raise ValueError("Truncated Get Channel Authentication Capabilities response")
+    names = [name for bit, name in AUTH_TYPES if response[1] & bit]
+    # Byte 4 is only defined when the BMC returned the v2.0 extended data
+    ipmi_v2 = bool(response[1] & 0x80 and response[3] & 0x02)
+    return response[0] & 0x0F, names, ipmi_v2
+
+
+def parse_networks(specs):
+    """IPv4Networks of CIDR ranges like "10.0.0.0/16" or single addresses"""
+    networks = [ipaddress.ip_network(spec, strict=False) for spec in specs]
+    for network in networks:
+        if network.version != 4:
+            raise ValueError(f"Only IPv4 networks can be swept: {network}")
+    return networks
+
+
+def expand_targets(networks, ports=(623,)):
+    """(address, port) of every host address of the networks, generated lazily"""
+    networks = parse_networks(networks)
+    return ((str(a), port) for network in networks for a in network.hosts() for port in ports)
+
+
+def count_targets(networks, ports=(623,)):
+    total = 0
+    for network in parse_networks(networks):
+        # hosts() leaves out the network and broadcast addresses of /30 and larger
+        size = network.num_addresses
+        total += size - 2 if size > 2 else size
+    return total * len(ports)
+
+
+def parse_ports(text):
+    """"623", "623,6230" or "6230-6239" -> list of ports"""
+    ports = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        first = int(first)
+        last = int(last) if last else first
+        if not 0 < first <= last <= 65535:
+            raise ValueError(f"Invalid port range {part!r}")
+        ports.extend(range(first, last + 1))
+    return ports
+
+
+class _Probe:
+    __slots__ = ("stage", "attempts", "serial", "started")
+
+    def __init__(self, started):
+        self.stage = STAGE_PING
+        self.attempts = 0
+        self.serial = 0
+        self.started = started
+
+
+class SubnetScanner:
+    """Sweeps addresses with Presence Pings from one thread
+
+    progress(responder) is called as each BMC is found, before its
+    authentication capabilities are known.
+    """
+
+    def __init__(self, rate=10000, window=16384, timeout=1.0, retries=1, auth_caps=True):
+        self.rate = rate
+        self.window = window
+        self.timeout = timeout
+        self.retries = retries
+        self.auth_caps = auth_caps
+        # Datagrams sent and received by the last scan
+        self.sent = 0
+        self.received = 0
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def scan(self, targets, progress=None):
+        """Probe every (address, port), returns the Responders by address"""
+        self._cancel.clear()
+        self.sent = self.received = 0
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+        sock.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        try:
+            responders = self._run(sock, selector, iter(targets), progress)
+        finally:
+            selector.close()
+            sock.close()
+        return sorted(
+            responders.values(),
+            key=lambda r: (ipaddress.ip_address(r.host), r.port),
+        )
+
+    def _run(self, sock, selector, targets, progress):
+        ping = rmcp.presence_ping(0)
+        caps = rmcp.encode_v15(rmcp.encode_ipmi_request(get_channel_auth_caps_request(), 0))
+        pending = {}
+        responders = {}
+        # (deadline, address, serial) in send order; the timeout is the same
+        # for every probe so the oldest always expires first
+        deadlines = deque()
+        # Addresses to (re)send before taking new targets
+        resend = deque()
+        exhausted = False
+        serial = 0
+        # Token bucket, up to 10 ms worth of probes in one burst
+        burst = max(1.0, self.rate / 100)
+        tokens = burst
+        last = time.monotonic()
+
+        while not self._cancel.is_set():
+            now = time.monotonic()
+            tokens = min(burst, tokens + (now - last) * self.rate)
+            last = now
+
+            while deadlines and deadlines[0][0] <= now:
+                _, address, probe_serial = deadlines.popleft()
+                probe = pending.get(address)
+                if probe is None or probe.serial != probe_serial:
+                    continue
+                if probe.attempts <= self.retries:
+                    resend.append(address)
+                else:
+                    # Found BMCs stay found without their capabilities
+                    del pending[address]
+
+            while tokens >= 1:
+                if resend:
+                    address = resend.popleft()
+                    probe = pending.get(address)
+                    if probe is None:
+                        continue
+                elif not exhausted and len(pending) < self.window:
+                    address = next(targets, None)
+                    if address is None:
+                        exhausted = True
+                        break
+                    probe = pending[address] = _Probe(now)
+                else:
+                    break
+                try:
+                    sock.sendto(ping if probe.stage == STAGE_PING else caps, address)
+                except (BlockingIOError, InterruptedError):
+                    # Socket buffer full, try again once it drained a bit
+                    resend.appendleft(address)
+                    break
+                except OSError:
+                    # Unroutable or a broadcast address
+                    del pending[address]
+                    continue
+                serial += 1
+                probe.serial = serial
+                probe.attempts += 1
+                deadlines.append((now + self.timeout, address, serial))
+                tokens -= 1
+                self.sent += 1
+
+            if exhausted and not pending:
+                break
+            if resend or (not exhausted and len(pending) < self.window):
+                wait = max(0.0005, (1 - tokens) / self.rate)
+            else:
+                wait = 0.1
+            if deadlines:
+                wait = min(wait, max(0.0, deadlines[0][0] - now))
+            if selector.select(wait):
+                self._receive(sock, pending, responders, resend, progress)
+        return responders
+
+    def _receive(self, sock, pending, responders, resend, progress):
+        while True:
+            try:
+                data, address = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ICMP port unreachable reported by some platforms
+                continue
+            probe = pending.get(address)
+            if probe is None:
+                continue
+            try:
+                packet = rmcp.decode_packet(data)
+            except ValueError:
+                continue
+            self.received += 1
+            if probe.stage == STAGE_PING:
+                self._on_pong(packet, address, probe, pending, responders, resend, progress)
+            elif packet.msg_class == rmcp.RMCP_CLASS_IPMI:
+                self._on_auth_caps(packet, address, pending, responders)
+
+    def _on_pong(self, packet, address, probe, pending, responders, resend, progress):
+        if packet.msg_class != rmcp.RMCP_CLASS_ASF:
+            return
+        try:
+            msg_type, _, data = rmcp.parse_asf(packet.payload)
+        except ValueError:
+            return
+        if msg_type != rmcp.ASF_PONG:
+            return
+        # IANA, OEM, supported entities, supported interactions
+        if len(data) < 9 or not data[8] & ENTITY_IPMI:
+            del pending[address]
+            return
+        responder = Responder(address[0], address[1], time.monotonic() - probe.started)
+        responders[address] = responder
+        if progress is not None:
+            progress(responder)
+        if not self.auth_caps:
+            del pending[address]
+            return
+        probe.stage = STAGE_AUTH_CAPS
+        probe.attempts = 0
+        # Forget the ping's deadline
+        probe.serial = 0
+        resend.append(address)
+
+    def _on_auth_caps(self, packet, address, pending, responders):
+        try:
+            netfn, command, _, response = rmcp.decode_ipmi_response(packet.payload)
+        except ValueError:
+            return
+        if (netfn, command) != (NETFN_APP | 0x01, CMD_GET_CHANNEL_AUTH_CAPS):
+            return
+        del pending[address]
+        if response[:1] != b"\x00":
+            return
+        try:
+            channel, auth_types, ipmi_v2 = parse_auth_caps(response[1:])
+        except ValueError:
+            return
+        responder = responders[address]
+        responder.channel = channel
+        responder.auth_types = auth_types
+        responder.ipmi_v2 = ipmi_v2
+
+
+def discover(networks, ports=(623,), progress=None, **options):
+    """Sweep the networks, returns the Responders sorted by address"""
+    return SubnetScanner(**options).scan(expand_targets(networks, ports), progress)
+
+
+def merge_inventory(path, responders, defaults=None):
+    """Add the responders missing from the inventory at path, returns how many were added
+
+    The inventory keeps its format and every entry as written: a text
+    inventory gets host[:port] lines appended, a JSON one new entries in
+    "hosts". New hosts take the file's own defaults, then the given ones.
+    """
+    defaults = defaults or {}
+    exists = os.path.exists(path)
+    known = {(h.host, h.port) for h in load_inventory(path)} if exists else set()
+    added = [r for r in responders if (r.host, r.port) not in known]
+    if not path.lower().endswith(".json"):
+        text = ""
+        if exists:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        lines = [r.host if r.port == 623 else f"{r.host}:{r.port}" for r in added]
+        with open(path, "a", encoding="utf-8") as f:
+            if lines and text and not text.endswith("\n"):
+                f.write("\n")
+            f.writelines(line + "\n" for line in lines)
+        return len(added)
+
+    document = {"hosts": []}
+    if exists:
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+    if isinstance(document, list):
+        hosts, file_defaults = document, {}
+    else:
+        hosts, file_defaults = document.setdefault("hosts", []), document.get("defaults", {})
+    for r in added:
+        entry = {"host": r.host, "port": r.port}
+        for key, fallback in (("username", "ADMIN"), ("password", "")):
+            if key not in file_defaults:
+                entry[key] = defaults.get(key, fallback)
+        hosts.append(entry)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    return len(added)
@@ -0,0 +1,195 @@
+"""Background command executor so callers never block on BMC I/O"""
+import collections
+import threading
+import time
+import traceback
+
+from .ipmi import IPMIError, IPMITimeout
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+
+
+class CommandCancelled(IPMIError):
+    """The command was cancelled or superseded before it was sent"""
+
+
+class CommandResult:
+    """Outcome of one request"""
+
+    def __init__(self, request, host, submitted):
+        self.request = request
+        self.host = host
+        self.submitted = submitted
+        self.started = None
+        self.finished = None
+        self.response = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def latency(self):
+        """Seconds spent talking to the BMC"""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def __repr__(self):
+        state = "ok" if self.ok else f"error={self.error!r}"
+        return f"<CommandResult {self.request} {state}>"
+
+
+class PendingCommand:
+    """Handle to a submitted request"""
+
+    def __init__(self, executor, request, key, deadline, callback):
+        self.executor = executor
+        self.request = request
+        self.key = key
+        self.deadline = deadline
+        self.callback = callback
+        self.state = QUEUED
+        self.result = CommandResult(request, executor.backend.host, time.time())
+        self._done = threading.Event()
+
+    def cancel(self):
+        """Cancel the command if it has not started, returns True on success"""
+        return self.executor._cancel(self, "Command cancelled")
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the command finished, returns its CommandResult"""
+        self._done.wait(timeout)
+        return self.result
+
+    def _finish(self):
+        self._done.set()
+        if self.callback is not None:
+            self.executor._notify(self.callback, self.result)
+
+
+class CommandExecutor:
+    """Runs requests on a worker thread, in submission order
+
+    Requests submitted with the same coalesce key replace each other while
+    still queued, so a slow BMC only ever receives the newest target for a
+    fan zone. timeout is a per-command budget covering queueing and I/O.
+    """
+
+    def __init__(self, backend, timeout=None, callback=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.listeners = [callback] if callback else []
+        self.queue = collections.deque()
+        self.by_key = {}
+        self.cond = threading.Condition()
+        self._shutdown = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"ipmi-executor-{backend.host}", daemon=True
+        )
+        self._thread.start()
+
+    def add_listener(self, callback):
+        """Call callback(result) for every command that was actually sent"""
+        self.listeners.append(callback)
+
+    def submit(self, request, key=None, timeout=None, callback=None):
+        """Queue a request, returns a PendingCommand"""
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        command = PendingCommand(self, request, key, deadline, callback)
+        superseded = None
+        with self.cond:
+            if self._shutdown:
+                raise RuntimeError("Executor has been shut down")
+            if key is not None:
+                superseded = self.by_key.get(key)
+                if superseded is not None:
+                    # Last value wins, the new command takes the back of the queue
+                    self.queue.remove(superseded)
+                    superseded.state = CANCELLED
+                self.by_key[key] = command
+            self.queue.append(command)
+            self.cond.notify()
+        if superseded is not None:
+            superseded.result.error = CommandCancelled(f"Superseded by {request}")
+            superseded._finish()
+        return command
+
+    def queue_depth(self):
+        with self.cond:
+            return len(self.queue)
+
+    def cancel_all(self):
+        """Cancel every queued command"""
+        with self.cond:
+            commands = list(self.queue)
+        for command in commands:
+            self._cancel(command, "Command cancelled")
+
+    def shutdown(self, wait=True):
+        """Cancel queued commands and stop the worker"""
+        self.cancel_all()
+        with self.cond:
+            self._shutdown = True
+            self.cond.notify_all()
+        if wait:
+            self._thread.join()
+
+    def _cancel(self, command, reason):
+        with self.cond:
+            if command.state != QUEUED:
+                return False
+            self.queue.remove(command)
+            if self.by_key.get(command.key) is command:
+                del self.by_key[command.key]
+            command.state = CANCELLED
+        command.result.error = CommandCancelled(reason)
+        command._finish()
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self._shutdown:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                command = self.queue.popleft()
+                if self.by_key.get(command.key) is command:
+                    del self.by_key[command.key]
+                command.state = RUNNING
+            self._execute(command)
+
+    def _execute(self, command):
+        result = command.result
+        timeout = None
+        if command.deadline is not None:
+            timeout = command.deadline - time.monotonic()
+        result.started = time.monotonic()
+        if timeout is not None and timeout <= 0:
+            result.error = IPMITimeout("Command expired while queued")
+        else:
+            try:
+                result.response = self.backend.raw(command.request, timeout)
+            except Exception as e:
+                result.error = e
+        result.finished = time.monotonic()
+        command.state = DONE
+        for listener in list(self.listeners):
+            self._notify(listener, result)
+        command._finish()
+
+    def _notify(self, callback, result):
+        try:
+            callback(result)
+        except Exception:
+            # A broken listener must not kill the worker thread
+            traceback.print_exc()
@@ -0,0 +1,281 @@
+"""Fleet-wide fan health: find fans spinning slower than their siblings
+
+A wearing fan shows up as fewer RPM per percent of duty than the same
+fan slot on identical boards. Samples are kept as (host x fan x time)
+NumPy arrays, one time slot per poll cycle, and analyze() compares every
+fan at once:
+
+1. RPM is divided by the duty commanded to the fan's zone, ignoring
+   samples below min_duty where fans stall or the ratio is meaningless
+2. each fan's efficiency is the median of its ratios over the window
+3. the expected efficiency of a slot is the median across hosts of the
+   same chassis model, with the median absolute deviation as its spread;
+   models with fewer than min_peers hosts compare a fan with the other
+   fans of its zone on the same board instead
+4. a fan is a suspect when it is at least `deficit` slower than expected
+   and `z` robust deviations below the slot's peers
+
+    python -m fan_lord fleet-health hosts.json --interval 60
+"""
+import time
+import warnings
+
+import numpy as np
+
+from .ipmi import CPU_ZONE, PERIPHERAL_ZONE, IPMIError, IPMITimeout, get_duty_request
+from .sdr import SENSOR_TYPE_FAN, SDRRepository
+from .sensors import read_sensors
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+def fan_zone(name):
+    """Supermicro fan naming: FAN1, FAN2... are on the CPU zone, FANA, FANB... on the peripheral zone"""
+    if name.strip()[-1:].isalpha():
+        return PERIPHERAL_ZONE
+    return CPU_ZONE
+
+
+class Suspect:
+    """A fan slower than expected for its duty"""
+
+    def __init__(self, host, model, fan, efficiency, expected, deficit, z, peers):
+        self.host = host
+        self.model = model
+        self.fan = fan
+        # RPM per percent duty, measured and expected
+        self.efficiency = efficiency
+        self.expected = expected
+        # 0.25 means 25% slower than expected
+        self.deficit = deficit
+        self.z = z
+        # Hosts compared with, 0 when compared with the fans of its own zone
+        self.peers = peers
+
+    def to_dict(self):
+        return {
+            "host": self.host,
+            "model": self.model,
+            "fan": self.fan,
+            "efficiency": round(self.efficiency, 2),
+            "expected": round(self.expected, 2),
+            "deficit": round(self.deficit, 3),
+            "z": None if self.z is None else round(self.z, 1),
+            "peers": self.peers,
+        }
+
+    def __repr__(self):
+        return f"<Suspect {self.host} {self.fan} {self.deficit:.0%} slow>"
+
+
+def analyze(
+    rpm,
+    duty,
+    groups,
+    fan_zones,
+    min_duty=20,
+    deficit=0.2,
+    z=3.5,
+    min_samples=3,
+    min_peers=3,
+):
+    """Vectorized health pass over (hosts, fans, time) arrays
+
+    rpm and duty hold NaN where nothing was read. groups is an integer
+    chassis model per host, fan_zones the zone of each fan column.
+    Returns (suspect mask, efficiency, expected, deficit, z, peers), each
+    (hosts, fans).
+    """
+    rpm = np.asarray(rpm, dtype=np.float32)
+    duty = np.asarray(duty, dtype=np.float32)
+    groups = np.asarray(groups)
+    fan_zones = np.asarray(fan_zones)
+    hosts, fans = rpm.shape[:2]
+    valid = (duty >= min_duty) & np.isfinite(rpm)
+    ratio = np.where(valid, rpm / np.where(valid, duty, 1), np.nan)
+    counts = valid.sum(axis=2)
+    with warnings.catch_warnings():
+        # All-NaN slices (missing fans, hosts that never answered) are expected
+        warnings.simplefilter("ignore", RuntimeWarning)
+        efficiency = np.nanmedian(ratio, axis=2)
+        efficiency[counts < min_samples] = np.nan
+        present = np.isfinite(efficiency)
+
+        expected = np.full((hosts, fans), np.nan, dtype=np.float32)
+        spread = np.full((hosts, fans), np.nan, dtype=np.float32)
+        peers = np.zeros((hosts, fans), dtype=np.int32)
+        for group in np.unique(groups):
+            rows = groups == group
+            members = efficiency[rows]
+            median = np.nanmedian(members, axis=0)
+            mad = np.nanmedian(np.abs(members - median), axis=0)
+            expected[rows] = median
+            spread[rows] = mad * MAD_SCALE
+            peers[rows] = present[rows].sum(axis=0)
+
+        # Too few identical boards: compare with the fans of the same zone
+        alone = peers < min_peers
+        for zone in np.unique(fan_zones):
+            cols = fan_zones == zone
+            siblings = efficiency[:, cols]
+            median = np.nanmedian(siblings, axis=1, keepdims=True)
+            mad = np.nanmedian(np.abs(siblings - median), axis=1, keepdims=True) * MAD_SCALE
+            mask = alone[:, cols]
+            expected[:, cols] = np.where(mask, median, expected[:, cols])
+            spread[:, cols] = np.where(mask, mad, spread[:, cols])
+            peers[:, cols] = np.where(mask, 0, peers[:, cols])
+
+        slow = 1 - efficiency / expected
+        score = (efficiency - expected) / spread
+    # No spread among identical fans: the deficit alone decides
+    outlier = ~(score > -z)
+    suspects = present & (expected > 0) & (slow >= deficit) & outlier
+    return suspects, efficiency, expected, slow, score, peers
+
+
+class FanSamples:
+    """Rolling (host x fan x time) RPM and duty arrays, one slot per poll cycle
+
+    Hosts and fans get a row or column the first time they are seen; a
+    host that did not answer in a cycle keeps NaN in that slot.
+    """
+
+    def __init__(self, capacity=60):
+        self.capacity = capacity
+        self.hosts = []
+        self.models = []
+        self.fans = []
+        self.host_index = {}
+        self.fan_index = {}
+        self.rpm = np.full((0, 0, capacity), np.nan, dtype=np.float32)
+        self.duty = np.full((0, 0, capacity), np.nan, dtype=np.float32)
+        self.times = np.full(capacity, np.nan)
+        self.position = 0
+        self.cycles = 0
+
+    def _grow(self, hosts, fans):
+        pad = ((0, hosts - self.rpm.shape[0]), (0, fans - self.rpm.shape[1]), (0, 0))
+        if any(p[1] for p in pad):
+            self.rpm = np.pad(self.rpm, pad, constant_values=np.nan)
+            self.duty = np.pad(self.duty, pad, constant_values=np.nan)
+
+    def _host(self, name, model):
+        index = self.host_index.get(name)
+        if index is None:
+            index = self.host_index[name] = len(self.hosts)
+            self.hosts.append(name)
+            self.models.append(model)
+        elif model is not None:
+            self.models[index] = model
+        return index
+
+    def _fan(self, name):
+        index = self.fan_index.get(name)
+        if index is None:
+            index = self.fan_index[name] = len(self.fans)
+            self.fans.append(name)
+        return index
+
+    def add_cycle(self, samples, timestamp=None):
+        """Store one poll cycle: {host: (model, {fan: rpm}, {zone: duty})}"""
+        entries = []
+        for host, (model, rpms, duties) in samples.items():
+            row = self._host(host, model)
+            for fan, value in rpms.items():
+                entries.append((row, self._fan(fan), value, duties.get(fan_zone(fan))))
+        self._grow(len(self.hosts), len(self.fans))
+        slot = self.position
+        self.rpm[:, :, slot] = np.nan
+        self.duty[:, :, slot] = np.nan
+        if entries:
+            rows, cols, rpms, duties = zip(*entries)
+            self.rpm[rows, cols, slot] = [np.nan if v is None else v for v in rpms]
+            self.duty[rows, cols, slot] = [np.nan if v is None else v for v in duties]
+        self.times[slot] = time.time() if timestamp is None else timestamp
+        self.position = (slot + 1) % self.capacity
+        self.cycles += 1
+
+    def analyze(self, **options):
+        """Suspect fans ranked by how much slower they are than expected"""
+        if not self.hosts:
+            return []
+        # Right after startup, judge with the cycles there are
+        options.setdefault("min_samples", min(3, self.cycles))
+        codes = {}
+        groups = [codes.setdefault(model, len(codes)) for model in self.models]
+        zones = [fan_zone(fan) for fan in self.fans]
+        mask, efficiency, expected, slow, score, peers = analyze(
+            self.rpm, self.duty, groups, zones, **options
+        )
+        rows, cols = np.nonzero(mask)
+        order = np.argsort(-slow[rows, cols], kind="stable")
+        suspects = []
+        for row, col in zip(rows[order], cols[order]):
+            value = score[row, col]
+            suspects.append(
+                Suspect(
+                    self.hosts[row],
+                    self.models[row],
+                    self.fans[col],
+                    float(efficiency[row, col]),
+                    float(expected[row, col]),
+                    float(slow[row, col]),
+                    float(value) if np.isfinite(value) else None,
+                    int(peers[row, col]),
+                )
+            )
+        return suspects
+
+
+def read_fans(backend, deadline, cache_dir=None):
+    """Fleet operation: (model, {fan: rpm}, {zone: duty}) of one host
+
+    The chassis model is the board's manufacturer and product ID; the SDR
+    comes from the on-disk cache once a board type has been read.
+    """
+    repository = SDRRepository(backend, cache_dir)
+    records = [r for r in repository.load() if r.sensor_type == SENSOR_TYPE_FAN]
+    model = "-".join(repository.identity.split("-")[:2])
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise IPMITimeout("Host timeout exceeded")
+    readings = read_sensors(backend, records, remaining)
+    zones = sorted({fan_zone(r.name) for r in records})
+    responses = backend.raw_many([get_duty_request(zone) for zone in zones], remaining)
+    duties = {
+        zone: response[0]
+        for zone, response in zip(zones, responses)
+        if not isinstance(response, IPMIError) and response
+    }
+    return model, {r.name: r.value for r in readings}, duties
+
+
+class FleetFanHealth:
+    """Polls the fans of every host in a FleetRunner and keeps FanSamples
+
+    An inventory model overrides the model read from the board, e.g. to
+    tell apart chassis that share a motherboard.
+    """
+
+    def __init__(self, runner, capacity=60, cache_dir=None, **options):
+        self.runner = runner
+        self.samples = FanSamples(capacity)
+        self.cache_dir = cache_dir
+        self.options = options
+
+    def poll(self, progress=None):
+        """Read one cycle from every host, returns the HostResults"""
+        results = self.runner.run(
+            lambda backend, deadline: read_fans(backend, deadline, self.cache_dir), progress
+        )
+        cycle = {}
+        for result in results:
+            if result.ok:
+                model, rpms, duties = result.responses
+                cycle[result.host.name] = (result.host.model or model, rpms, duties)
+        self.samples.add_cycle(cycle)
+        return results
+
+    def analyze(self):
+        return self.samples.analyze(**self.options)
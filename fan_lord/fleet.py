@@ -0,0 +1,263 @@
+"""Apply fan settings to many BMCs concurrently"""
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .capabilities import CapabilityCache
+from .executor import CommandCancelled
+from .ipmi import IPMITimeout, set_duty_request
+from .presets import preset_requests
+from .resilience import BreakerRegistry, ResilientBackend
+from .state_cache import CachingBackend
+
+
+class FleetHost:
+    """One BMC in the inventory"""
+
+    def __init__(
+        self, host, port=623, username="ADMIN", password="", name=None, model=None
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.name = name or (host if port == 623 else f"{host}:{port}")
+        self.model = model
+
+    def to_dict(self):
+        data = {"host": self.host, "port": self.port, "username": self.username}
+        data["password"] = self.password
+        if self.name != self.host:
+            data["name"] = self.name
+        if self.model:
+            data["model"] = self.model
+        return data
+
+    def __repr__(self):
+        return f"<FleetHost {self.name}>"
+
+
+def _parse_host_line(line, defaults):
+    host, _, port = line.partition(":")
+    return FleetHost(host, port=int(port) if port else 623, **defaults)
+
+
+def load_inventory(path, defaults=None):
+    """Load hosts from a JSON or plain text inventory
+
+    JSON is either a list of host objects or {"defaults": {...}, "hosts": [...]}
+    where each host is an object or a "host[:port]" string. Plain text lists
+    one host[:port] per line. defaults fills in missing credentials.
+    """
+    defaults = dict(defaults or {})
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith(".json"):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            defaults.update(data.get("defaults", {}))
+            data = data.get("hosts", [])
+        hosts = []
+        for entry in data:
+            if isinstance(entry, str):
+                hosts.append(_parse_host_line(entry, defaults))
+            else:
+                hosts.append(FleetHost(**{**defaults, **entry}))
+        return hosts
+    return [
+        _parse_host_line(line.strip(), defaults)
+        for line in text.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def save_inventory(path, hosts):
+    """Write hosts as a JSON inventory"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"hosts": [host.to_dict() for host in hosts]}, f, indent=2)
+
+
+class HostResult:
+    """Outcome of a fleet operation on one host"""
+
+    def __init__(self, host, responses=None, error=None, latency=None):
+        self.host = host
+        self.responses = responses
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        state = "ok" if self.ok else f"error={self.error!r}"
+        return f"<HostResult {self.host.name} {state}>"
+
+
+def _send_requests(requests):
+    def operation(backend, deadline):
+        responses = []
+        for request in requests:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IPMITimeout("Host timeout exceeded")
+            responses.append(backend.raw(request, remaining))
+        return responses
+
+    return operation
+
+
+def _apply_preset(name, capability_dir):
+    def operation(backend, deadline):
+        cache = CapabilityCache(backend, capability_dir)
+        capabilities = cache.last()
+        if not capabilities.probed:
+            # First time at this host: find its zones once, later runs use the cache
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IPMITimeout("Host timeout exceeded")
+            capabilities = cache.load(remaining)
+        return _send_requests(preset_requests(name, capabilities.zones))(backend, deadline)
+
+    return operation
+
+
+class FleetRunner:
+    """Runs the same operation against every host with bounded concurrency
+
+    Each host gets its own LAN session; max_workers caps how many hosts are
+    talked to at once and host_timeout bounds the time spent on one host,
+    retries included. Each host has a circuit breaker that outlives the
+    run, so a BMC that stopped answering is skipped at once next time
+    instead of holding a worker for its whole host_timeout.
+    """
+
+    def __init__(
+        self,
+        hosts,
+        max_workers=64,
+        host_timeout=5.0,
+        request_timeout=1.0,
+        retries=1,
+        backend_factory=None,
+        state_cache=None,
+        breakers=None,
+        retry=None,
+        capability_dir=None,
+    ):
+        self.hosts = list(hosts)
+        self.max_workers = max_workers
+        self.host_timeout = host_timeout
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.backend_factory = backend_factory or self.make_backend
+        # Optional StateCache shared across runs, skips writes hosts already have
+        self.state_cache = state_cache
+        # BreakerRegistry shared across runs, RetryPolicy for idempotent writes
+        self.breakers = breakers or BreakerRegistry()
+        self.retry = retry
+        # Where the fan zones of each host are cached, see CapabilityCache
+        self.capability_dir = capability_dir
+        self._cancel = threading.Event()
+
+    def make_backend(self, host):
+        from .lan import LanBackend
+
+        return LanBackend(
+            host.host,
+            username=host.username,
+            password=host.password,
+            port=host.port,
+            timeout=self.request_timeout,
+            retries=self.retries,
+            keepalive_interval=0,
+        )
+
+    def cancel(self):
+        """Skip hosts that have not been started yet"""
+        self._cancel.set()
+
+    def run(self, operation, progress=None):
+        """Call operation(backend, deadline) for every host
+
+        progress(result, done, total) is called from worker threads as hosts
+        finish. Returns the HostResults in inventory order.
+        """
+        self._cancel.clear()
+        total = len(self.hosts)
+        results = [None] * total
+        done = 0
+        lock = threading.Lock()
+
+        def task(index, host):
+            nonlocal done
+            result = self._run_host(host, operation)
+            with lock:
+                results[index] = result
+                done += 1
+                count = done
+            if progress is not None:
+                progress(result, count, total)
+
+        workers = max(1, min(self.max_workers, total))
+        with ThreadPoolExecutor(workers, thread_name_prefix="fleet") as pool:
+            for index, host in enumerate(self.hosts):
+                pool.submit(task, index, host)
+        return results
+
+    def _run_host(self, host, operation):
+        if self._cancel.is_set():
+            return HostResult(host, error=CommandCancelled("Fleet operation cancelled"))
+        started = time.monotonic()
+        deadline = started + self.host_timeout
+        try:
+            backend = ResilientBackend(
+                self.backend_factory(host), self.breakers.get(host.name), self.retry
+            )
+            if self.state_cache is not None:
+                backend = CachingBackend(backend, self.state_cache)
+            with backend:
+                responses = operation(backend, deadline)
+            return HostResult(host, responses, latency=time.monotonic() - started)
+        except Exception as e:
+            return HostResult(host, error=e, latency=time.monotonic() - started)
+
+    def apply(self, requests, progress=None):
+        """Send the same raw requests to every host"""
+        return self.run(_send_requests(list(requests)), progress)
+
+    def apply_preset(self, name, progress=None):
+        """Apply a preset to every fan zone each host has, like the GUI does"""
+        # Unknown names fail here rather than once per host
+        preset_requests(name)
+        return self.run(_apply_preset(name, self.capability_dir), progress)
+
+    def set_duty(self, zone, duty, progress=None):
+        return self.apply([set_duty_request(zone, duty)], progress)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results):
+    """Counts and latency percentiles for a list of HostResults"""
+    latencies = [r.latency for r in results if r.ok and r.latency is not None]
+    failed = [r for r in results if not r.ok]
+    return {
+        "total": len(results),
+        "ok": len(results) - len(failed),
+        "failed": len(failed),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies) if latencies else None,
+        "errors": {r.host.name: str(r.error) for r in failed},
+    }
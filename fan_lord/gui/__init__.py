@@ -0,0 +1 @@
+"""Qt widgets used by the Fan Lord window, never imported by headless tools"""
@@ -0,0 +1,414 @@
+"""Fleet dashboard: one table row per BMC, refreshed in batches
+
+The table is a model/view pair, so only the visible rows are ever drawn
+and thousands of hosts cost one row tuple each. Statuses reported by the
+monitor's worker threads are queued and applied to the model at most
+every flush interval, as one dataChanged or one re-sort per batch.
+"""
+import functools
+import threading
+from datetime import datetime
+
+from PyQt6.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QSortFilterProxyModel,
+    Qt,
+    QTimer,
+    pyqtSignal,
+)
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QCheckBox,
+    QComboBox,
+    QDialog,
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QTableView,
+    QVBoxLayout,
+)
+
+from ..dashboard import FleetMonitor
+from ..fleet import FleetRunner, load_inventory
+from ..ipmi import CPU_ZONE, PERIPHERAL_ZONE
+from ..resilience import retry_policy
+from .fleet_dialog import PRESET_LABELS
+
+# Language key of each column's header
+COLUMNS = (
+    "host",
+    "model_column",
+    "fan_mode",
+    "cpu_fan_speed",
+    "peripheral_fan_speed",
+    "hottest",
+    "last_seen",
+    "last_error",
+)
+ERROR_COLUMN = COLUMNS.index("last_error")
+SORT_ROLE = Qt.ItemDataRole.UserRole
+ERROR_COLOR = QColor("red")
+
+
+@functools.lru_cache(maxsize=256)
+def clock_text(second):
+    """HH:MM:SS of a whole-second timestamp; a poll round shares a few seconds"""
+    return datetime.fromtimestamp(second).strftime("%H:%M:%S")
+
+
+def status_row(status):
+    """(display texts, sort keys, filter text) of a HostStatus"""
+    cpu = status.duties.get(CPU_ZONE)
+    peripheral = status.duties.get(PERIPHERAL_ZONE)
+    hottest = status.hottest
+    updated = status.updated
+    texts = (
+        status.name,
+        status.model or "",
+        status.mode_name or "",
+        "" if cpu is None else f"{cpu}%",
+        "" if peripheral is None else f"{peripheral}%",
+        "" if hottest is None else f"{hottest[1]:g} °C ({hottest[0]})",
+        "" if updated is None else clock_text(int(updated)),
+        status.error or "",
+    )
+    # Unknown values sort before every known one
+    keys = (
+        status.name,
+        texts[1],
+        texts[2],
+        -1 if cpu is None else cpu,
+        -1 if peripheral is None else peripheral,
+        float("-inf") if hottest is None else hottest[1],
+        0 if updated is None else updated,
+        texts[7],
+    )
+    return texts, keys, f"{texts[0]} {texts[1]} {texts[7]}".lower()
+
+
+class HostTableModel(QAbstractTableModel):
+    """Rows of host statuses
+
+    The model sorts itself with Python's sort on precomputed keys: a
+    QSortFilterProxyModel would call data() for every comparison, about
+    a second per refresh at 5,000 rows. Rows are re-sorted after an
+    update changed the sort column.
+    """
+
+    def __init__(self, headers, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.statuses = []
+        self.rows = []
+        self.row_index = {}
+        self.sort_column = -1
+        self.sort_order = Qt.SortOrder.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        texts, keys, _ = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return texts[column]
+        if role == SORT_ROLE:
+            return keys[column]
+        if role == Qt.ItemDataRole.ToolTipRole and column == ERROR_COLUMN:
+            return texts[column] or None
+        if role == Qt.ItemDataRole.ForegroundRole and texts[ERROR_COLUMN]:
+            return ERROR_COLOR
+        return None
+
+    def set_statuses(self, statuses):
+        """Replace every row, e.g. after loading an inventory"""
+        self.beginResetModel()
+        self.statuses = list(statuses)
+        self.rows = [status_row(status) for status in self.statuses]
+        self.row_index = {status.name: row for row, status in enumerate(self.statuses)}
+        self._sort_rows()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        # Keep selections on their hosts
+        names = [self.statuses[index.row()].name for index in persistent]
+        self._sort_rows()
+        self.changePersistentIndexList(
+            persistent,
+            [self.index(self.row_index[name], index.column()) for name, index in zip(names, persistent)],
+        )
+        self.layoutChanged.emit()
+
+    def _sort_rows(self):
+        if self.sort_column < 0:
+            return
+        column = self.sort_column
+        order = sorted(
+            range(len(self.rows)),
+            key=lambda row: self.rows[row][1][column],
+            reverse=self.sort_order == Qt.SortOrder.DescendingOrder,
+        )
+        self.statuses = [self.statuses[row] for row in order]
+        self.rows = [self.rows[row] for row in order]
+        self.row_index = {status.name: row for row, status in enumerate(self.statuses)}
+
+    def apply_updates(self, statuses):
+        """Update the rows of statuses that changed, returns how many did
+
+        Emits a single dataChanged spanning the changed rows, or one layout
+        change when the sort column changed, so a refresh of the whole
+        fleet costs one signal instead of one per host.
+        """
+        first = last = None
+        changed = 0
+        resort = False
+        column = self.sort_column
+        for status in statuses:
+            row = self.row_index.get(status.name)
+            if row is None:
+                continue
+            new = status_row(status)
+            old = self.rows[row]
+            if new[0] == old[0]:
+                continue
+            self.rows[row] = new
+            changed += 1
+            first = row if first is None else min(first, row)
+            last = row if last is None else max(last, row)
+            if column >= 0 and new[1][column] != old[1][column]:
+                resort = True
+        if resort:
+            # The layout change repaints and refilters every row anyway
+            self.sort(self.sort_column, self.sort_order)
+        elif changed:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(COLUMNS) - 1))
+        return changed
+
+
+class HostFilterProxy(QSortFilterProxyModel):
+    """Filters by text and by failing hosts, sorting is left to the model"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text = ""
+        self.errors_only = False
+        self.setSortRole(SORT_ROLE)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+    def set_text(self, text):
+        self.text = text.strip().lower()
+        self.invalidateFilter()
+
+    def set_errors_only(self, enabled):
+        self.errors_only = enabled
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        texts, _, search = self.sourceModel().rows[source_row]
+        if self.errors_only and not texts[ERROR_COLUMN]:
+            return False
+        return not self.text or self.text in search
+
+
+def host_table(model):
+    """The dashboard's table view of a HostFilterProxy, sorted by host"""
+    table = QTableView()
+    table.setModel(model)
+    table.setSortingEnabled(True)
+    table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+    table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+    table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+    table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+    table.setWordWrap(False)
+    table.verticalHeader().hide()
+    # Fixed row heights: the view never measures rows it doesn't show
+    table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+    table.horizontalHeader().setSectionResizeMode(ERROR_COLUMN, QHeaderView.ResizeMode.Stretch)
+    return table
+
+
+class DashboardSignals(QObject):
+    """Carries statuses and fleet results from worker threads to the GUI thread"""
+
+    status = pyqtSignal(object)
+    applied = pyqtSignal(object)
+
+
+class DashboardDialog(QDialog):
+    """Live table of every inventory host with bulk preset actions"""
+
+    def __init__(self, lang, config, parent=None, state_cache=None, breakers=None):
+        super().__init__(parent)
+        self.lang = lang
+        self.config = config
+        self.state_cache = state_cache
+        self.breakers = breakers
+        self.hosts = []
+        self.monitor = None
+        self.pending = {}
+        self.signals = DashboardSignals()
+        self.signals.status.connect(self.queue_status)
+        self.signals.applied.connect(self.on_applied)
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(int(config["dashboard_flush_ms"]))
+        self.flush_timer.timeout.connect(self.flush)
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle(self.lang["dashboard_title"])
+        self.setMinimumSize(900, 600)
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        load_btn = QPushButton(self.lang["load_inventory"])
+        load_btn.clicked.connect(self.load_inventory)
+        self.hosts_label = QLabel(self.lang["hosts_loaded"].format(count=0))
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText(self.lang["filter_hosts"])
+        self.filter_edit.setClearButtonEnabled(True)
+        self.errors_checkbox = QCheckBox(self.lang["errors_only"])
+        top_layout.addWidget(load_btn)
+        top_layout.addWidget(self.hosts_label)
+        top_layout.addStretch()
+        top_layout.addWidget(self.filter_edit)
+        top_layout.addWidget(self.errors_checkbox)
+        layout.addLayout(top_layout)
+
+        self.model = HostTableModel([self.lang[key] for key in COLUMNS], self)
+        self.proxy = HostFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_edit.textChanged.connect(self.proxy.set_text)
+        self.errors_checkbox.toggled.connect(self.proxy.set_errors_only)
+        self.table = host_table(self.proxy)
+        self.table.selectionModel().selectionChanged.connect(self.update_selection)
+        layout.addWidget(self.table)
+
+        action_layout = QHBoxLayout()
+        self.selection_label = QLabel()
+        self.preset_combo = QComboBox()
+        for name, key in PRESET_LABELS.items():
+            self.preset_combo.addItem(self.lang[key], name)
+        self.apply_btn = QPushButton(self.lang["apply_selected"])
+        self.apply_btn.clicked.connect(self.apply_selected)
+        action_layout.addWidget(self.selection_label)
+        action_layout.addStretch()
+        action_layout.addWidget(self.preset_combo)
+        action_layout.addWidget(self.apply_btn)
+        layout.addLayout(action_layout)
+        self.update_selection()
+
+    def make_runner(self, hosts):
+        return FleetRunner(
+            hosts,
+            max_workers=self.config["fleet_workers"],
+            host_timeout=self.config["fleet_host_timeout"],
+            request_timeout=self.config["timeout"],
+            retries=self.config["retries"],
+            state_cache=self.state_cache,
+            breakers=self.breakers,
+            retry=retry_policy(self.config["resilience"]),
+        )
+
+    def load_inventory(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, self.lang["load_inventory"], "", "Inventory (*.json *.txt);;All files (*)"
+        )
+        if not path:
+            return
+        defaults = {
+            "username": self.config["username"],
+            "password": self.config["password"],
+        }
+        try:
+            hosts = load_inventory(path, defaults)
+        except (OSError, ValueError, TypeError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to load inventory: {str(e)}")
+            return
+        self.set_hosts(hosts)
+
+    def set_hosts(self, hosts):
+        """Show hosts and start polling them"""
+        self.stop_monitor()
+        self.hosts = hosts
+        self.pending = {}
+        self.hosts_label.setText(self.lang["hosts_loaded"].format(count=len(hosts)))
+        self.monitor = FleetMonitor(
+            self.make_runner(hosts),
+            self.signals.status.emit,
+            interval=self.config["dashboard_interval"],
+        )
+        self.model.set_statuses(list(self.monitor.statuses.values()))
+        self.monitor.start()
+
+    def stop_monitor(self):
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+
+    def queue_status(self, status):
+        # Several reports of one host between flushes collapse into one
+        self.pending[status.name] = status
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        self.model.apply_updates(pending.values())
+
+    def selected_hosts(self):
+        rows = {
+            self.proxy.mapToSource(index).row()
+            for index in self.table.selectionModel().selectedRows()
+        }
+        return [self.model.statuses[row].host for row in sorted(rows)]
+
+    def update_selection(self, *args):
+        count = len(self.table.selectionModel().selectedRows())
+        self.selection_label.setText(self.lang["hosts_selected"].format(count=count))
+        self.apply_btn.setEnabled(count > 0)
+
+    def apply_selected(self):
+        hosts = self.selected_hosts()
+        if not hosts:
+            return
+        preset = self.preset_combo.currentData()
+        runner = self.make_runner(hosts)
+        threading.Thread(
+            target=lambda: self.signals.applied.emit(runner.apply_preset(preset)),
+            name="dashboard-apply",
+            daemon=True,
+        ).start()
+
+    def on_applied(self, results):
+        if self.monitor is None:
+            return
+        for result in results:
+            self.monitor.report(result)
+
+    def closeEvent(self, event):
+        self.stop_monitor()
+        super().closeEvent(event)
@@ -0,0 +1,206 @@
+"""Dialog applying a preset or duty cycle to a fleet of BMCs"""
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QMessageBox,
+    QProgressBar,
+    QPushButton,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from ..fleet import FleetRunner, load_inventory, summarize
+from ..ipmi import CPU_ZONE, PERIPHERAL_ZONE, set_duty_request
+from ..resilience import retry_policy
+
+# Preset name -> language key of its button text
+PRESET_LABELS = {
+    "silent": "silent_mode",
+    "performance": "performance_mode",
+    "full_speed": "full_speed_mode",
+}
+
+
+class FleetSignals(QObject):
+    """Carries fleet progress from worker threads to the GUI thread"""
+
+    progress = pyqtSignal(object, int, int)
+    finished = pyqtSignal(object)
+
+
+class FleetDialog(QDialog):
+    def __init__(self, lang, config, parent=None, state_cache=None, breakers=None):
+        super().__init__(parent)
+        self.lang = lang
+        self.config = config
+        self.state_cache = state_cache
+        self.breakers = breakers
+        self.hosts = []
+        self.runner = None
+        self.signals = FleetSignals()
+        self.signals.progress.connect(self.on_progress)
+        self.signals.finished.connect(self.on_finished)
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle(self.lang["fleet_title"])
+        self.setMinimumSize(700, 500)
+        layout = QVBoxLayout(self)
+
+        # Inventory
+        inventory_layout = QHBoxLayout()
+        load_btn = QPushButton(self.lang["load_inventory"])
+        load_btn.clicked.connect(self.load_inventory)
+        self.hosts_label = QLabel(self.lang["hosts_loaded"].format(count=0))
+        inventory_layout.addWidget(load_btn)
+        inventory_layout.addWidget(self.hosts_label)
+        inventory_layout.addStretch()
+        layout.addLayout(inventory_layout)
+
+        # Action: a preset or a manual zone duty cycle
+        action_layout = QHBoxLayout()
+        self.action_combo = QComboBox()
+        for name, key in PRESET_LABELS.items():
+            self.action_combo.addItem(self.lang[key], name)
+        self.action_combo.addItem(self.lang["manual_control"], None)
+        self.action_combo.currentIndexChanged.connect(self.update_action)
+        self.zone_combo = QComboBox()
+        self.zone_combo.addItem(self.lang["cpu_fan_speed"], CPU_ZONE)
+        self.zone_combo.addItem(self.lang["peripheral_fan_speed"], PERIPHERAL_ZONE)
+        self.duty_spin = QSpinBox()
+        self.duty_spin.setRange(0, 100)
+        self.duty_spin.setValue(50)
+        self.duty_spin.setSuffix("%")
+        self.apply_btn = QPushButton(self.lang["apply"])
+        self.apply_btn.clicked.connect(self.apply)
+        self.cancel_btn = QPushButton(self.lang["cancel"])
+        self.cancel_btn.clicked.connect(self.cancel)
+        self.cancel_btn.setEnabled(False)
+        action_layout.addWidget(self.action_combo)
+        action_layout.addWidget(self.zone_combo)
+        action_layout.addWidget(self.duty_spin)
+        action_layout.addStretch()
+        action_layout.addWidget(self.apply_btn)
+        action_layout.addWidget(self.cancel_btn)
+        layout.addLayout(action_layout)
+        self.update_action()
+
+        # Progress and per-host results
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+        self.results_table = QTableWidget(0, 3)
+        self.results_table.setHorizontalHeaderLabels(
+            [self.lang["host"], self.lang["latency"], self.lang["result"]]
+        )
+        self.results_table.horizontalHeader().setSectionResizeMode(
+            2, QHeaderView.ResizeMode.Stretch
+        )
+        self.results_table.setSortingEnabled(True)
+        layout.addWidget(self.results_table)
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+    def update_action(self):
+        manual = self.action_combo.currentData() is None
+        self.zone_combo.setEnabled(manual)
+        self.duty_spin.setEnabled(manual)
+
+    def load_inventory(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, self.lang["load_inventory"], "", "Inventory (*.json *.txt);;All files (*)"
+        )
+        if not path:
+            return
+        defaults = {
+            "username": self.config["username"],
+            "password": self.config["password"],
+        }
+        try:
+            self.hosts = load_inventory(path, defaults)
+        except (OSError, ValueError, TypeError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to load inventory: {str(e)}")
+            return
+        self.hosts_label.setText(self.lang["hosts_loaded"].format(count=len(self.hosts)))
+
+    def apply(self):
+        if not self.hosts:
+            return
+        preset = self.action_combo.currentData()
+        requests = [set_duty_request(self.zone_combo.currentData(), self.duty_spin.value())]
+        self.runner = FleetRunner(
+            self.hosts,
+            max_workers=self.config["fleet_workers"],
+            host_timeout=self.config["fleet_host_timeout"],
+            request_timeout=self.config["timeout"],
+            retries=self.config["retries"],
+            state_cache=self.state_cache,
+            breakers=self.breakers,
+            retry=retry_policy(self.config["resilience"]),
+        )
+        self.results_table.setSortingEnabled(False)
+        self.results_table.setRowCount(0)
+        self.progress_bar.setRange(0, len(self.hosts))
+        self.progress_bar.setValue(0)
+        self.summary_label.clear()
+        self.apply_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+
+        runner = self.runner
+        progress = self.signals.progress.emit
+
+        def work():
+            if preset is not None:
+                # Each host gets the preset on the fan zones it has
+                return runner.apply_preset(preset, progress)
+            return runner.apply(requests, progress)
+
+        threading.Thread(
+            target=lambda: self.signals.finished.emit(work()),
+            name="fleet-apply",
+            daemon=True,
+        ).start()
+
+    def cancel(self):
+        if self.runner is not None:
+            self.runner.cancel()
+
+    def on_progress(self, result, done, total):
+        self.progress_bar.setValue(done)
+        row = self.results_table.rowCount()
+        self.results_table.insertRow(row)
+        latency = f"{result.latency * 1000:.0f} ms" if result.latency is not None else ""
+        status = self.lang["command_success"] if result.ok else str(result.error)
+        status_item = QTableWidgetItem(status)
+        status_item.setForeground(QColor("green" if result.ok else "red"))
+        self.results_table.setItem(row, 0, QTableWidgetItem(result.host.name))
+        self.results_table.setItem(row, 1, QTableWidgetItem(latency))
+        self.results_table.setItem(row, 2, status_item)
+
+    def on_finished(self, results):
+        self.runner = None
+        self.results_table.setSortingEnabled(True)
+        self.apply_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        summary = summarize(results)
+        p95 = summary["p95"]
+        self.summary_label.setText(
+            self.lang["fleet_summary"].format(
+                ok=summary["ok"],
+                failed=summary["failed"],
+                p95=f"{p95 * 1000:.0f}" if p95 is not None else "-",
+            )
+        )
+
+    def closeEvent(self, event):
+        self.cancel()
+        super().closeEvent(event)
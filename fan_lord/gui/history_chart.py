@@ -0,0 +1,128 @@
+"""Trend chart of one sensor drawn from the downsampled history"""
+import time
+
+from PyQt6.QtCore import QPointF, Qt, QTimer
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import QComboBox, QFrame, QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+# Label -> seconds shown
+RANGES = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+
+
+class ChartView(QWidget):
+    """Mean line with a min/max band, at most one point per pixel"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(140)
+        self.series = ([], [], [], [])
+        self.span = (0.0, 1.0)
+        self.unit = ""
+
+    def set_series(self, series, since, now, unit):
+        self.series = series
+        self.span = (since, now)
+        self.unit = unit
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = self.rect().adjusted(50, 8, -8, -8)
+        painter.setPen(QPen(QColor("gray")))
+        painter.drawRect(rect)
+        times, mins, maxs, means = self.series
+        if not times:
+            return
+        low, high = min(mins), max(maxs)
+        if high - low < 1:
+            low, high = low - 1, high + 1
+        since, now = self.span
+
+        def point(t, value):
+            x = rect.left() + (t - since) / (now - since) * rect.width()
+            y = rect.bottom() - (value - low) / (high - low) * rect.height()
+            return QPointF(x, y)
+
+        # Min/max band
+        band = [point(t, v) for t, v in zip(times, maxs)]
+        band += [point(t, v) for t, v in zip(reversed(times), reversed(mins))]
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(70, 130, 180, 60))
+        painter.drawPolygon(QPolygonF(band))
+
+        painter.setPen(QPen(QColor("steelblue"), 1.5))
+        painter.drawPolyline(QPolygonF([point(t, v) for t, v in zip(times, means)]))
+
+        painter.setPen(QPen(QColor("black")))
+        painter.drawText(4, rect.top() + 10, f"{high:g} {self.unit}")
+        painter.drawText(4, rect.bottom(), f"{low:g} {self.unit}")
+
+
+class HistoryChart(QFrame):
+    """Sensor and time range selectors above a ChartView
+
+    Redraws on a timer from the GUI thread; the series comes from the
+    coarsest history tier needed for the range, so redraw cost does not
+    grow with retention.
+    """
+
+    def __init__(self, title, parent=None, refresh_interval=5.0):
+        super().__init__(parent)
+        self.setObjectName("history_frame")
+        self.setFrameStyle(QFrame.Shape.Box | QFrame.Shadow.Sunken)
+        self.history = None
+        layout = QVBoxLayout(self)
+
+        # Title and selectors
+        header = QHBoxLayout()
+        self.title = QLabel(title)
+        self.title.setObjectName("history_title")
+        self.title.setStyleSheet("font-weight: bold;")
+        self.sensor_combo = QComboBox()
+        self.sensor_combo.setSizeAdjustPolicy(QComboBox.SizeAdjustPolicy.AdjustToContents)
+        self.sensor_combo.currentIndexChanged.connect(self.refresh)
+        self.range_combo = QComboBox()
+        self.range_combo.addItems(list(RANGES))
+        self.range_combo.currentIndexChanged.connect(self.refresh)
+        header.addWidget(self.title)
+        header.addStretch()
+        header.addWidget(self.sensor_combo)
+        header.addWidget(self.range_combo)
+        layout.addLayout(header)
+
+        self.view = ChartView()
+        layout.addWidget(self.view)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(refresh_interval * 1000))
+
+    def set_title(self, title):
+        self.title.setText(title)
+
+    def set_history(self, history):
+        self.history = history
+        self.refresh()
+
+    def refresh(self):
+        if self.history is None:
+            return
+        # Sensors appear after the first poll
+        names = self.history.names()
+        if len(names) != self.sensor_combo.count():
+            current = self.sensor_combo.currentText()
+            self.sensor_combo.blockSignals(True)
+            self.sensor_combo.clear()
+            self.sensor_combo.addItems(names)
+            if current in names:
+                self.sensor_combo.setCurrentText(current)
+            self.sensor_combo.blockSignals(False)
+        name = self.sensor_combo.currentText()
+        if not name:
+            return
+        now = time.time()
+        since = now - RANGES[self.range_combo.currentText()]
+        series = self.history.series(name, since, max(1, self.view.width()))
+        unit = self.history.info.get(name, (None, ""))[1]
+        self.view.set_series(series, since, now, unit)
@@ -0,0 +1,89 @@
+"""Bounded status log that only renders the visible rows"""
+import collections
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QAbstractItemView, QListView
+
+COLORS = {"success": QColor("green"), "error": QColor("red")}
+
+
+class LogModel(QAbstractListModel):
+    """The last `capacity` entries as (text, status) pairs"""
+
+    def __init__(self, capacity=1000, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self.entries = collections.deque()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        text, status = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            # One line per entry keeps row heights uniform
+            return " | ".join(line for line in text.splitlines() if line)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return text
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return COLORS.get(status)
+        return None
+
+    def extend(self, entries):
+        """Append entries, dropping the oldest ones beyond capacity"""
+        entries = list(entries)[-self.capacity :]
+        overflow = len(self.entries) + len(entries) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.entries.popleft()
+            self.endRemoveRows()
+        if entries:
+            first = len(self.entries)
+            self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+            self.entries.extend(entries)
+            self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries.clear()
+        self.endResetModel()
+
+
+class LogView(QListView):
+    """Status log; append() is buffered and flushed once per frame
+
+    Keeps following new entries while scrolled to the bottom, and leaves
+    the scroll position alone when the user scrolled up to read.
+    """
+
+    def __init__(self, capacity=1000, parent=None):
+        super().__init__(parent)
+        self.log_model = LogModel(capacity, self)
+        self.setModel(self.log_model)
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.pending = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(16)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append(self, text, status="success"):
+        self.pending.append((text, status))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        pending, self.pending = self.pending, []
+        self.log_model.extend(pending)
+        if at_bottom:
+            self.scrollToBottom()
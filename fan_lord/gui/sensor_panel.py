@@ -0,0 +1,79 @@
+"""Panel showing the latest fan and temperature readings"""
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QFrame, QGridLayout, QLabel, QVBoxLayout
+
+from ..sdr import SENSOR_TYPE_FAN
+
+
+class SensorPanel(QFrame):
+    """Grid of sensor readings, temperatures on the left and fans on the right
+
+    The poller thread emits readings_received / error_received, Qt delivers
+    them on the GUI thread.
+    """
+
+    readings_received = pyqtSignal(object)
+    error_received = pyqtSignal(object)
+
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.setObjectName("sensor_frame")
+        self.setFrameStyle(QFrame.Shape.Box | QFrame.Shadow.Sunken)
+        layout = QVBoxLayout(self)
+
+        # Title
+        self.title = QLabel(title)
+        self.title.setObjectName("sensor_title")
+        self.title.setStyleSheet("font-weight: bold;")
+        layout.addWidget(self.title)
+
+        self.grid = QGridLayout()
+        layout.addLayout(self.grid)
+        self.error_label = QLabel()
+        self.error_label.setStyleSheet("color: red;")
+        self.error_label.hide()
+        layout.addWidget(self.error_label)
+
+        # Sensor name -> value label
+        self.labels = {}
+        self.rows = [0, 0]
+        self.readings_received.connect(self.update_readings)
+        self.error_received.connect(self.show_error)
+
+    def set_title(self, title):
+        self.title.setText(title)
+
+    def update_readings(self, readings):
+        self.error_label.hide()
+        for reading in readings:
+            label = self.labels.get(reading.name)
+            if label is None:
+                label = self.add_sensor(reading)
+            if reading.available:
+                label.setText(f"{reading.value:g} {reading.unit}")
+            else:
+                label.setText("N/A")
+            label.setStyleSheet("color: red;" if self.is_critical(reading) else "")
+
+    def add_sensor(self, reading):
+        column = 1 if reading.sensor_type == SENSOR_TYPE_FAN else 0
+        row = self.rows[column]
+        self.rows[column] += 1
+        label = QLabel()
+        self.grid.addWidget(QLabel(reading.name), row, column * 2)
+        self.grid.addWidget(label, row, column * 2 + 1)
+        self.labels[reading.name] = label
+        return label
+
+    def is_critical(self, reading):
+        if not reading.available:
+            return False
+        upper = reading.record.threshold("ucr")
+        lower = reading.record.threshold("lcr")
+        return (upper is not None and reading.value >= upper) or (
+            lower is not None and reading.value <= lower
+        )
+
+    def show_error(self, error):
+        self.error_label.setText(str(error))
+        self.error_label.show()
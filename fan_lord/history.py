@@ -0,0 +1,219 @@
+"""Fixed-size sensor history with per-minute and per-hour downsampling"""
+import math
+import threading
+from array import array
+
+MINUTE = 60
+HOUR = 3600
+# A tier is used for a chart while it has at most this many rows per point
+DECIMATION = 4
+
+
+class Ring:
+    """Fixed capacity ring of timestamped rows stored in typed arrays
+
+    Times are doubles, every other field a 4-byte float, so memory only
+    depends on the capacity and never on how long the ring has been fed.
+    """
+
+    def __init__(self, capacity, fields):
+        self.capacity = capacity
+        self.fields = fields
+        self.times = array("d", bytes(8 * capacity))
+        self.columns = [array("f", bytes(4 * capacity)) for _ in fields]
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in [self.times, *self.columns])
+
+    def append(self, timestamp, *values):
+        if self.count < self.capacity:
+            i = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            # Full, overwrite the oldest row
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[i] = timestamp
+        for column, value in zip(self.columns, values):
+            column[i] = value
+
+    def oldest(self):
+        return self.times[self.start] if self.count else None
+
+    def _index(self, n):
+        return (self.start + n) % self.capacity
+
+    def since(self, timestamp):
+        """Number of the first row at or after timestamp"""
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.times[self._index(mid)] < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def rows(self, timestamp=None):
+        """(times, column, ...) lists of the rows at or after timestamp"""
+        first = 0 if timestamp is None else self.since(timestamp)
+        indexes = [self._index(n) for n in range(first, self.count)]
+        return [[a[i] for i in indexes] for a in [self.times, *self.columns]]
+
+
+class Bucket:
+    """Running min/max/mean of the samples in one time bucket"""
+
+    def __init__(self, start):
+        self.start = start
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, minimum, maximum, total, count):
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+        self.total += total
+        self.count += count
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+
+class SensorHistory:
+    """Raw samples of one sensor plus per-minute and per-hour min/max/mean
+
+    Each tier is a Ring; a finished minute bucket is appended to the minute
+    tier and folded into the running hour bucket.
+    """
+
+    def __init__(self, raw_samples=720, minutes=1440, hours=720):
+        self.raw = Ring(raw_samples, ("value",))
+        self.minutes = Ring(minutes, ("min", "max", "mean"))
+        self.hours = Ring(hours, ("min", "max", "mean"))
+        self.minute = None
+        self.hour = None
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes + self.minutes.nbytes + self.hours.nbytes
+
+    def add(self, timestamp, value):
+        self.raw.append(timestamp, value)
+        start = timestamp - timestamp % MINUTE
+        if self.minute is not None and self.minute.start != start:
+            self._close_minute()
+        if self.minute is None:
+            self.minute = Bucket(start)
+        self.minute.add(value, value, value, 1)
+
+    def _close_minute(self):
+        minute = self.minute
+        self.minutes.append(minute.start, minute.minimum, minute.maximum, minute.mean)
+        start = minute.start - minute.start % HOUR
+        if self.hour is not None and self.hour.start != start:
+            hour = self.hour
+            self.hours.append(hour.start, hour.minimum, hour.maximum, hour.mean)
+            self.hour = None
+        if self.hour is None:
+            self.hour = Bucket(start)
+        self.hour.add(minute.minimum, minute.maximum, minute.total, minute.count)
+        self.minute = None
+
+    def series(self, since, max_points):
+        """(times, mins, maxs, means) with at most max_points rows
+
+        Uses the finest tier that still reaches back to `since` with no more
+        than DECIMATION * max_points rows, then merges neighbouring rows, so
+        the work is bounded by the chart width and not by retention. The
+        running bucket of the tier is appended so the newest samples show.
+        """
+        tiers = ((self.raw, None), (self.minutes, self.minute), (self.hours, self.hour))
+        for ring, bucket in tiers:
+            if ring is self.hours:
+                break
+            # A ring that never wrapped still holds everything since `since`
+            covers = ring.count < ring.capacity or ring.oldest() <= since
+            if covers and ring.count - ring.since(since) <= max_points * DECIMATION:
+                break
+        if ring is self.raw:
+            times, values = ring.rows(since)
+            return decimate(times, values, values, values, max_points)
+        times, mins, maxs, means = ring.rows(since)
+        if bucket is not None:
+            times.append(bucket.start)
+            mins.append(bucket.minimum)
+            maxs.append(bucket.maximum)
+            means.append(bucket.mean)
+        return decimate(times, mins, maxs, means, max_points)
+
+
+def decimate(times, mins, maxs, means, max_points):
+    """Merge groups of neighbouring rows until at most max_points remain"""
+    step = -(-len(times) // max(1, max_points))
+    if step <= 1:
+        return times, mins, maxs, means
+    result = [], [], [], []
+    for i in range(0, len(times), step):
+        j = i + step
+        result[0].append(times[i])
+        result[1].append(min(mins[i:j]))
+        result[2].append(max(maxs[i:j]))
+        result[3].append(sum(means[i:j]) / len(means[i:j]))
+    return result
+
+
+class History:
+    """Histories of all sensors, fed as a SensorPoller listener
+
+    The poller thread adds readings while the GUI reads series, a lock
+    keeps the two apart.
+    """
+
+    def __init__(self, interval=5.0, raw_seconds=3600, minutes=1440, hours=720):
+        self.raw_samples = max(1, int(raw_seconds / interval)) if interval else 1
+        self.minute_buckets = minutes
+        self.hour_buckets = hours
+        self.sensors = {}
+        # Sensor name -> (sensor type, unit)
+        self.info = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(h.nbytes for h in self.sensors.values())
+
+    def names(self):
+        with self._lock:
+            return list(self.sensors)
+
+    def add(self, name, timestamp, value):
+        with self._lock:
+            history = self.sensors.get(name)
+            if history is None:
+                history = self.sensors[name] = SensorHistory(
+                    self.raw_samples, self.minute_buckets, self.hour_buckets
+                )
+            history.add(timestamp, value)
+
+    def on_readings(self, readings):
+        for reading in readings:
+            if reading.available:
+                self.info[reading.name] = (reading.sensor_type, reading.unit)
+                self.add(reading.name, reading.timestamp, reading.value)
+
+    def series(self, name, since, max_points):
+        with self._lock:
+            history = self.sensors.get(name)
+            if history is None:
+                return [], [], [], []
+            return history.series(since, max_points)
@@ -0,0 +1,170 @@
+"""Load of the machine Fan Lord runs on, for feed-forward fan control
+
+CPU utilization comes from /proc/stat and package power from the RAPL
+counters in /sys/class/powercap where the kernel exposes them. Both are
+Linux only; elsewhere the load is unknown and fan control falls back to
+temperatures alone. Only meaningful when Fan Lord runs in-band on the
+server whose fans it controls.
+
+    python -m fan_lord.hostload --record load.csv --duration 600
+
+records a load trace for "python -m fan_lord.simulation --trace load.csv".
+"""
+import argparse
+import glob
+import os
+import time
+
+STAT_PATH = "/proc/stat"
+POWERCAP_ROOT = "/sys/class/powercap"
+
+
+class CpuUtilization:
+    """Busy fraction of all CPUs between two reads of /proc/stat"""
+
+    def __init__(self, path=STAT_PATH):
+        self.path = path
+        self.last = None
+
+    def read(self):
+        """0-1, None on the first read or when /proc/stat is unavailable"""
+        try:
+            with open(self.path, "rb") as f:
+                fields = f.readline().split()
+        except OSError:
+            return None
+        if not fields or fields[0] != b"cpu":
+            return None
+        # user nice system idle iowait irq softirq steal; guest is already in user
+        times = [int(v) for v in fields[1:9]]
+        idle = times[3] + times[4]
+        total = sum(times)
+        last, self.last = self.last, (idle, total)
+        if last is None or total <= last[1]:
+            return None
+        return 1.0 - (idle - last[0]) / (total - last[1])
+
+
+class PackagePower:
+    """Average CPU package power between two reads of the RAPL energy counters"""
+
+    def __init__(self, root=POWERCAP_ROOT):
+        # intel-rapl:0, intel-rapl:1, ... are packages, intel-rapl:0:0 their subdomains
+        self.domains = sorted(
+            path
+            for path in glob.glob(os.path.join(root, "intel-rapl:*"))
+            if os.path.basename(path).count(":") == 1
+        )
+        self.max_power = self._max_power()
+        self.last = None
+
+    def _read_int(self, path):
+        try:
+            with open(path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _max_power(self):
+        """Sum of the package power limits in W, None if unknown"""
+        total = 0
+        for domain in self.domains:
+            limit = self._read_int(os.path.join(domain, "constraint_0_max_power_uw"))
+            if not limit:
+                limit = self._read_int(os.path.join(domain, "constraint_0_power_limit_uw"))
+            if not limit:
+                return None
+            total += limit
+        return total / 1e6 if total else None
+
+    def read(self):
+        """Watts, None on the first read or without readable counters"""
+        energies = []
+        for domain in self.domains:
+            energy = self._read_int(os.path.join(domain, "energy_uj"))
+            if energy is None:
+                return None
+            energies.append((energy, self._read_int(os.path.join(domain, "max_energy_range_uj"))))
+        if not energies:
+            return None
+        now = time.monotonic()
+        last, self.last = self.last, (now, energies)
+        if last is None or now <= last[0]:
+            return None
+        joules = 0
+        for (energy, wrap), (previous, _) in zip(energies, last[1]):
+            delta = energy - previous
+            if delta < 0:
+                # The counter wrapped
+                delta += wrap or 0
+            joules += max(0, delta) / 1e6
+        return joules / (now - last[0])
+
+
+class HostLoad:
+    """Host load as a 0-1 fraction: CPU utilization or package power, whichever is higher
+
+    Power catches vector-heavy jobs that keep utilization moderate but heat
+    the package; it is scaled by tdp (W), or by the RAPL power limit when
+    tdp is None. Each call covers the time since the previous one, so the
+    load should be read from one place only.
+    """
+
+    def __init__(self, tdp=None, stat_path=STAT_PATH, powercap_root=POWERCAP_ROOT):
+        self.cpu = CpuUtilization(stat_path)
+        self.power = PackagePower(powercap_root)
+        self.tdp = tdp or self.power.max_power
+        self.value = None
+
+    def __call__(self):
+        """The current load, None when neither source is available"""
+        values = []
+        utilization = self.cpu.read()
+        if utilization is not None:
+            values.append(utilization)
+        watts = self.power.read()
+        if watts is not None and self.tdp:
+            values.append(min(1.0, watts / self.tdp))
+        self.value = max(values) if values else None
+        return self.value
+
+
+def read_trace(path):
+    """[(seconds, load), ...] from a CSV file of time,load lines"""
+    trace = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or line[0].isalpha():
+                continue
+            t, load = line.split(",")[:2]
+            trace.append((float(t), float(load)))
+    if not trace:
+        raise ValueError(f"{path} has no load samples")
+    return sorted(trace)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a host load trace")
+    parser.add_argument("--record", required=True, metavar="FILE", help="CSV file to write")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--duration", type=float, default=600, help="seconds")
+    parser.add_argument("--tdp", type=float, help="package power that counts as full load, W")
+    args = parser.parse_args()
+
+    load = HostLoad(args.tdp)
+    load()
+    start = time.monotonic()
+    with open(args.record, "w", encoding="utf-8") as f:
+        f.write("time,load\n")
+        while time.monotonic() - start < args.duration:
+            time.sleep(args.interval)
+            value = load()
+            if value is None:
+                parser.error("host load is not available on this machine")
+            f.write(f"{time.monotonic() - start:.1f},{value:.3f}\n")
+            f.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""IPMI constants and raw request helpers shared by all backends"""
+from collections import namedtuple
+
+# Network functions
+NETFN_CHASSIS = 0x00
+NETFN_SENSOR = 0x04
+NETFN_APP = 0x06
+NETFN_STORAGE = 0x0A
+NETFN_SUPERMICRO = 0x30
+
+# Application commands
+CMD_GET_DEVICE_ID = 0x01
+CMD_COLD_RESET = 0x02
+CMD_WARM_RESET = 0x03
+CMD_GET_SYSTEM_GUID = 0x37
+CMD_GET_CHANNEL_AUTH_CAPS = 0x38
+CMD_SET_SESSION_PRIVILEGE = 0x3B
+CMD_CLOSE_SESSION = 0x3C
+
+# Sensor/Event commands
+CMD_GET_SENSOR_READING = 0x2D
+
+# Storage commands
+CMD_GET_SDR_REPOSITORY_INFO = 0x20
+CMD_RESERVE_SDR_REPOSITORY = 0x22
+CMD_GET_SDR = 0x23
+CMD_GET_SEL_INFO = 0x40
+CMD_RESERVE_SEL = 0x42
+CMD_GET_SEL_ENTRY = 0x43
+CMD_CLEAR_SEL = 0x47
+
+# Supermicro OEM commands
+CMD_FAN_MODE = 0x45
+CMD_FAN_DUTY = 0x70
+FAN_DUTY_SUBCOMMAND = 0x66
+
+# Fan zones
+CPU_ZONE = 0x00
+PERIPHERAL_ZONE = 0x01
+
+# Supermicro fan modes
+FAN_MODE_STANDARD = 0x00
+FAN_MODE_FULL = 0x01
+FAN_MODE_OPTIMAL = 0x02
+FAN_MODE_HEAVY_IO = 0x04
+
+# Privilege levels
+PRIVILEGE_USER = 0x02
+PRIVILEGE_OPERATOR = 0x03
+PRIVILEGE_ADMIN = 0x04
+
+COMPLETION_CODES = {
+    0xC0: "Node busy",
+    0xC1: "Invalid command",
+    0xC3: "Timeout while processing command",
+    0xC5: "Reservation canceled or invalid",
+    0xC7: "Request data length invalid",
+    0xC9: "Parameter out of range",
+    0xCA: "Cannot return number of requested data bytes",
+    0xCB: "Requested sensor, data, or record not present",
+    0xCC: "Invalid data field in request",
+    0xD4: "Insufficient privilege level",
+    0xD5: "Command not supported in present state",
+    0xFF: "Unspecified error",
+}
+
+
+class IPMIError(Exception):
+    """Raised when a BMC rejects a request or cannot be reached"""
+
+    def __init__(self, message, completion_code=None):
+        super().__init__(message)
+        self.completion_code = completion_code
+
+
+class IPMITimeout(IPMIError):
+    """Raised when the BMC does not answer in time"""
+
+
+class Request(namedtuple("Request", ["netfn", "command", "data"])):
+    """A raw IPMI request, formatted the same way as IPMICFG -raw arguments"""
+
+    __slots__ = ()
+
+    def __new__(cls, netfn, command, data=b""):
+        return super().__new__(cls, netfn, command, bytes(data))
+
+    def __str__(self):
+        return " ".join(f"0x{b:02x}" for b in (self.netfn, self.command, *self.data))
+
+
+def completion_error(code):
+    """Build an IPMIError for a non-zero completion code"""
+    reason = COMPLETION_CODES.get(code, "Unknown error")
+    return IPMIError(f"Completion code 0x{code:02x}: {reason}", code)
+
+
+def check_response(response):
+    """Strip the completion code from a response, raising on failure"""
+    if not response:
+        raise IPMIError("Empty response from BMC")
+    if response[0] != 0x00:
+        raise completion_error(response[0])
+    return bytes(response[1:])
+
+
+def checksum(data):
+    """2's complement checksum used by IPMI message headers"""
+    return (-sum(data)) & 0xFF
+
+
+def set_duty_request(zone, duty):
+    """Set the duty cycle (0-100) of a fan zone"""
+    if not 0 <= duty <= 100:
+        raise ValueError(f"Duty cycle out of range: {duty}")
+    return Request(NETFN_SUPERMICRO, CMD_FAN_DUTY, [FAN_DUTY_SUBCOMMAND, 0x01, zone, duty])
+
+
+def get_duty_request(zone):
+    """Read back the duty cycle of a fan zone"""
+    return Request(NETFN_SUPERMICRO, CMD_FAN_DUTY, [FAN_DUTY_SUBCOMMAND, 0x00, zone])
+
+
+def set_fan_mode_request(mode):
+    """Switch the BMC fan mode"""
+    return Request(NETFN_SUPERMICRO, CMD_FAN_MODE, [0x01, mode])
+
+
+def get_fan_mode_request():
+    """Read the current BMC fan mode"""
+    return Request(NETFN_SUPERMICRO, CMD_FAN_MODE, [0x00])
+
+
+def get_device_id_request():
+    """Get Device ID, also used as a cheap keep-alive"""
+    return Request(NETFN_APP, CMD_GET_DEVICE_ID)
+
+
+def get_system_guid_request():
+    """Get the 16 byte system GUID"""
+    return Request(NETFN_APP, CMD_GET_SYSTEM_GUID)
+
+
+def get_channel_auth_caps_request(privilege=0x04):
+    """Get Channel Authentication Capabilities of the current channel, allowed without a session"""
+    # 0x80 asks for the IPMI v2.0 extended data, 0x0E is the current channel
+    return Request(NETFN_APP, CMD_GET_CHANNEL_AUTH_CAPS, [0x8E, privilege])
+
+
+def get_sdr_repository_info_request():
+    return Request(NETFN_STORAGE, CMD_GET_SDR_REPOSITORY_INFO)
+
+
+def reserve_sdr_repository_request():
+    return Request(NETFN_STORAGE, CMD_RESERVE_SDR_REPOSITORY)
+
+
+def get_sdr_request(reservation_id, record_id, offset=0, length=0xFF):
+    """Read part of an SDR, length 0xFF reads the whole record"""
+    return Request(
+        NETFN_STORAGE,
+        CMD_GET_SDR,
+        [
+            reservation_id & 0xFF,
+            reservation_id >> 8,
+            record_id & 0xFF,
+            record_id >> 8,
+            offset,
+            length,
+        ],
+    )
+
+
+def get_sel_info_request():
+    """Entry count and the last addition/erase timestamps of the System Event Log"""
+    return Request(NETFN_STORAGE, CMD_GET_SEL_INFO)
+
+
+def get_sel_entry_request(record_id, reservation_id=0):
+    """Read a whole SEL entry; 0x0000 is the first entry and 0xFFFF the last"""
+    return Request(
+        NETFN_STORAGE,
+        CMD_GET_SEL_ENTRY,
+        [reservation_id & 0xFF, reservation_id >> 8, record_id & 0xFF, record_id >> 8, 0, 0xFF],
+    )
+
+
+def get_sensor_reading_request(number):
+    return Request(NETFN_SENSOR, CMD_GET_SENSOR_READING, [number])
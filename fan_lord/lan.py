@@ -0,0 +1,381 @@
+"""IPMI over LAN backend that keeps one RMCP+ session open and reuses it"""
+import os
+import socket
+import struct
+import threading
+import time
+
+from . import rmcp
+from .backend import Backend
+from .ipmi import (
+    CMD_CLOSE_SESSION,
+    CMD_SET_SESSION_PRIVILEGE,
+    NETFN_APP,
+    PRIVILEGE_ADMIN,
+    IPMIError,
+    IPMITimeout,
+    Request,
+    check_response,
+    get_device_id_request,
+)
+
+
+class Session:
+    """State of an activated RMCP+ session"""
+
+    def __init__(self, managed_session_id, keys):
+        self.managed_session_id = managed_session_id
+        self.keys = keys
+        self.sequence = 0
+        self.rq_seq = 0
+        self.last_activity = time.monotonic()
+
+    def next_sequence(self):
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF or 1
+        return self.sequence
+
+    def next_rq_seq(self):
+        self.rq_seq = (self.rq_seq + 1) & 0x3F
+        return self.rq_seq
+
+
+class LanBackend(Backend):
+    """RMCP+ (IPMI v2.0 over LAN) backend
+
+    The session is opened on first use and kept alive with a cheap Get
+    Device ID when idle. If the BMC forgets the session (idle expiry, BMC
+    reset) the request times out, the session is re-established and the
+    request is sent once more.
+
+    timeout is the wait for one reply before retransmitting; the timeout
+    passed to raw() is a deadline for the whole call, so a lost packet
+    costs one retransmission rather than the caller's entire budget.
+    """
+
+    name = "lan"
+
+    def __init__(
+        self,
+        host,
+        username="ADMIN",
+        password="",
+        port=623,
+        privilege=PRIVILEGE_ADMIN,
+        cipher_suite=None,
+        timeout=1.0,
+        retries=2,
+        keepalive_interval=30,
+        session_timeout=60,
+        pipeline_window=8,
+    ):
+        super().__init__()
+        if not host:
+            raise ValueError("The LAN backend needs a BMC host")
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.privilege = privilege
+        self.cipher_suite = cipher_suite or rmcp.best_cipher_suite()
+        self.timeout = timeout
+        self.retries = retries
+        self.keepalive_interval = keepalive_interval
+        self.session_timeout = session_timeout
+        # Requests in flight at once in raw_many, must stay below 64 (6 bit sequence)
+        self.pipeline_window = min(pipeline_window, 32)
+        # Number of sessions opened so far, bumps every time we re-authenticate
+        self.sessions_opened = 0
+        self.session = None
+        self.sock = None
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._keepalive_thread = None
+
+    # Session management
+
+    def open_session(self, deadline=None):
+        """Run the RMCP+ open session / RAKP handshake"""
+        with self.lock:
+            self._drop_session()
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect((self.host, self.port))
+
+            console_session_id = struct.unpack("<I", os.urandom(4))[0] or 1
+            tag = 0
+            response = self._handshake(
+                rmcp.PAYLOAD_OPEN_SESSION_REQUEST,
+                rmcp.open_session_request(tag, console_session_id, self.cipher_suite),
+                rmcp.PAYLOAD_OPEN_SESSION_RESPONSE,
+                deadline,
+            )
+            _, status, _, _, managed_session_id = rmcp.parse_open_session_response(
+                response
+            )
+            if status != rmcp.STATUS_OK:
+                raise IPMIError(f"BMC refused to open a session (status 0x{status:02x})")
+
+            # RAKP 1/2: prove the BMC knows the password
+            role = self.privilege | 0x10  # name-only lookup
+            console_random = os.urandom(16)
+            response = self._handshake(
+                rmcp.PAYLOAD_RAKP1,
+                rmcp.rakp1(tag, managed_session_id, console_random, role, self.username),
+                rmcp.PAYLOAD_RAKP2,
+                deadline,
+            )
+            _, status, _, managed_random, guid, auth_code = rmcp.parse_rakp2(response)
+            if status != rmcp.STATUS_OK:
+                raise IPMIError(f"RAKP authentication failed (status 0x{status:02x})")
+            expected = rmcp.rakp2_auth_code(
+                self.password, console_session_id, managed_session_id,
+                console_random, managed_random, guid, role, self.username,
+            )
+            if expected != auth_code:
+                raise IPMIError("BMC authentication code mismatch, check the password")
+
+            # RAKP 3/4: prove we know the password and agree on keys
+            response = self._handshake(
+                rmcp.PAYLOAD_RAKP3,
+                rmcp.rakp3(
+                    tag,
+                    rmcp.STATUS_OK,
+                    managed_session_id,
+                    rmcp.rakp3_auth_code(
+                        self.password, managed_random, console_session_id, role,
+                        self.username,
+                    ),
+                ),
+                rmcp.PAYLOAD_RAKP4,
+                deadline,
+            )
+            sik = rmcp.session_integrity_key(
+                self.password, console_random, managed_random, role, self.username
+            )
+            _, status, _, icv = rmcp.parse_rakp4(response)
+            if status != rmcp.STATUS_OK:
+                raise IPMIError(f"RAKP authentication failed (status 0x{status:02x})")
+            if icv != rmcp.rakp4_icv(sik, console_random, managed_session_id, guid):
+                raise IPMIError("RAKP 4 integrity check failed")
+
+            self.session = Session(
+                managed_session_id, rmcp.SessionKeys(sik, self.cipher_suite)
+            )
+            self.sessions_opened += 1
+            # Sessions start at User level, raise to what we asked for
+            self._session_request(
+                Request(NETFN_APP, CMD_SET_SESSION_PRIVILEGE, [self.privilege]),
+                deadline,
+            )
+            self._start_keepalive()
+
+    def _handshake(self, payload_type, payload, expected_type, deadline=None):
+        packet = rmcp.encode_v20(payload_type, payload)
+
+        def match(reply):
+            return reply.payload_type == expected_type
+
+        return self._exchange(packet, match, deadline).payload
+
+    def _attempt_timeout(self, deadline):
+        """Wait for one attempt, None once the deadline has passed"""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        return min(self.timeout, remaining) if remaining > 0 else None
+
+    def _exchange(self, packet, match, deadline=None):
+        """Send a packet and wait for a matching reply, retransmitting on loss"""
+        keys = self.session.keys if self.session else None
+        for _ in range(self.retries + 1):
+            timeout = self._attempt_timeout(deadline)
+            if timeout is None:
+                break
+            self.sock.send(packet)
+            wait_until = time.monotonic() + timeout
+            while True:
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.sock.settimeout(remaining)
+                try:
+                    data = self.sock.recv(1024)
+                except socket.timeout:
+                    break
+                except OSError as e:
+                    raise IPMIError(f"Network error talking to {self.host}: {e}")
+                try:
+                    reply = rmcp.decode_packet(data, lambda _: keys)
+                except ValueError:
+                    continue
+                if reply.msg_class == rmcp.RMCP_CLASS_IPMI and match(reply):
+                    return reply
+        raise IPMITimeout(f"No response from {self.host}:{self.port}")
+
+    def _session_request(self, request, deadline=None):
+        response = self._session_batch([request], deadline)[0]
+        if isinstance(response, IPMITimeout):
+            raise response
+        return response
+
+    def _session_batch(self, requests, deadline=None):
+        """Pipeline requests on the open session
+
+        Up to pipeline_window requests are in flight at once, each with its
+        own IPMI sequence number. Returns the raw response (completion code
+        first) or an IPMITimeout for every request.
+        """
+        session = self.session
+        results = [None] * len(requests)
+        for start in range(0, len(requests), self.pipeline_window):
+            outstanding = {}
+            for index in range(start, min(start + self.pipeline_window, len(requests))):
+                seq = session.next_rq_seq()
+                packet = rmcp.encode_v20(
+                    rmcp.PAYLOAD_IPMI,
+                    rmcp.encode_ipmi_request(requests[index], seq),
+                    session.managed_session_id,
+                    session.next_sequence(),
+                    session.keys,
+                )
+                outstanding[seq] = (index, packet)
+            for _ in range(self.retries + 1):
+                timeout = self._attempt_timeout(deadline)
+                if timeout is None:
+                    break
+                for _, packet in outstanding.values():
+                    self.sock.send(packet)
+                self._collect(outstanding, requests, results, timeout)
+                if not outstanding:
+                    break
+            for index, _ in outstanding.values():
+                results[index] = IPMITimeout(f"No response from {self.host}:{self.port}")
+        session.last_activity = time.monotonic()
+        return results
+
+    def _collect(self, outstanding, requests, results, timeout):
+        """Receive replies for outstanding requests until all arrive or time runs out"""
+        keys = self.session.keys
+        deadline = time.monotonic() + timeout
+        while outstanding:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.sock.settimeout(remaining)
+            try:
+                data = self.sock.recv(1024)
+            except socket.timeout:
+                return
+            except OSError as e:
+                raise IPMIError(f"Network error talking to {self.host}: {e}")
+            try:
+                reply = rmcp.decode_packet(data, lambda _: keys)
+                if reply.payload_type != rmcp.PAYLOAD_IPMI:
+                    continue
+                _, command, seq, response = rmcp.decode_ipmi_response(reply.payload)
+            except ValueError:
+                continue
+            if seq in outstanding:
+                index, _ = outstanding[seq]
+                if requests[index].command == command:
+                    results[index] = response
+                    del outstanding[seq]
+
+    def _drop_session(self):
+        self.session = None
+        self._close_socket()
+
+    def _close_socket(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    # Keep-alive
+
+    def _start_keepalive(self):
+        if self.keepalive_interval and self._keepalive_thread is None:
+            self._keepalive_thread = threading.Thread(
+                target=self._keepalive_loop, name=f"ipmi-keepalive-{self.host}", daemon=True
+            )
+            self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        while not self._stop.wait(self.keepalive_interval / 4):
+            with self.lock:
+                session = self.session
+                if session is None:
+                    continue
+                if time.monotonic() - session.last_activity < self.keepalive_interval:
+                    continue
+                try:
+                    self._session_request(get_device_id_request())
+                except IPMIError:
+                    # Let the next real request re-authenticate
+                    self._drop_session()
+
+    # Backend interface
+
+    def _ensure_session(self, deadline=None):
+        """Open a session if needed, returns True when a new one was opened"""
+        session = self.session
+        if session is not None and (
+            time.monotonic() - session.last_activity >= self.session_timeout
+        ):
+            # The BMC has certainly expired it, don't wait for a timeout
+            self._drop_session()
+        if self.session is None:
+            self.open_session(deadline)
+            return True
+        return False
+
+    @staticmethod
+    def _deadline(timeout):
+        return time.monotonic() + timeout if timeout else None
+
+    def raw(self, request, timeout=None):
+        deadline = self._deadline(timeout)
+        with self.lock:
+            for attempt in range(2):
+                fresh = self._ensure_session(deadline)
+                try:
+                    return check_response(self._session_request(request, deadline))
+                except IPMITimeout:
+                    self._drop_session()
+                    if fresh or attempt:
+                        raise
+
+    def raw_many(self, requests, timeout=None):
+        deadline = self._deadline(timeout)
+        with self.lock:
+            for attempt in range(2):
+                fresh = self._ensure_session(deadline)
+                responses = self._session_batch(requests, deadline)
+                if (
+                    requests
+                    and all(isinstance(r, IPMITimeout) for r in responses)
+                    and not (fresh or attempt)
+                ):
+                    # Nothing came back, the BMC probably lost the session
+                    self._drop_session()
+                    continue
+                results = []
+                for response in responses:
+                    try:
+                        results.append(
+                            response
+                            if isinstance(response, IPMIError)
+                            else check_response(response)
+                        )
+                    except IPMIError as e:
+                        results.append(e)
+                return results
+
+    def close(self):
+        self._stop.set()
+        with self.lock:
+            if self.session is not None:
+                session_id = struct.pack("<I", self.session.managed_session_id)
+                try:
+                    self._session_request(Request(NETFN_APP, CMD_CLOSE_SESSION, session_id))
+                except IPMIError:
+                    pass
+            self._drop_session()
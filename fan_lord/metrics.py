@@ -0,0 +1,373 @@
+"""Prometheus metrics of the command layer and the last sensor readings
+
+Values are updated by executor and sensor poller listeners as results
+come in; a scrape only joins pre-rendered lines (and reuses the previous
+text when nothing changed), it never talks to the BMC.
+"""
+import threading
+
+from .executor import CommandCancelled
+from .ipmi import (
+    CMD_COLD_RESET,
+    CMD_GET_DEVICE_ID,
+    CMD_GET_SDR,
+    CMD_GET_SDR_REPOSITORY_INFO,
+    CMD_GET_SENSOR_READING,
+    CMD_RESERVE_SDR_REPOSITORY,
+    CMD_WARM_RESET,
+    NETFN_APP,
+    NETFN_SENSOR,
+    NETFN_STORAGE,
+    IPMITimeout,
+)
+from .resilience import CLOSED, HALF_OPEN, CircuitOpen
+from .sdr import SENSOR_TYPE_FAN, SENSOR_TYPE_TEMPERATURE
+from .state_cache import classify
+
+# Seconds, IPMI commands take from well under a millisecond (KCS) to seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+COMMAND_NAMES = {
+    (NETFN_APP, CMD_GET_DEVICE_ID): "get_device_id",
+    (NETFN_APP, CMD_COLD_RESET): "cold_reset",
+    (NETFN_APP, CMD_WARM_RESET): "warm_reset",
+    (NETFN_SENSOR, CMD_GET_SENSOR_READING): "get_sensor_reading",
+    (NETFN_STORAGE, CMD_GET_SDR_REPOSITORY_INFO): "get_sdr_repository_info",
+    (NETFN_STORAGE, CMD_RESERVE_SDR_REPOSITORY): "reserve_sdr_repository",
+    (NETFN_STORAGE, CMD_GET_SDR): "get_sdr",
+}
+
+BREAKER_STATES = {CLOSED: 0, HALF_OPEN: 1}
+
+
+def command_name(request):
+    """Low-cardinality label for a request: set_duty, get_fan_mode, ..."""
+    kind = classify(request)
+    if kind is not None:
+        target, _, value = kind
+        return ("get_" if value is None else "set_") + ("duty" if target == "duty" else "fan_mode")
+    return COMMAND_NAMES.get(
+        (request.netfn, request.command), f"0x{request.netfn:02x}_0x{request.command:02x}"
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    """Metric families rendered in the Prometheus text format
+
+    collectors are called before every render to refresh gauges mirrored
+    from other objects (queue depth, cache counters); the text is rebuilt
+    only when a value changed since the last scrape.
+    """
+
+    def __init__(self):
+        self.families = []
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.version = 0
+        self.rendered_version = -1
+        self.text = b""
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def _register(self, family):
+        self.families.append(family)
+        return family
+
+    def add_collector(self, callback):
+        self.collectors.append(callback)
+
+    def render(self):
+        """The exposition text as bytes"""
+        for collect in self.collectors:
+            collect()
+        with self.lock:
+            if self.rendered_version != self.version:
+                self.text = "".join(f.render() for f in self.families).encode("utf-8")
+                self.rendered_version = self.version
+            return self.text
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.header = f"# HELP {name} {help}\n# TYPE {name} {self.kind}\n"
+        self.labelnames = tuple(labelnames)
+        # label values -> [line prefix, value]
+        self.series = {}
+
+    def _series(self, labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [
+                self.name + _labels(self.labelnames, labels) + " ",
+                0,
+            ]
+        return series
+
+    def inc(self, labels=(), amount=1):
+        with self.registry.lock:
+            self._series(labels)[1] += amount
+            self.registry.version += 1
+
+    def set(self, value, labels=()):
+        """Set the value, for counters and gauges mirrored from elsewhere"""
+        with self.registry.lock:
+            series = self._series(labels)
+            if series[1] != value:
+                series[1] = value
+                self.registry.version += 1
+
+    def remove(self, labels=()):
+        with self.registry.lock:
+            if self.series.pop(labels, None) is not None:
+                self.registry.version += 1
+
+    def render(self):
+        return self.header + "".join(
+            f"{prefix}{_number(value)}\n" for prefix, value in self.series.values()
+        )
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.header = f"# HELP {name} {help}\n# TYPE {name} {self.kind}\n"
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # label values -> (bucket line prefixes, sum/count prefixes, [counts..., sum, count])
+        self.series = {}
+
+    def _series(self, labels):
+        series = self.series.get(labels)
+        if series is None:
+            names = self.labelnames + ("le",)
+            bucket_prefixes = [
+                f"{self.name}_bucket{_labels(names, labels + (_number(le),))} "
+                for le in self.buckets
+            ]
+            plain = _labels(self.labelnames, labels)
+            series = self.series[labels] = (
+                bucket_prefixes,
+                (f"{self.name}_sum{plain} ", f"{self.name}_count{plain} "),
+                [0] * len(self.buckets) + [0.0, 0],
+            )
+        return series
+
+    def observe(self, value, labels=()):
+        with self.registry.lock:
+            values = self._series(labels)[2]
+            # Buckets are cumulative
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+            self.registry.version += 1
+
+    def render(self):
+        lines = [self.header]
+        for bucket_prefixes, (sum_prefix, count_prefix), values in self.series.values():
+            for prefix, count in zip(bucket_prefixes, values):
+                lines.append(f"{prefix}{count}\n")
+            lines.append(f"{sum_prefix}{_number(values[-2])}\n{count_prefix}{values[-1]}\n")
+        return "".join(lines)
+
+
+class FanMetrics:
+    """The metric families of one FanControl session
+
+    Add on_result as an executor listener and on_readings as a sensor
+    poller listener. executor, state_cache and breaker are optional and
+    read at scrape time from memory.
+    """
+
+    def __init__(self, host, executor=None, state_cache=None, breaker=None):
+        self.host = host
+        self.executor = executor
+        self.state_cache = state_cache
+        self.breaker = breaker
+        self.registry = r = Registry()
+        self.duration = r.histogram(
+            "fan_lord_command_duration_seconds",
+            "Time spent sending a command and waiting for the BMC.",
+            ("host", "command"),
+        )
+        self.commands = r.counter(
+            "fan_lord_commands_total",
+            "Executed commands by outcome (ok, error, timeout, circuit_open).",
+            ("host", "command", "result"),
+        )
+        self.queue_depth = r.gauge(
+            "fan_lord_command_queue_depth", "Commands waiting to be sent."
+        )
+        self.target_duty = r.gauge(
+            "fan_lord_target_duty_percent",
+            "Duty cycle last written to each fan zone.",
+            ("host", "zone"),
+        )
+        self.cache_hits = r.counter(
+            "fan_lord_state_cache_hits_total", "Fan writes skipped because the BMC already had the value."
+        )
+        self.cache_misses = r.counter(
+            "fan_lord_state_cache_misses_total", "Fan writes sent to the BMC."
+        )
+        self.cache_invalidations = r.counter(
+            "fan_lord_state_cache_invalidations_total", "Cached fan state dropped."
+        )
+        self.breaker_state = r.gauge(
+            "fan_lord_circuit_breaker_state",
+            "BMC circuit breaker: 0 closed, 1 half-open, 2 open.",
+            ("host",),
+        )
+        self.fan_rpm = r.gauge(
+            "fan_lord_fan_rpm", "Fan speed at the last sensor poll.", ("host", "sensor")
+        )
+        self.temperature = r.gauge(
+            "fan_lord_temperature_celsius",
+            "Temperature at the last sensor poll.",
+            ("host", "sensor"),
+        )
+        self.last_poll = r.gauge(
+            "fan_lord_sensor_poll_timestamp_seconds", "Unix time of the last sensor poll."
+        )
+        r.add_collector(self.collect)
+
+    def on_result(self, result):
+        """Executor listener"""
+        name = command_name(result.request)
+        error = result.error
+        if error is None:
+            outcome = "ok"
+        elif isinstance(error, CommandCancelled):
+            return
+        elif isinstance(error, CircuitOpen):
+            outcome = "circuit_open"
+        elif isinstance(error, IPMITimeout):
+            outcome = "timeout"
+        else:
+            outcome = "error"
+        self.commands.inc((result.host, name, outcome))
+        if outcome != "circuit_open" and result.latency is not None:
+            self.duration.observe(result.latency, (result.host, name))
+        if error is None:
+            kind = classify(result.request)
+            if kind is not None and kind[0] == "duty" and kind[2] is not None:
+                self.target_duty.set(kind[2], (result.host, str(kind[1])))
+
+    def on_readings(self, readings):
+        """Sensor poller listener"""
+        latest = 0
+        for reading in readings:
+            if reading.sensor_type == SENSOR_TYPE_FAN:
+                family = self.fan_rpm
+            elif reading.sensor_type == SENSOR_TYPE_TEMPERATURE:
+                family = self.temperature
+            else:
+                continue
+            labels = (self.host, reading.name)
+            if reading.value is None:
+                family.remove(labels)
+            else:
+                family.set(reading.value, labels)
+            latest = max(latest, reading.timestamp)
+        if latest:
+            self.last_poll.set(latest)
+
+    def collect(self):
+        if self.executor is not None:
+            self.queue_depth.set(self.executor.queue_depth())
+        if self.state_cache is not None:
+            stats = self.state_cache.stats()
+            self.cache_hits.set(stats["hits"])
+            self.cache_misses.set(stats["misses"])
+            self.cache_invalidations.set(stats["invalidations"])
+        if self.breaker is not None:
+            self.breaker_state.set(BREAKER_STATES.get(self.breaker.state, 2), (self.breaker.name,))
+
+    def render(self):
+        return self.registry.render()
+
+
+class MetricsServer:
+    """Serves a registry at http://address:port/metrics from a daemon thread"""
+
+    def __init__(self, registry, address="127.0.0.1", port=9419):
+        self.registry = registry
+        self.address = address
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        # Not at module level: http.server costs the command line ~40 ms to import
+        import http.server
+
+        registry = self.registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((self.address, self.port), Handler)
+        self.server.daemon_threads = True
+        # Port 0 picks a free port
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
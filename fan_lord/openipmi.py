@@ -0,0 +1,209 @@
+"""In-band backend for the Linux kernel IPMI driver (/dev/ipmi0)
+
+Talks to the local BMC through the OpenIPMI character device with the
+IPMICTL_SEND_COMMAND and IPMICTL_RECEIVE_MSG_TRUNC ioctls: no subprocess
+and no network, a raw command costs one KCS/SSIF transaction. Needs the
+ipmi_devintf and ipmi_si (or ipmi_ssif) modules and read/write access to
+the device node.
+"""
+import ctypes
+import errno
+import itertools
+import os
+import select
+import threading
+import time
+
+from .backend import Backend
+from .ipmi import IPMIError, IPMITimeout, check_response
+
+DEVICE_PATHS = ("/dev/ipmi0", "/dev/ipmi/0", "/dev/ipmidev/0")
+
+IPMI_SYSTEM_INTERFACE_ADDR_TYPE = 0x0C
+IPMI_BMC_CHANNEL = 0x0F
+IPMI_RESPONSE_RECV_TYPE = 1
+IPMI_MAX_MSG_LENGTH = 272
+# sizeof(struct ipmi_addr) is 38, leave room
+IPMI_MAX_ADDR_LENGTH = 64
+
+
+class IpmiMsg(ctypes.Structure):
+    _fields_ = [
+        ("netfn", ctypes.c_ubyte),
+        ("cmd", ctypes.c_ubyte),
+        ("data_len", ctypes.c_ushort),
+        ("data", ctypes.POINTER(ctypes.c_ubyte)),
+    ]
+
+
+class IpmiSystemInterfaceAddr(ctypes.Structure):
+    _fields_ = [
+        ("addr_type", ctypes.c_int),
+        ("channel", ctypes.c_short),
+        ("lun", ctypes.c_ubyte),
+    ]
+
+
+class IpmiReq(ctypes.Structure):
+    _fields_ = [
+        ("addr", ctypes.POINTER(ctypes.c_ubyte)),
+        ("addr_len", ctypes.c_uint),
+        ("msgid", ctypes.c_long),
+        ("msg", IpmiMsg),
+    ]
+
+
+class IpmiRecv(ctypes.Structure):
+    _fields_ = [
+        ("recv_type", ctypes.c_int),
+        ("addr", ctypes.POINTER(ctypes.c_ubyte)),
+        ("addr_len", ctypes.c_uint),
+        ("msgid", ctypes.c_long),
+        ("msg", IpmiMsg),
+    ]
+
+
+def _ioc(direction, number, size):
+    # asm-generic encoding (x86, arm); linux/ipmi.h uses magic 'i'
+    return direction << 30 | size << 16 | ord("i") << 8 | number
+
+
+IOC_WRITE = 1
+IOC_READ = 2
+IPMICTL_RECEIVE_MSG_TRUNC = _ioc(IOC_READ | IOC_WRITE, 11, ctypes.sizeof(IpmiRecv))
+IPMICTL_SEND_COMMAND = _ioc(IOC_READ, 13, ctypes.sizeof(IpmiReq))
+
+
+def find_device():
+    """Path of the first IPMI device node present, or None"""
+    for path in DEVICE_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class OpenIPMIBackend(Backend):
+    """Raw commands through the kernel IPMI driver
+
+    Requests of a raw_many batch are all handed to the driver at once and
+    matched to their replies by message id. open_device and ioctl default
+    to os.open and fcntl.ioctl; simulator.FakeIPMIDevice provides
+    stand-ins so the backend runs without the driver.
+    """
+
+    name = "openipmi"
+
+    def __init__(self, device=None, timeout=5.0, open_device=None, ioctl=None):
+        super().__init__()
+        self.device = device or find_device() or DEVICE_PATHS[0]
+        self.timeout = timeout
+        if ioctl is None:
+            import fcntl
+
+            ioctl = fcntl.ioctl
+        self.ioctl = ioctl
+        self.open_device = open_device or os.open
+        self.fd = None
+        self.msgids = itertools.count(1)
+        self.lock = threading.Lock()
+        # Every request goes to the BMC on the system interface
+        self._addr = IpmiSystemInterfaceAddr(
+            IPMI_SYSTEM_INTERFACE_ADDR_TYPE, IPMI_BMC_CHANNEL, 0
+        )
+        self._recv_addr = (ctypes.c_ubyte * IPMI_MAX_ADDR_LENGTH)()
+        self._recv_data = (ctypes.c_ubyte * IPMI_MAX_MSG_LENGTH)()
+
+    def _ensure_open(self):
+        if self.fd is not None:
+            return
+        try:
+            self.fd = self.open_device(self.device, os.O_RDWR)
+        except FileNotFoundError:
+            raise IPMIError(
+                f"{self.device} not found, load the ipmi_devintf and ipmi_si kernel modules"
+            )
+        except PermissionError:
+            raise IPMIError(f"No permission to open {self.device}, run as root")
+        except OSError as e:
+            raise IPMIError(f"Cannot open {self.device}: {e}")
+
+    def _send(self, request, msgid):
+        data = bytes(request.data)
+        buffer = (ctypes.c_ubyte * max(1, len(data))).from_buffer_copy(data or b"\x00")
+        req = IpmiReq(
+            ctypes.cast(ctypes.pointer(self._addr), ctypes.POINTER(ctypes.c_ubyte)),
+            ctypes.sizeof(self._addr),
+            msgid,
+            IpmiMsg(request.netfn, request.command, len(data), buffer),
+        )
+        try:
+            self.ioctl(self.fd, IPMICTL_SEND_COMMAND, req)
+        except OSError as e:
+            raise IPMIError(f"Sending to {self.device} failed: {e}")
+
+    def _receive(self):
+        """(recv_type, msgid, completion code + data), None if nothing is queued"""
+        recv = IpmiRecv(
+            0,
+            ctypes.cast(self._recv_addr, ctypes.POINTER(ctypes.c_ubyte)),
+            IPMI_MAX_ADDR_LENGTH,
+            0,
+            IpmiMsg(0, 0, IPMI_MAX_MSG_LENGTH, self._recv_data),
+        )
+        try:
+            self.ioctl(self.fd, IPMICTL_RECEIVE_MSG_TRUNC, recv)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return None
+            # EMSGSIZE still delivers the truncated message
+            if e.errno != errno.EMSGSIZE:
+                raise IPMIError(f"Reading from {self.device} failed: {e}")
+        return recv.recv_type, recv.msgid, ctypes.string_at(self._recv_data, recv.msg.data_len)
+
+    def raw(self, request, timeout=None):
+        response = self.raw_many([request], timeout)[0]
+        if isinstance(response, IPMIError):
+            raise response
+        return response
+
+    def raw_many(self, requests, timeout=None):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        results = [None] * len(requests)
+        with self.lock:
+            self._ensure_open()
+            pending = {}
+            for index, request in enumerate(requests):
+                msgid = next(self.msgids)
+                self._send(request, msgid)
+                pending[msgid] = index
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([self.fd], [], [], remaining)
+                if not readable:
+                    break
+                message = self._receive()
+                if message is None:
+                    continue
+                recv_type, msgid, response = message
+                # Events, or late replies to requests that already timed out
+                if recv_type != IPMI_RESPONSE_RECV_TYPE or msgid not in pending:
+                    continue
+                index = pending.pop(msgid)
+                try:
+                    results[index] = check_response(response)
+                except IPMIError as e:
+                    results[index] = e
+        for index in pending.values():
+            results[index] = IPMITimeout(f"No response from the BMC on {self.device}")
+        return results
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.device}>"
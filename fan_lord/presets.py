@@ -0,0 +1,26 @@
+"""Preset fan profiles"""
+from .ipmi import CPU_ZONE, PERIPHERAL_ZONE, set_duty_request
+
+# Preset name -> duty cycle per zone
+PRESETS = {
+    "silent": {CPU_ZONE: 40, PERIPHERAL_ZONE: 40},
+    "performance": {CPU_ZONE: 50, PERIPHERAL_ZONE: 100},
+    "full_speed": {CPU_ZONE: 100, PERIPHERAL_ZONE: 100},
+}
+
+
+def preset_duties(name, zones=(CPU_ZONE, PERIPHERAL_ZONE)):
+    """{zone: duty} of a preset on a board with these fan zones
+
+    Zones beyond CPU and peripheral, found on some X11/X12 boards, take
+    the peripheral duty; zones the board lacks are left out.
+    """
+    duties = PRESETS[name]
+    return {zone: duties.get(zone, duties[PERIPHERAL_ZONE]) for zone in zones}
+
+
+def preset_requests(name, zones=(CPU_ZONE, PERIPHERAL_ZONE)):
+    """Duty cycle writes making up a preset on a board with these fan zones"""
+    if name not in PRESETS:
+        raise ValueError(f"Unknown preset: {name}")
+    return [set_duty_request(zone, duty) for zone, duty in preset_duties(name, zones).items()]
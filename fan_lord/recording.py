@@ -0,0 +1,224 @@
+"""Record the raw IPMI traffic of a session and replay it without a BMC
+
+A recording is a gzip stream: a short JSON header (host, backend, start
+time) followed by one fixed-size record per request with the offset from
+the start, the latency, the request bytes and the outcome. A fan write
+takes about 20 bytes before compression.
+
+    python -m fan_lord --record session.rec preset silent
+    python -m fan_lord --replay session.rec preset silent
+"""
+import collections
+import gzip
+import json
+import struct
+import threading
+import time
+
+from .backend import Backend
+from .ipmi import IPMIError, IPMITimeout, Request, completion_error
+
+MAGIC = b"FLREC\x01"
+HEADER = struct.Struct("<H")
+# offset, latency, netfn, command, status, completion code, request and response length
+RECORD = struct.Struct("<dfBBBBHH")
+
+OK = 0
+COMPLETION_CODE = 1
+TIMEOUT = 2
+ERROR = 3
+# Completion code of a request the replay has no answer for
+CC_NOT_RECORDED = 0xC1
+
+
+class Exchange(
+    collections.namedtuple(
+        "Exchange", ["offset", "latency", "request", "status", "completion_code", "response"]
+    )
+):
+    """One recorded request and its outcome"""
+
+    __slots__ = ()
+
+    def result(self):
+        """The recorded response data, or raise the recorded error"""
+        if self.status == OK:
+            return self.response
+        if self.status == COMPLETION_CODE:
+            raise completion_error(self.completion_code)
+        message = self.response.decode("utf-8", "replace")
+        if self.status == TIMEOUT:
+            raise IPMITimeout(message)
+        raise IPMIError(message)
+
+
+def _outcome(result):
+    """(status, completion code, response bytes) of a response or IPMIError"""
+    if not isinstance(result, IPMIError):
+        return OK, 0, bytes(result)
+    if result.completion_code is not None:
+        return COMPLETION_CODE, result.completion_code, b""
+    status = TIMEOUT if isinstance(result, IPMITimeout) else ERROR
+    return status, 0, str(result).encode("utf-8")[:0xFFFF]
+
+
+class RecordingWriter:
+    """Appends exchanges to a recording file"""
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.file = gzip.open(path, "wb")
+        header = json.dumps(metadata).encode("utf-8")
+        self.file.write(MAGIC + HEADER.pack(len(header)) + header)
+        self.started = time.monotonic()
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def write(self, started, latency, request, result):
+        status, code, response = _outcome(result)
+        record = RECORD.pack(
+            started - self.started,
+            latency,
+            request.netfn,
+            request.command,
+            status,
+            code,
+            len(request.data),
+            len(response),
+        )
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(record + request.data + response)
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_recording(path):
+    """(metadata, [Exchange, ...]) of a recording file"""
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a fan-lord recording")
+    position = len(MAGIC)
+    (length,) = HEADER.unpack_from(data, position)
+    position += HEADER.size
+    metadata = json.loads(data[position : position + length])
+    position += length
+    exchanges = []
+    while position < len(data):
+        offset, latency, netfn, command, status, code, request_len, response_len = (
+            RECORD.unpack_from(data, position)
+        )
+        position += RECORD.size
+        request = Request(netfn, command, data[position : position + request_len])
+        position += request_len
+        response = data[position : position + response_len]
+        position += response_len
+        exchanges.append(Exchange(offset, latency, request, status, code, response))
+    return metadata, exchanges
+
+
+class RecordingBackend(Backend):
+    """Wraps a transport and writes every request and its outcome to path
+
+    Requests of a raw_many batch are recorded with an equal share of the
+    batch latency, so a realtime replay takes as long as the batch did.
+    """
+
+    def __init__(self, backend, path):
+        super().__init__()
+        self.backend = backend
+        self.name = backend.name
+        self.host = backend.host
+        self.exclusive = getattr(backend, "exclusive", True)
+        self.writer = RecordingWriter(
+            path, {"host": backend.host, "backend": backend.name, "started": time.time()}
+        )
+
+    def __getattr__(self, name):
+        # exe_path, port, sessions_opened, ... of the wrapped backend
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def raw(self, request, timeout=None):
+        started = time.monotonic()
+        try:
+            response = self.backend.raw(request, timeout)
+        except IPMIError as e:
+            self.writer.write(started, time.monotonic() - started, request, e)
+            raise
+        self.writer.write(started, time.monotonic() - started, request, response)
+        return response
+
+    def raw_many(self, requests, timeout=None):
+        requests = list(requests)
+        started = time.monotonic()
+        responses = self.backend.raw_many(requests, timeout)
+        share = (time.monotonic() - started) / max(1, len(requests))
+        for index, (request, response) in enumerate(zip(requests, responses)):
+            self.writer.write(started + index * share, share, request, response)
+        return responses
+
+    def close(self):
+        try:
+            self.backend.close()
+        finally:
+            self.writer.close()
+
+
+class ReplayBackend(Backend):
+    """Answers requests from a recording instead of a BMC
+
+    Each distinct request gets its recorded responses in order, so a poll
+    loop and a slider can interleave differently from the recording. With
+    loop the responses of a request start over once used up; a request
+    that was never recorded fails with completion code 0xC1. realtime
+    waits the recorded latency (divided by speed) before answering,
+    otherwise answers come back as fast as possible, which leaves only the
+    application's own overhead to measure.
+    """
+
+    name = "replay"
+
+    def __init__(self, path, realtime=False, speed=1.0, loop=True):
+        super().__init__()
+        self.metadata, self.exchanges = read_recording(path)
+        self.host = self.metadata.get("host") or "replay"
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+        self.recorded = collections.defaultdict(list)
+        for exchange in self.exchanges:
+            self.recorded[exchange.request].append(exchange)
+        self.queues = {request: collections.deque(e) for request, e in self.recorded.items()}
+        self.replayed = 0
+        self.lock = threading.Lock()
+
+    def _next(self, request):
+        with self.lock:
+            queue = self.queues.get(request)
+            if not queue and self.loop and request in self.recorded:
+                queue = self.queues[request] = collections.deque(self.recorded[request])
+            if not queue:
+                return None
+            self.replayed += 1
+            return queue.popleft()
+
+    def raw(self, request, timeout=None):
+        exchange = self._next(request)
+        if exchange is None:
+            raise IPMIError(f"{request} is not in the recording", CC_NOT_RECORDED)
+        if self.realtime:
+            delay = exchange.latency / self.speed
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                raise IPMITimeout(f"Recorded latency {exchange.latency * 1000:.0f} ms exceeds timeout")
+            time.sleep(delay)
+        return exchange.result()
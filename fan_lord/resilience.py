@@ -0,0 +1,295 @@
+"""Deadlines, retries and a per-host circuit breaker around a backend"""
+import random
+import threading
+import time
+
+from .backend import Backend
+from .executor import CommandCancelled
+from .ipmi import IPMIError
+from .state_cache import classify
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Completion codes that mean "try again later" rather than "no"
+BUSY_CODES = (0xC0, 0xC3)
+
+
+class CircuitOpen(IPMIError):
+    """The BMC stopped answering, the request was not sent"""
+
+
+def is_idempotent(request):
+    """Fan duty/mode writes and read-backs can be sent twice safely"""
+    return classify(request) is not None
+
+
+def is_unreachable(error):
+    """The BMC did not answer at all (timeout, network or session error)
+
+    A command the daemon cancelled because a newer write superseded it
+    was never sent, so it says nothing about the BMC and is not retried.
+    """
+    return error.completion_code is None and not isinstance(
+        error, (CircuitOpen, CommandCancelled)
+    )
+
+
+def is_transient(error):
+    return is_unreachable(error) or error.completion_code in BUSY_CODES
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter
+
+    Attempt n waits a random time up to base_delay * 2**n, capped at
+    max_delay, so hosts retrying at once spread out instead of colliding.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.1, max_delay=1.0, rng=None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt):
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class CircuitBreaker:
+    """Fails fast while a host is unresponsive
+
+    After failure_threshold requests in a row got no answer the breaker
+    opens and requests raise CircuitOpen without touching the network.
+    After reset_timeout seconds one request is let through as a probe
+    (half-open): an answer closes the breaker, silence opens it again.
+    Listeners are called with the breaker on every state change.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=10.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def retry_in(self):
+        """Seconds until the next probe, 0 unless open"""
+        if self.state != OPEN:
+            return 0
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def before_request(self):
+        """Raise CircuitOpen unless a request may be sent now"""
+        with self.lock:
+            changed = False
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpen(
+                        f"{self.name} is not responding, next attempt in {self.retry_in():.0f}s"
+                    )
+                self.state = HALF_OPEN
+                changed = True
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    raise CircuitOpen(f"{self.name} is not responding, probe in progress")
+                self.probing = True
+        if changed:
+            self._notify()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            changed = self.state != CLOSED
+            self.state = CLOSED
+        if changed:
+            self._notify()
+
+    def record_skipped(self):
+        """The request was not sent after all, free the probe slot"""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            changed = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                changed = self.state != OPEN
+                self.state = OPEN
+                self.opened_at = self.clock()
+        if changed:
+            self._notify()
+
+    def _notify(self):
+        for listener in list(self.listeners):
+            listener(self)
+
+    def __repr__(self):
+        return f"<CircuitBreaker {self.name} {self.state}>"
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per host name, kept across fleet runs"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+                self.breakers[name] = breaker
+            return breaker
+
+    def open_hosts(self):
+        with self.lock:
+            return [name for name, b in self.breakers.items() if b.state != CLOSED]
+
+
+def retry_policy(config):
+    """RetryPolicy from the "resilience" config section"""
+    return RetryPolicy(config["attempts"], config["base_delay"], config["max_delay"])
+
+
+def breaker_registry(config):
+    """BreakerRegistry from the "resilience" config section"""
+    return BreakerRegistry(config["failure_threshold"], config["reset_timeout"])
+
+
+class ResilientBackend(Backend):
+    """Wraps a backend with a circuit breaker and retries
+
+    The timeout passed to raw() is a deadline for the whole call including
+    retries. Idempotent requests (fan writes and read-backs) that got no
+    answer or a busy completion code are retried with jittered exponential
+    backoff while the deadline allows; everything else is sent once.
+    """
+
+    def __init__(self, backend, breaker=None, retry=None):
+        super().__init__()
+        self.backend = backend
+        self.name = backend.name
+        self.host = backend.host
+        self.exclusive = getattr(backend, "exclusive", True)
+        self.breaker = breaker or CircuitBreaker(backend.host)
+        self.retry = retry or RetryPolicy()
+
+    def __getattr__(self, name):
+        # exe_path, port, sessions_opened, ... of the wrapped backend
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def _call(self, send, payload, deadline):
+        """send(payload, timeout) guarded by the breaker; send records successes"""
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+        self.breaker.before_request()
+        try:
+            result = send(payload, timeout)
+        except CommandCancelled:
+            self.breaker.record_skipped()
+            raise
+        except IPMIError as e:
+            if is_unreachable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        return result
+
+    def _send_one(self, request, timeout):
+        response = self.backend.raw(request, timeout)
+        self.breaker.record_success()
+        return response
+
+    def _backoff(self, attempt, deadline):
+        """Sleep before another attempt, False if there is no time or attempt left"""
+        if attempt + 1 >= self.retry.attempts:
+            return False
+        delay = self.retry.delay(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def raw(self, request, timeout=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        retryable = is_idempotent(request)
+        attempt = 0
+        error = None
+        while True:
+            try:
+                return self._call(self._send_one, request, deadline)
+            except CircuitOpen:
+                if error is not None:
+                    # The failures so far opened the breaker, report the real one
+                    raise error from None
+                raise
+            except IPMIError as e:
+                error = e
+                if not (retryable and is_transient(e)) or not self._backoff(attempt, deadline):
+                    raise
+            attempt += 1
+
+    def raw_many(self, requests, timeout=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        requests = list(requests)
+        results = [None] * len(requests)
+        pending = list(range(len(requests)))
+        attempt = 0
+        while True:
+            try:
+                responses = self._call(self._send_many, [requests[i] for i in pending], deadline)
+            except CircuitOpen:
+                if attempt:
+                    return results
+                raise
+            for index, response in zip(pending, responses):
+                results[index] = response
+            pending = [
+                index
+                for index in pending
+                if isinstance(results[index], IPMIError)
+                and is_transient(results[index])
+                and is_idempotent(requests[index])
+            ]
+            if not pending or not self._backoff(attempt, deadline):
+                return results
+            attempt += 1
+
+    def _send_many(self, requests, timeout):
+        responses = self.backend.raw_many(requests, timeout)
+        # Superseded requests were never sent and say nothing about the BMC
+        sent = [r for r in responses if not isinstance(r, CommandCancelled)]
+        if responses and not sent:
+            self.breaker.record_skipped()
+        elif sent and all(isinstance(r, IPMIError) and is_unreachable(r) for r in sent):
+            # Nothing came back, count it against the breaker
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return responses
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,382 @@
+"""RMCP / RMCP+ packet codec shared by the LAN backend and the BMC simulator"""
+import hashlib
+import hmac
+import os
+import struct
+from collections import namedtuple
+
+from .ipmi import Request, checksum
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # AES is optional, cipher suites 1 and 2 work without it
+    Cipher = None
+
+RMCP_CLASS_ASF = 0x06
+RMCP_CLASS_IPMI = 0x07
+ASF_IANA = 0x000011BE
+ASF_PING = 0x80
+ASF_PONG = 0x40
+
+AUTH_TYPE_NONE = 0x00
+AUTH_TYPE_RMCP_PLUS = 0x06
+
+PAYLOAD_IPMI = 0x00
+PAYLOAD_OPEN_SESSION_REQUEST = 0x10
+PAYLOAD_OPEN_SESSION_RESPONSE = 0x11
+PAYLOAD_RAKP1 = 0x12
+PAYLOAD_RAKP2 = 0x13
+PAYLOAD_RAKP3 = 0x14
+PAYLOAD_RAKP4 = 0x15
+
+BMC_ADDRESS = 0x20
+CONSOLE_ADDRESS = 0x81
+
+# RAKP status codes
+STATUS_OK = 0x00
+STATUS_INSUFFICIENT_RESOURCES = 0x01
+STATUS_INVALID_SESSION_ID = 0x02
+STATUS_UNAUTHORIZED_NAME = 0x0D
+STATUS_INVALID_INTEGRITY_VALUE = 0x0F
+STATUS_NO_CIPHER_SUITE_MATCH = 0x11
+
+# Cipher suite: (authentication, integrity, confidentiality) algorithm IDs.
+# Only the HMAC-SHA1 / HMAC-SHA1-96 / AES-CBC-128 family is implemented.
+CIPHER_SUITES = {
+    1: (0x01, 0x00, 0x00),
+    2: (0x01, 0x01, 0x00),
+    3: (0x01, 0x01, 0x01),
+}
+
+Packet = namedtuple(
+    "Packet",
+    ["msg_class", "auth_type", "payload_type", "session_id", "sequence", "payload"],
+)
+
+
+def best_cipher_suite():
+    """Strongest cipher suite supported by the installed libraries"""
+    return 3 if Cipher is not None else 2
+
+
+def rmcp_header(msg_class):
+    # Version 1.0, reserved, no RMCP ACK
+    return bytes([0x06, 0x00, 0xFF, msg_class])
+
+
+def encode_ipmi_request(request, seq, rq_addr=CONSOLE_ADDRESS):
+    """Wrap a request in an IPMB-style LAN message"""
+    header = bytes([BMC_ADDRESS, request.netfn << 2])
+    body = bytes([rq_addr, (seq & 0x3F) << 2, request.command]) + request.data
+    return header + bytes([checksum(header)]) + body + bytes([checksum(body)])
+
+
+def decode_ipmi_request(message):
+    """Returns (request, seq, rq_addr) from a LAN message"""
+    if len(message) < 7 or checksum(message[:3]) or checksum(message[3:]):
+        raise ValueError("Malformed IPMI request")
+    request = Request(message[1] >> 2, message[5], message[6:-1])
+    return request, message[4] >> 2, message[3]
+
+
+def encode_ipmi_response(request, seq, response, rq_addr=CONSOLE_ADDRESS):
+    """Build the LAN message answering a request; response starts with the completion code"""
+    header = bytes([rq_addr, (request.netfn | 0x01) << 2])
+    body = bytes([BMC_ADDRESS, (seq & 0x3F) << 2, request.command]) + bytes(response)
+    return header + bytes([checksum(header)]) + body + bytes([checksum(body)])
+
+
+def decode_ipmi_response(message):
+    """Returns (netfn, command, seq, response) from a LAN message"""
+    if len(message) < 8 or checksum(message[:3]) or checksum(message[3:]):
+        raise ValueError("Malformed IPMI response")
+    return message[1] >> 2, message[5], message[4] >> 2, bytes(message[6:-1])
+
+
+class SessionKeys:
+    """Keys derived from the session integrity key (SIK)"""
+
+    def __init__(self, sik, cipher_suite):
+        _, integrity, confidentiality = CIPHER_SUITES[cipher_suite]
+        self.sik = sik
+        self.k1 = hmac.new(sik, b"\x01" * 20, hashlib.sha1).digest()
+        self.k2 = hmac.new(sik, b"\x02" * 20, hashlib.sha1).digest()
+        self.integrity = integrity != 0x00
+        self.confidentiality = confidentiality != 0x00
+        if self.confidentiality and Cipher is None:
+            raise ValueError("AES cipher suites need the 'cryptography' package")
+
+    def encrypt(self, payload):
+        # Pad with 1, 2, 3... followed by the pad length
+        pad = (16 - (len(payload) + 1) % 16) % 16
+        plain = bytes(payload) + bytes(range(1, pad + 1)) + bytes([pad])
+        iv = os.urandom(16)
+        encryptor = Cipher(algorithms.AES(self.k2[:16]), modes.CBC(iv)).encryptor()
+        return iv + encryptor.update(plain) + encryptor.finalize()
+
+    def decrypt(self, data):
+        if len(data) < 32 or len(data) % 16:
+            raise ValueError("Malformed encrypted payload")
+        decryptor = Cipher(
+            algorithms.AES(self.k2[:16]), modes.CBC(data[:16])
+        ).decryptor()
+        plain = decryptor.update(data[16:]) + decryptor.finalize()
+        return plain[: -plain[-1] - 1]
+
+    def auth_code(self, data):
+        return hmac.new(self.k1, data, hashlib.sha1).digest()[:12]
+
+
+def encode_v15(message):
+    """Session-less IPMI v1.5 packet, used before a session exists"""
+    return (
+        rmcp_header(RMCP_CLASS_IPMI)
+        + bytes([AUTH_TYPE_NONE])
+        + struct.pack("<IIB", 0, 0, len(message))
+        + message
+    )
+
+
+def encode_v20(payload_type, payload, session_id=0, sequence=0, keys=None):
+    """RMCP+ packet, authenticated and encrypted when keys are given"""
+    if keys is not None and keys.confidentiality:
+        payload = keys.encrypt(payload)
+        payload_type |= 0x80
+    if keys is not None and keys.integrity:
+        payload_type |= 0x40
+    packet = (
+        bytes([AUTH_TYPE_RMCP_PLUS, payload_type])
+        + struct.pack("<IIH", session_id, sequence, len(payload))
+        + bytes(payload)
+    )
+    if keys is not None and keys.integrity:
+        # Pad so that everything up to the auth code is 4 byte aligned
+        pad = (4 - (len(packet) + 2) % 4) % 4
+        packet += b"\xff" * pad + bytes([pad, 0x07])
+        packet += keys.auth_code(packet)
+    return rmcp_header(RMCP_CLASS_IPMI) + packet
+
+
+def decode_packet(data, get_keys=None):
+    """Parse an RMCP datagram
+
+    get_keys(session_id) returns the SessionKeys used to verify and decrypt
+    RMCP+ session payloads. Raises ValueError for anything malformed or
+    failing authentication.
+    """
+    if len(data) < 4 or data[0] != 0x06:
+        raise ValueError("Not an RMCP packet")
+    msg_class = data[3] & 0x1F
+    if msg_class == RMCP_CLASS_ASF:
+        return Packet(msg_class, None, None, None, None, bytes(data[4:]))
+    if msg_class != RMCP_CLASS_IPMI or len(data) < 14:
+        raise ValueError("Unsupported RMCP message class")
+
+    auth_type = data[4]
+    if auth_type == AUTH_TYPE_NONE:
+        sequence, session_id, length = struct.unpack_from("<IIB", data, 5)
+        payload = bytes(data[14 : 14 + length])
+        if len(payload) != length:
+            raise ValueError("Truncated IPMI v1.5 packet")
+        return Packet(msg_class, auth_type, PAYLOAD_IPMI, session_id, sequence, payload)
+    if auth_type != AUTH_TYPE_RMCP_PLUS or len(data) < 16:
+        raise ValueError(f"Unsupported authentication type 0x{auth_type:02x}")
+
+    payload_type = data[5]
+    session_id, sequence, length = struct.unpack_from("<IIH", data, 6)
+    payload = bytes(data[16 : 16 + length])
+    if len(payload) != length:
+        raise ValueError("Truncated RMCP+ packet")
+    keys = None
+    if payload_type & 0xC0:
+        keys = get_keys(session_id) if get_keys else None
+        if keys is None:
+            raise ValueError(f"No session keys for session 0x{session_id:08x}")
+    if payload_type & 0x40:
+        signed, code = data[4:-12], data[-12:]
+        if not hmac.compare_digest(keys.auth_code(signed), code):
+            raise ValueError("Integrity check failed")
+    if payload_type & 0x80:
+        payload = keys.decrypt(payload)
+    return Packet(
+        msg_class, auth_type, payload_type & 0x3F, session_id, sequence, payload
+    )
+
+
+def presence_ping(tag):
+    """ASF Presence Ping"""
+    return rmcp_header(RMCP_CLASS_ASF) + struct.pack(">IBBBB", ASF_IANA, ASF_PING, tag, 0, 0)
+
+
+def presence_pong(tag, supports_ipmi=True):
+    """ASF Presence Pong advertising IPMI support"""
+    entities = 0x81 if supports_ipmi else 0x01
+    return rmcp_header(RMCP_CLASS_ASF) + struct.pack(
+        ">IBBBBIIBB6x", ASF_IANA, ASF_PONG, tag, 0, 16, ASF_IANA, 0, entities, 0
+    )
+
+
+def parse_asf(payload):
+    """Returns (message_type, tag, data) from an ASF payload"""
+    if len(payload) < 8:
+        raise ValueError("Truncated ASF message")
+    iana, msg_type, tag, _, length = struct.unpack_from(">IBBBB", payload)
+    if iana != ASF_IANA:
+        raise ValueError("Not an ASF message")
+    return msg_type, tag, payload[8 : 8 + length]
+
+
+def _algorithm_records(cipher_suite):
+    auth, integrity, confidentiality = CIPHER_SUITES[cipher_suite]
+    return b"".join(
+        bytes([kind, 0, 0, 8, alg, 0, 0, 0])
+        for kind, alg in enumerate((auth, integrity, confidentiality))
+    )
+
+
+def _parse_cipher_suite(records):
+    algs = tuple(records[i * 8 + 4] & 0x3F for i in range(3))
+    for suite, suite_algs in CIPHER_SUITES.items():
+        if suite_algs == algs:
+            return suite
+    return None
+
+
+def open_session_request(tag, console_session_id, cipher_suite, privilege=0):
+    return (
+        struct.pack("<BBxxI", tag, privilege, console_session_id)
+        + _algorithm_records(cipher_suite)
+    )
+
+
+def parse_open_session_request(payload):
+    """Returns (tag, privilege, console_session_id, cipher_suite)"""
+    if len(payload) < 32:
+        raise ValueError("Truncated Open Session Request")
+    tag, privilege, console_session_id = struct.unpack_from("<BBxxI", payload)
+    return tag, privilege, console_session_id, _parse_cipher_suite(payload[8:32])
+
+
+def open_session_response(
+    tag, status, privilege, console_session_id, managed_session_id, cipher_suite
+):
+    payload = struct.pack(
+        "<BBBxII", tag, status, privilege, console_session_id, managed_session_id
+    )
+    if status == STATUS_OK:
+        payload += _algorithm_records(cipher_suite)
+    return payload
+
+
+def parse_open_session_response(payload):
+    """Returns (tag, status, privilege, console_session_id, managed_session_id)"""
+    if len(payload) < 8:
+        raise ValueError("Truncated Open Session Response")
+    tag, status, privilege = struct.unpack_from("<BBB", payload)
+    if status != STATUS_OK:
+        return tag, status, privilege, None, None
+    console_session_id, managed_session_id = struct.unpack_from("<II", payload, 4)
+    return tag, status, privilege, console_session_id, managed_session_id
+
+
+def rakp1(tag, managed_session_id, console_random, role, username):
+    name = username.encode()
+    return (
+        struct.pack("<BxxxI", tag, managed_session_id)
+        + console_random
+        + struct.pack("<BxxB", role, len(name))
+        + name
+    )
+
+
+def parse_rakp1(payload):
+    """Returns (tag, managed_session_id, console_random, role, username)"""
+    if len(payload) < 28:
+        raise ValueError("Truncated RAKP 1")
+    tag, managed_session_id = struct.unpack_from("<BxxxI", payload)
+    role, length = struct.unpack_from("<BxxB", payload, 24)
+    username = payload[28 : 28 + length].decode(errors="replace")
+    return tag, managed_session_id, payload[8:24], role, username
+
+
+def rakp2(tag, status, console_session_id, managed_random, guid, auth_code):
+    payload = struct.pack("<BBxxI", tag, status, console_session_id)
+    if status == STATUS_OK:
+        payload += managed_random + guid + auth_code
+    return payload
+
+
+def parse_rakp2(payload):
+    """Returns (tag, status, console_session_id, managed_random, guid, auth_code)"""
+    tag, status, console_session_id = struct.unpack_from("<BBxxI", payload)
+    if status != STATUS_OK:
+        return tag, status, console_session_id, None, None, None
+    if len(payload) < 60:
+        raise ValueError("Truncated RAKP 2")
+    return tag, status, console_session_id, payload[8:24], payload[24:40], payload[40:60]
+
+
+def rakp3(tag, status, managed_session_id, auth_code):
+    return struct.pack("<BBxxI", tag, status, managed_session_id) + auth_code
+
+
+def parse_rakp3(payload):
+    """Returns (tag, status, managed_session_id, auth_code)"""
+    if len(payload) < 8:
+        raise ValueError("Truncated RAKP 3")
+    tag, status, managed_session_id = struct.unpack_from("<BBxxI", payload)
+    return tag, status, managed_session_id, payload[8:28]
+
+
+def rakp4(tag, status, console_session_id, icv):
+    return struct.pack("<BBxxI", tag, status, console_session_id) + icv
+
+
+def parse_rakp4(payload):
+    """Returns (tag, status, console_session_id, icv)"""
+    if len(payload) < 8:
+        raise ValueError("Truncated RAKP 4")
+    tag, status, console_session_id = struct.unpack_from("<BBxxI", payload)
+    return tag, status, console_session_id, payload[8:20]
+
+
+def _hmac(key, *parts):
+    return hmac.new(key, b"".join(parts), hashlib.sha1).digest()
+
+
+def _user_fields(role, username):
+    name = username.encode()
+    return bytes([role, len(name)]) + name
+
+
+def rakp2_auth_code(
+    password, console_session_id, managed_session_id, console_random,
+    managed_random, guid, role, username,
+):
+    return _hmac(
+        password.encode(),
+        struct.pack("<II", console_session_id, managed_session_id),
+        console_random,
+        managed_random,
+        guid,
+        _user_fields(role, username),
+    )
+
+
+def rakp3_auth_code(password, managed_random, console_session_id, role, username):
+    return _hmac(
+        password.encode(),
+        managed_random,
+        struct.pack("<I", console_session_id),
+        _user_fields(role, username),
+    )
+
+
+def session_integrity_key(password, console_random, managed_random, role, username):
+    return _hmac(
+        password.encode(), console_random, managed_random, _user_fields(role, username)
+    )
+
+
+def rakp4_icv(sik, console_random, managed_session_id, guid):
+    return _hmac(sik, console_random, struct.pack("<I", managed_session_id), guid)[:12]
@@ -0,0 +1,316 @@
+"""Sensor Data Record repository: parsing, downloading and on-disk caching"""
+import json
+import os
+import struct
+
+from .config import get_data_dir
+from .ipmi import (
+    IPMIError,
+    get_device_id_request,
+    get_sdr_repository_info_request,
+    get_sdr_request,
+    get_system_guid_request,
+    reserve_sdr_repository_request,
+)
+
+RECORD_FULL_SENSOR = 0x01
+RECORD_COMPACT_SENSOR = 0x02
+
+SENSOR_TYPE_TEMPERATURE = 0x01
+SENSOR_TYPE_VOLTAGE = 0x02
+SENSOR_TYPE_FAN = 0x04
+
+UNITS = {1: "°C", 4: "V", 18: "RPM"}
+
+LAST_RECORD_ID = 0xFFFF
+# Completion codes meaning "read the record in smaller pieces"
+PARTIAL_READ_CODES = (0xC7, 0xCA, 0xFF)
+RESERVATION_CANCELED = 0xC5
+CHUNK_SIZE = 16
+
+# Threshold -> (bit in the readable threshold mask, offset in a full record)
+THRESHOLDS = {
+    "lnc": (0, 41),
+    "lcr": (1, 40),
+    "lnr": (2, 39),
+    "unc": (3, 38),
+    "ucr": (4, 37),
+    "unr": (5, 36),
+}
+
+
+def _signed(value, bits):
+    return value - (1 << bits) if value & (1 << (bits - 1)) else value
+
+
+class SensorRecord:
+    """The parts of a sensor SDR needed to read and convert the sensor"""
+
+    def __init__(
+        self,
+        record_id,
+        number,
+        name,
+        sensor_type,
+        unit_code=0,
+        owner=0x20,
+        lun=0,
+        entity=0,
+        analog_format=0,
+        m=1,
+        b=0,
+        b_exp=0,
+        r_exp=0,
+        thresholds=None,
+        linear=True,
+    ):
+        self.record_id = record_id
+        self.number = number
+        self.name = name
+        self.sensor_type = sensor_type
+        self.unit_code = unit_code
+        self.owner = owner
+        self.lun = lun
+        self.entity = entity
+        self.analog_format = analog_format
+        self.m = m
+        self.b = b
+        self.b_exp = b_exp
+        self.r_exp = r_exp
+        # Raw threshold values, e.g. {"lcr": 4}
+        self.thresholds = thresholds or {}
+        # Compact records and non-linear sensors can't be converted
+        self.linear = linear
+
+    @property
+    def unit(self):
+        return UNITS.get(self.unit_code, "")
+
+    def convert(self, raw):
+        """Convert a raw reading byte to engineering units"""
+        if self.analog_format == 1:
+            raw = -(~raw & 0x7F) if raw & 0x80 else raw
+        elif self.analog_format == 2:
+            raw = _signed(raw, 8)
+        value = (self.m * raw + self.b * 10**self.b_exp) * 10**self.r_exp
+        return round(value, 3)
+
+    def threshold(self, name):
+        """A threshold in engineering units, or None"""
+        raw = self.thresholds.get(name)
+        return None if raw is None else self.convert(raw)
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        return f"<SensorRecord #{self.number} {self.name}>"
+
+
+def parse_record(data):
+    """Parse a full or compact sensor record, returns None for other record types"""
+    if len(data) < 5:
+        raise ValueError("Truncated SDR")
+    record_id, _, record_type, _ = struct.unpack_from("<HBBB", data)
+    if record_type == RECORD_FULL_SENSOR:
+        if len(data) < 48:
+            raise ValueError("Truncated full sensor record")
+        m = _signed(data[24] | (data[25] & 0xC0) << 2, 10)
+        b = _signed(data[26] | (data[27] & 0xC0) << 2, 10)
+        name_length = data[47] & 0x1F
+        thresholds = {
+            name: data[offset]
+            for name, (bit, offset) in THRESHOLDS.items()
+            if data[18] & (1 << bit)
+        }
+        return SensorRecord(
+            record_id,
+            number=data[7],
+            name=data[48 : 48 + name_length].decode(errors="replace"),
+            sensor_type=data[12],
+            unit_code=data[21],
+            owner=data[5],
+            lun=data[6] & 0x03,
+            entity=data[8],
+            analog_format=data[20] >> 6,
+            m=m,
+            b=b,
+            b_exp=_signed(data[29] & 0x0F, 4),
+            r_exp=_signed(data[29] >> 4, 4),
+            thresholds=thresholds,
+            linear=data[23] & 0x7F == 0,
+        )
+    if record_type == RECORD_COMPACT_SENSOR:
+        if len(data) < 32:
+            raise ValueError("Truncated compact sensor record")
+        name_length = data[31] & 0x1F
+        return SensorRecord(
+            record_id,
+            number=data[7],
+            name=data[32 : 32 + name_length].decode(errors="replace"),
+            sensor_type=data[12],
+            unit_code=data[21],
+            owner=data[5],
+            lun=data[6] & 0x03,
+            entity=data[8],
+            linear=False,
+        )
+    return None
+
+
+def encode_full_record(record):
+    """Build a full sensor record, the inverse of parse_record"""
+    name = record.name.encode()[:16]
+    body = bytearray(43 + len(name))
+    body[0] = record.owner
+    body[1] = record.lun
+    body[2] = record.number
+    body[3] = record.entity
+    body[7] = record.sensor_type
+    body[8] = 0x01  # threshold based
+    for key, raw in record.thresholds.items():
+        bit, offset = THRESHOLDS[key]
+        body[13] |= 1 << bit
+        body[offset - 5] = raw
+    body[15] = record.analog_format << 6
+    body[16] = record.unit_code
+    body[18] = 0 if record.linear else 0x70
+    m = record.m & 0x3FF
+    b = record.b & 0x3FF
+    body[19] = m & 0xFF
+    body[20] = (m >> 8) << 6
+    body[21] = b & 0xFF
+    body[22] = (b >> 8) << 6
+    body[24] = (record.r_exp & 0x0F) << 4 | (record.b_exp & 0x0F)
+    body[42] = 0xC0 | len(name)
+    body[43:] = name
+    header = struct.pack("<HBBB", record.record_id, 0x51, RECORD_FULL_SENSOR, len(body))
+    return header + bytes(body)
+
+
+class SDRRepository:
+    """Downloads the SDR repository and caches it on disk
+
+    The cache is keyed by BMC identity (manufacturer, product, system GUID)
+    and validated against the repository's addition/erase timestamps, so the
+    expensive download only happens when the sensor layout actually changed.
+    """
+
+    def __init__(self, backend, cache_dir=None):
+        self.backend = backend
+        self.cache_dir = cache_dir or os.path.join(get_data_dir(), "sdr-cache")
+        self.records = []
+        self.identity = None
+        self.timestamp = None
+        # How often the full repository had to be downloaded
+        self.downloads = 0
+
+    def load(self):
+        """Load records from cache, downloading the repository only if stale"""
+        device, guid, info = self.backend.raw_many(
+            [
+                get_device_id_request(),
+                get_system_guid_request(),
+                get_sdr_repository_info_request(),
+            ]
+        )
+        for response in (device, info):
+            if isinstance(response, IPMIError):
+                raise response
+        if isinstance(guid, IPMIError):
+            # Not every BMC implements Get System GUID
+            guid = b""
+        manufacturer = device[6] | device[7] << 8 | device[8] << 16
+        product = device[9] | device[10] << 8
+        self.identity = f"{manufacturer:06x}-{product:04x}-{guid.hex() or self.backend.host}"
+        self.timestamp = list(struct.unpack_from("<II", info, 5))
+
+        cached = self._read_cache()
+        if cached is not None and cached["timestamp"] == self.timestamp:
+            self.records = [SensorRecord.from_dict(r) for r in cached["records"]]
+        else:
+            self.records = self.download()
+            self._write_cache()
+        return self.records
+
+    def download(self):
+        """Walk the whole repository"""
+        self.downloads += 1
+        for _ in range(3):
+            try:
+                return self._walk()
+            except IPMIError as e:
+                # Someone modified the repository mid-read, start over
+                if e.completion_code != RESERVATION_CANCELED:
+                    raise
+        raise IPMIError("SDR repository kept changing while reading it")
+
+    def _walk(self):
+        reservation = self._reserve()
+        records = []
+        record_id = 0
+        while record_id != LAST_RECORD_ID:
+            next_id, data = self._read_record(reservation, record_id)
+            try:
+                record = parse_record(data)
+            except ValueError:
+                record = None
+            if record is not None:
+                records.append(record)
+            if next_id == record_id:
+                break
+            record_id = next_id
+        return records
+
+    def _reserve(self):
+        response = self.backend.raw(reserve_sdr_repository_request())
+        return struct.unpack_from("<H", response)[0]
+
+    def _read_record(self, reservation, record_id):
+        try:
+            response = self.backend.raw(get_sdr_request(reservation, record_id))
+            return struct.unpack_from("<H", response)[0], response[2:]
+        except IPMIError as e:
+            if e.completion_code not in PARTIAL_READ_CODES:
+                raise
+        # The BMC can't return the whole record at once, read it in chunks
+        response = self.backend.raw(get_sdr_request(reservation, record_id, 0, 5))
+        next_id = struct.unpack_from("<H", response)[0]
+        data = bytearray(response[2:])
+        length = data[4] + 5
+        while len(data) < length:
+            size = min(CHUNK_SIZE, length - len(data))
+            response = self.backend.raw(
+                get_sdr_request(reservation, record_id, len(data), size)
+            )
+            data += response[2:]
+        return next_id, bytes(data)
+
+    def _cache_path(self):
+        safe = "".join(c if c.isalnum() or c in "-." else "_" for c in self.identity)
+        return os.path.join(self.cache_dir, f"{safe}.json")
+
+    def _read_cache(self):
+        try:
+            with open(self._cache_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "identity": self.identity,
+                    "timestamp": self.timestamp,
+                    "records": [r.to_dict() for r in self.records],
+                },
+                f,
+            )
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,320 @@
+"""Incremental System Event Log reading
+
+The BMC logs fan and temperature threshold crossings to the SEL, e.g. a
+fan dropping below its lower critical threshold just before the BMC
+forces full speed. Dumping the whole SEL takes one request per entry, so
+a cursor per host remembers the last record ID and the SEL's addition
+and erase timestamps:
+
+- each pass starts with a single Get SEL Info; nothing else is sent
+  while the addition timestamp is unchanged
+- new entries are read from the one after the cursor
+- the whole SEL is read again only after it was cleared, i.e. when the
+  erase timestamp changed, or when the cursor's entry was overwritten
+
+The first pass on a host starts at the newest entry instead of
+reporting the board's whole history.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import traceback
+
+from .config import get_data_dir
+from .ipmi import IPMIError, get_sel_entry_request, get_sel_info_request
+from .sdr import SENSOR_TYPE_FAN, SENSOR_TYPE_TEMPERATURE, SDRRepository
+
+FIRST_ENTRY = 0x0000
+LAST_ENTRY = 0xFFFF
+RECORD_SYSTEM_EVENT = 0x02
+EVENT_TYPE_THRESHOLD = 0x01
+CC_NOT_PRESENT = 0xCB
+
+SENSOR_KINDS = {SENSOR_TYPE_TEMPERATURE: "temperature", SENSOR_TYPE_FAN: "fan"}
+# Threshold event offsets come in pairs, going low then going high
+THRESHOLD_OFFSETS = ("lnc", "lcr", "lnr", "unc", "ucr", "unr")
+THRESHOLD_NAMES = {
+    "lnc": "lower non-critical",
+    "lcr": "lower critical",
+    "lnr": "lower non-recoverable",
+    "unc": "upper non-critical",
+    "ucr": "upper critical",
+    "unr": "upper non-recoverable",
+}
+
+
+class SelEvent:
+    """A decoded system event record"""
+
+    def __init__(
+        self, record_id, timestamp, sensor_type, sensor_number, event_type, data, record=None
+    ):
+        self.record_id = record_id
+        # BMC clock, seconds since the epoch
+        self.timestamp = timestamp
+        self.sensor_type = sensor_type
+        self.sensor_number = sensor_number
+        self.event_type = event_type & 0x7F
+        self.assertion = not event_type & 0x80
+        # Event data 1-3
+        self.data = data
+        # SensorRecord of the sensor, when it is in the SDR
+        self.record = record
+
+    @property
+    def name(self):
+        return self.record.name if self.record else f"Sensor 0x{self.sensor_number:02x}"
+
+    @property
+    def kind(self):
+        return SENSOR_KINDS.get(self.sensor_type)
+
+    @property
+    def offset(self):
+        return self.data[0] & 0x0F
+
+    @property
+    def threshold_name(self):
+        """"lcr", "ucr", ... for threshold events, otherwise None"""
+        if self.event_type != EVENT_TYPE_THRESHOLD or self.offset >= 12:
+            return None
+        return THRESHOLD_OFFSETS[self.offset // 2]
+
+    def _convert(self, raw):
+        if self.record is None or not self.record.linear:
+            return None
+        return self.record.convert(raw)
+
+    @property
+    def reading(self):
+        """Reading that triggered a threshold event, if the BMC included it"""
+        if self.threshold_name is None or self.data[0] >> 6 != 0x01:
+            return None
+        return self._convert(self.data[1])
+
+    @property
+    def threshold(self):
+        """The crossed threshold, if the BMC included it"""
+        if self.threshold_name is None or (self.data[0] >> 4) & 0x03 != 0x01:
+            return None
+        return self._convert(self.data[2])
+
+    @property
+    def description(self):
+        threshold = self.threshold_name
+        if threshold is None:
+            state = "asserted" if self.assertion else "deasserted"
+            return f"{self.name}: event type 0x{self.event_type:02x} offset {self.offset} {state}"
+        side = "below" if threshold.startswith("l") else "above"
+        if not self.assertion:
+            side = "no longer " + side
+        text = f"{self.name} {side} {THRESHOLD_NAMES[threshold]}"
+        unit = f" {self.record.unit}" if self.record and self.record.unit else ""
+        if self.reading is not None:
+            text += f": {self.reading:g}{unit}"
+        if self.threshold is not None:
+            text += f" (threshold {self.threshold:g}{unit})"
+        return text
+
+    def to_dict(self):
+        return {
+            "record_id": self.record_id,
+            "timestamp": self.timestamp,
+            "sensor": self.name,
+            "sensor_number": self.sensor_number,
+            "kind": self.kind,
+            "event_type": self.event_type,
+            "offset": self.offset,
+            "assertion": self.assertion,
+            "threshold_name": self.threshold_name,
+            "reading": self.reading,
+            "threshold": self.threshold,
+            "unit": self.record.unit if self.record else None,
+            "description": self.description,
+        }
+
+    def __repr__(self):
+        return f"<SelEvent #{self.record_id} {self.description}>"
+
+
+def parse_entry(data, records=None):
+    """SelEvent of a 16 byte system event record, None for OEM records"""
+    if len(data) < 16:
+        raise IPMIError("Truncated SEL entry")
+    record_id, record_type, timestamp = struct.unpack_from("<HBI", data)
+    if record_type != RECORD_SYSTEM_EVENT:
+        return None
+    sensor_type, sensor_number, event_type = data[10], data[11], data[12]
+    record = (records or {}).get(sensor_number)
+    return SelEvent(
+        record_id, timestamp, sensor_type, sensor_number, event_type, bytes(data[13:16]), record
+    )
+
+
+class SelPoller:
+    """Reads new SEL entries every interval seconds
+
+    callback(events) gets the new fan and temperature events of each
+    pass that found any. The cursor of each host is a small JSON file in
+    cursor_dir.
+    """
+
+    def __init__(
+        self,
+        backend,
+        interval=30.0,
+        sensor_types=(SENSOR_TYPE_TEMPERATURE, SENSOR_TYPE_FAN),
+        cursor_dir=None,
+        cache_dir=None,
+        callback=None,
+        error_callback=None,
+    ):
+        self.backend = backend
+        self.interval = interval
+        self.sensor_types = sensor_types
+        self.cursor_dir = cursor_dir or os.path.join(get_data_dir(), "sel")
+        self.repository = SDRRepository(backend, cache_dir)
+        # Sensor number -> SensorRecord, for names and units
+        self.records = None
+        # Entries read in total and how often the whole SEL was read
+        self.entries_read = 0
+        self.full_reads = 0
+        self.listeners = [callback] if callback else []
+        self.error_callback = error_callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def poll_once(self):
+        """Read the entries added since the last pass, returns their events"""
+        info = self.backend.raw(get_sel_info_request())
+        entries = struct.unpack_from("<H", info, 1)[0]
+        added, erased = struct.unpack_from("<II", info, 5)
+        cursor = self._read_cursor()
+        events = []
+        if cursor is None:
+            # First pass on this host: start from now
+            last = None
+            if entries:
+                _, data = self._read_entry(LAST_ENTRY)
+                last = struct.unpack_from("<HBI", data)
+        elif cursor["erased"] != erased:
+            # Cleared since the last pass, everything in it is new
+            last, events = self._walk(FIRST_ENTRY)
+        elif cursor["added"] == added or not entries:
+            last = (cursor["record_id"], None, cursor["timestamp"])
+        else:
+            last, events = self._read_after(cursor)
+        if last is None:
+            last = (None, None, None)
+        new_cursor = {"record_id": last[0], "timestamp": last[2], "added": added, "erased": erased}
+        if new_cursor != cursor:
+            self._write_cursor(new_cursor)
+        events = [e for e in events if e.sensor_type in self.sensor_types]
+        if events:
+            for listener in list(self.listeners):
+                try:
+                    listener(events)
+                except Exception:
+                    traceback.print_exc()
+        return events
+
+    def _read_after(self, cursor):
+        if cursor["record_id"] is None:
+            return self._walk(FIRST_ENTRY)
+        try:
+            next_id, _ = self._read_entry(cursor["record_id"])
+        except IPMIError as e:
+            if e.completion_code != CC_NOT_PRESENT:
+                raise
+            # The entry was overwritten: read everything, skip what was reported
+            last, events = self._walk(FIRST_ENTRY)
+            return last, [e for e in events if e.timestamp > (cursor["timestamp"] or 0)]
+        current = (cursor["record_id"], None, cursor["timestamp"])
+        if next_id == LAST_ENTRY:
+            return current, []
+        last, events = self._walk(next_id, full=False)
+        return last or current, events
+
+    def _walk(self, record_id, full=True):
+        """Read entries from record_id to the end, returns (last header, events)"""
+        if full:
+            self.full_reads += 1
+        if self.records is None:
+            self.records = {r.number: r for r in self.repository.load()}
+        last = None
+        events = []
+        while record_id != LAST_ENTRY:
+            try:
+                next_id, data = self._read_entry(record_id)
+            except IPMIError as e:
+                # Reading an empty SEL from the start
+                if e.completion_code == CC_NOT_PRESENT and last is None:
+                    break
+                raise
+            last = struct.unpack_from("<HBI", data)
+            event = parse_entry(data, self.records)
+            if event is not None:
+                events.append(event)
+            if next_id == record_id:
+                break
+            record_id = next_id
+        return last, events
+
+    def _read_entry(self, record_id):
+        response = self.backend.raw(get_sel_entry_request(record_id))
+        if len(response) < 18:
+            raise IPMIError("Truncated SEL entry")
+        self.entries_read += 1
+        return struct.unpack_from("<H", response)[0], response[2:18]
+
+    def _cursor_path(self):
+        port = getattr(self.backend, "port", 623)
+        host = self.backend.host if port == 623 else f"{self.backend.host}:{port}"
+        safe = "".join(c if c.isalnum() or c in "-." else "_" for c in host)
+        return os.path.join(self.cursor_dir, f"{safe}.json")
+
+    def _read_cursor(self):
+        try:
+            with open(self._cursor_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cursor(self, cursor):
+        os.makedirs(self.cursor_dir, exist_ok=True)
+        path = self._cursor_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(cursor, f)
+        os.replace(path + ".tmp", path)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sel-poller", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except IPMIError as e:
+                if self.error_callback is not None:
+                    self.error_callback(e)
+            if self._stop.wait(self.interval):
+                return
+
+
+def event_record(event, host):
+    """One events.jsonl line"""
+    return {"time": round(time.time(), 3), "host": host, **event.to_dict()}
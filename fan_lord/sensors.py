@@ -0,0 +1,160 @@
+"""Fan and temperature sensor polling"""
+import threading
+import time
+import traceback
+
+from .ipmi import IPMIError, get_sensor_reading_request
+from .sdr import SENSOR_TYPE_FAN, SENSOR_TYPE_TEMPERATURE, SDRRepository
+
+# Get Sensor Reading flag: reading/state unavailable
+READING_UNAVAILABLE = 0x20
+
+
+class SensorReading:
+    """One converted sensor value"""
+
+    def __init__(self, record, value, timestamp):
+        self.record = record
+        self.value = value
+        self.timestamp = timestamp
+
+    @property
+    def name(self):
+        return self.record.name
+
+    @property
+    def sensor_type(self):
+        return self.record.sensor_type
+
+    @property
+    def unit(self):
+        return self.record.unit
+
+    @property
+    def available(self):
+        return self.value is not None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "number": self.record.number,
+            "type": self.sensor_type,
+            "value": self.value,
+            "unit": self.unit,
+            "timestamp": self.timestamp,
+        }
+
+    def __repr__(self):
+        return f"<SensorReading {self.name}={self.value}{self.unit}>"
+
+
+def read_sensors(backend, records, timeout=None):
+    """Read every record in one batched pass"""
+    responses = backend.raw_many(
+        [get_sensor_reading_request(record.number) for record in records], timeout
+    )
+    now = time.time()
+    readings = []
+    for record, response in zip(records, responses):
+        value = None
+        if (
+            not isinstance(response, IPMIError)
+            and len(response) >= 2
+            and not response[1] & READING_UNAVAILABLE
+        ):
+            value = record.convert(response[0])
+        readings.append(SensorReading(record, value, now))
+    return readings
+
+
+class SensorPoller:
+    """Polls fan and temperature sensors on an interval
+
+    The SDR repository is loaded once (from the on-disk cache when it is
+    still valid), after that each cycle is a single batch of Get Sensor
+    Reading requests. The repository timestamp is re-checked every
+    sdr_refresh seconds.
+    """
+
+    def __init__(
+        self,
+        backend,
+        interval=5.0,
+        sensor_types=(SENSOR_TYPE_TEMPERATURE, SENSOR_TYPE_FAN),
+        cache_dir=None,
+        sdr_refresh=600,
+        callback=None,
+        error_callback=None,
+    ):
+        self.backend = backend
+        self.interval = interval
+        self.sensor_types = sensor_types
+        self.sdr_refresh = sdr_refresh
+        self.repository = SDRRepository(backend, cache_dir)
+        self.records = None
+        self.loaded_at = None
+        self.readings = {}
+        self.last_error = None
+        self.listeners = [callback] if callback else []
+        self.error_callback = error_callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Call callback(readings) after every successful poll"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def latest(self):
+        """Most recent reading of every sensor"""
+        return list(self.readings.values())
+
+    def load_records(self):
+        records = self.repository.load()
+        self.records = [
+            r for r in records if r.linear and r.sensor_type in self.sensor_types
+        ]
+        self.loaded_at = time.monotonic()
+        return self.records
+
+    def poll_once(self):
+        """Read all sensors now, returns the readings"""
+        if self.records is None or time.monotonic() - self.loaded_at > self.sdr_refresh:
+            self.load_records()
+        readings = read_sensors(self.backend, self.records)
+        self.readings = {reading.name: reading for reading in readings}
+        self.last_error = None
+        for listener in list(self.listeners):
+            try:
+                listener(readings)
+            except Exception:
+                traceback.print_exc()
+        return readings
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sensor-poller", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except IPMIError as e:
+                self.last_error = e
+                if self.error_callback is not None:
+                    self.error_callback(e)
+            if self._stop.wait(self.interval):
+                return
@@ -0,0 +1,267 @@
+"""Deterministic closed-loop simulation for tuning fan control without hardware
+
+Runs a controller against a simulated BMC whose temperatures come from a
+thermal model, e.g. to compare the configured curves with the presets:
+
+    python -m fan_lord.simulation --duration 3600 --load bursty
+    python -m fan_lord.simulation --trace load.csv
+
+A trace recorded with "python -m fan_lord.hostload --record load.csv"
+replays a real workload; "curve+load" is the curve with the host load
+feed-forward of the "feed_forward" section.
+"""
+import argparse
+import bisect
+import math
+
+from .config import load_config
+from .control import controller_from_config
+from .hostload import read_trace
+from .ipmi import set_duty_request
+from .presets import PRESETS
+from .sdr import SENSOR_TYPE_TEMPERATURE, SDRRepository
+from .sensors import read_sensors
+from .simulator import SimulatedBackend, SimulatedBMC
+
+
+class ThermalNode:
+    """A heat source measured by one temperature sensor, cooled by one fan zone"""
+
+    def __init__(
+        self, name, zone, capacity, idle_power, max_power, conductance, load_share=1.0
+    ):
+        self.name = name
+        self.zone = zone
+        # J/K
+        self.capacity = capacity
+        # W at 0% and 100% load
+        self.idle_power = idle_power
+        self.max_power = max_power
+        # W/K to ambient at 0% and 100% duty
+        self.conductance = conductance
+        # How much of the host load reaches this node
+        self.load_share = load_share
+
+    def power(self, load):
+        return self.idle_power + (self.max_power - self.idle_power) * load * self.load_share
+
+    def cooling(self, duty):
+        low, high = self.conductance
+        return low + (high - low) * duty / 100
+
+
+def default_nodes():
+    return [
+        ThermalNode("CPU Temp", 0, 400, 30, 200, (2.0, 8.0)),
+        ThermalNode("Peripheral Temp", 1, 300, 15, 60, (1.0, 4.0), load_share=0.6),
+        ThermalNode("System Temp", 1, 800, 8, 20, (1.0, 3.0), load_share=0.3),
+    ]
+
+
+class ThermalModel:
+    """First-order thermal model of a server
+
+    Each node follows C dT/dt = P(load) - G(duty) (T - ambient). Steps use
+    the exact exponential solution, so for constant inputs the result does
+    not depend on the step size.
+    """
+
+    def __init__(self, nodes=None, ambient=25.0, initial_duty=50):
+        self.nodes = nodes or default_nodes()
+        self.ambient = ambient
+        self.temperatures = {
+            node.name: ambient + node.power(0) / node.cooling(initial_duty)
+            for node in self.nodes
+        }
+
+    def step(self, duties, load, dt):
+        for node in self.nodes:
+            g = node.cooling(duties.get(node.zone, 100))
+            steady = self.ambient + node.power(load) / g
+            current = self.temperatures[node.name]
+            self.temperatures[node.name] = steady + (current - steady) * math.exp(
+                -g * dt / node.capacity
+            )
+        return self.temperatures
+
+
+def constant_load(level):
+    return lambda t: level
+
+
+def step_load(steps):
+    """Piecewise constant load from [(start_time, level), ...]"""
+    steps = sorted(steps)
+
+    def load(t):
+        level = 0.0
+        for start, value in steps:
+            if t >= start:
+                level = value
+        return level
+
+    return load
+
+
+def square_load(period, low=0.1, high=1.0, duty_cycle=0.5):
+    """Alternating bursts, like batch jobs arriving every period seconds"""
+    return lambda t: high if (t % period) < period * duty_cycle else low
+
+
+def trace_load(trace):
+    """Load replayed from [(seconds, load), ...], each sample held until the next"""
+    times = [t - trace[0][0] for t, _ in trace]
+    levels = [level for _, level in trace]
+
+    def load(t):
+        return levels[max(0, bisect.bisect_right(times, t) - 1)]
+
+    load.duration = times[-1]
+    return load
+
+
+LOAD_PROFILES = {
+    "idle": constant_load(0.05),
+    "full": constant_load(1.0),
+    "step": step_load([(0, 0.1), (600, 1.0), (1800, 0.3)]),
+    "bursty": square_load(300, 0.1, 1.0, 0.4),
+}
+
+
+class SimulationResult:
+    """Time series of a simulation run"""
+
+    def __init__(self, throttle_temperature):
+        self.throttle_temperature = throttle_temperature
+        self.times = []
+        self.temperatures = {}
+        self.duties = {}
+        self.writes = 0
+        self.dt = 1.0
+
+    def record(self, t, temperatures, duties):
+        self.times.append(t)
+        for name, value in temperatures.items():
+            self.temperatures.setdefault(name, []).append(value)
+        for zone, duty in duties.items():
+            self.duties.setdefault(zone, []).append(duty)
+
+    def summary(self):
+        cpu = self.temperatures.get("CPU Temp", [])
+        return {
+            "max_temperature": {n: round(max(v), 1) for n, v in self.temperatures.items()},
+            "seconds_throttled": sum(self.dt for v in cpu if v >= self.throttle_temperature),
+            "mean_duty": {z: round(sum(v) / len(v), 1) for z, v in self.duties.items()},
+            "writes": self.writes,
+        }
+
+
+def simulate(
+    make_controller,
+    load,
+    duration=3600,
+    dt=1.0,
+    model=None,
+    throttle_temperature=95.0,
+):
+    """Run make_controller(write) against the thermal model for duration seconds
+
+    The controller sees temperatures through the same SDR and Get Sensor
+    Reading path as on hardware and writes through a simulated BMC. Like
+    /proc/stat, the load it is given is that of the previous interval.
+    """
+    bmc = SimulatedBMC()
+    backend = SimulatedBackend(bmc)
+    model = model or ThermalModel()
+    result = SimulationResult(throttle_temperature)
+    result.dt = dt
+
+    def write(zone, duty):
+        backend.raw(set_duty_request(zone, duty))
+        result.writes += 1
+
+    controller = make_controller(write)
+    records = [
+        r for r in SDRRepository(backend).download()
+        if r.sensor_type == SENSOR_TYPE_TEMPERATURE
+    ]
+    t = 0.0
+    measured = None
+    while t < duration:
+        bmc.temperatures.update(model.temperatures)
+        readings = read_sensors(backend, records)
+        controller.step({r.name: r.value for r in readings}, dt, measured)
+        measured = load(t)
+        model.step(bmc.duties, measured, dt)
+        result.record(t, model.temperatures, bmc.duties)
+        t += dt
+    return result
+
+
+class FixedDuties:
+    """Stand-in controller holding constant duties, to compare against presets"""
+
+    def __init__(self, duties, write):
+        self.duties = dict(duties)
+        self.write = write
+        self.written = False
+
+    def step(self, temperatures, dt=1.0, load=None):
+        if self.written:
+            return {}
+        for zone, duty in self.duties.items():
+            self.write(zone, duty)
+        self.written = True
+        return dict(self.duties)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan control simulation")
+    parser.add_argument(
+        "--duration", type=float, help="seconds, default 3600 or the length of --trace"
+    )
+    parser.add_argument("--dt", type=float, default=1.0, help="control interval")
+    parser.add_argument("--load", choices=sorted(LOAD_PROFILES), default="bursty")
+    parser.add_argument("--trace", help="CSV load trace to replay instead of --load")
+    parser.add_argument("--ambient", type=float, default=25.0)
+    parser.add_argument(
+        "--throttle", type=float, default=95.0, help="CPU temperature counted as throttled"
+    )
+    args = parser.parse_args()
+
+    load = LOAD_PROFILES[args.load]
+    if args.trace:
+        load = trace_load(read_trace(args.trace))
+        if args.duration is None:
+            args.duration = load.duration
+    if args.duration is None:
+        args.duration = 3600
+    config = load_config()
+    control = config["control"]
+    feed_forward = {**config["feed_forward"], "enabled": True}
+    strategies = {
+        "curve": lambda write: controller_from_config(control, write),
+        "curve+load": lambda write: controller_from_config(control, write, feed_forward),
+    }
+    for name, duties in PRESETS.items():
+        strategies[name] = lambda write, duties=duties: FixedDuties(duties, write)
+
+    print(f"{'strategy':<12} {'max CPU':>8} {'throttled':>10} {'CPU duty':>9} {'periph':>7} {'writes':>7}")
+    for name, make in strategies.items():
+        result = simulate(
+            make,
+            load,
+            duration=args.duration,
+            dt=args.dt,
+            model=ThermalModel(ambient=args.ambient),
+            throttle_temperature=args.throttle,
+        )
+        s = result.summary()
+        print(
+            f"{name:<12} {s['max_temperature']['CPU Temp']:>8} {s['seconds_throttled']:>9.0f}s "
+            f"{s['mean_duty'][0]:>9} {s['mean_duty'][1]:>7} {s['writes']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,780 @@
+"""Local UDP simulator of Supermicro BMCs speaking RMCP+
+
+Lets the LAN backend, session reuse, keep-alive and re-authentication be
+exercised on any machine:
+
+    python -m fan_lord.simulator --port 6230 --count 4
+    python -m fan_lord.simulator --host 127.1.0.1 --port 623 --count 500 --spread 97
+"""
+import argparse
+import collections
+import ctypes
+import errno
+import heapq
+import ipaddress
+import os
+import random
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from . import rmcp
+from .backend import Backend
+from .fleet import FleetHost, save_inventory
+from .ipmi import (
+    CMD_CLEAR_SEL,
+    CMD_CLOSE_SESSION,
+    CMD_FAN_DUTY,
+    CMD_FAN_MODE,
+    CMD_GET_CHANNEL_AUTH_CAPS,
+    CMD_GET_DEVICE_ID,
+    CMD_GET_SDR,
+    CMD_GET_SDR_REPOSITORY_INFO,
+    CMD_GET_SEL_ENTRY,
+    CMD_GET_SEL_INFO,
+    CMD_GET_SENSOR_READING,
+    CMD_GET_SYSTEM_GUID,
+    CMD_RESERVE_SDR_REPOSITORY,
+    CMD_RESERVE_SEL,
+    CMD_SET_SESSION_PRIVILEGE,
+    FAN_DUTY_SUBCOMMAND,
+    FAN_MODE_FULL,
+    FAN_MODE_STANDARD,
+    NETFN_APP,
+    NETFN_SENSOR,
+    NETFN_STORAGE,
+    NETFN_SUPERMICRO,
+    PRIVILEGE_ADMIN,
+    Request,
+    check_response,
+)
+from .openipmi import (
+    IPMI_RESPONSE_RECV_TYPE,
+    IPMI_SYSTEM_INTERFACE_ADDR_TYPE,
+    IPMICTL_RECEIVE_MSG_TRUNC,
+    IPMICTL_SEND_COMMAND,
+    IpmiSystemInterfaceAddr,
+)
+from .sdr import (
+    LAST_RECORD_ID,
+    SENSOR_TYPE_FAN,
+    SENSOR_TYPE_TEMPERATURE,
+    SensorRecord,
+    encode_full_record,
+)
+
+CC_OK = b"\x00"
+CC_INVALID_COMMAND = b"\xc1"
+CC_RESERVATION_CANCELED = b"\xc5"
+CC_OUT_OF_RANGE = b"\xc9"
+CC_CANNOT_RETURN_BYTES = b"\xca"
+CC_NOT_PRESENT = b"\xcb"
+CC_INVALID_DATA = b"\xcc"
+
+FAN_MAX_RPM = 2500
+# Fan sensor RPM per raw count
+FAN_RPM_FACTOR = 100
+
+
+def default_sensors(zones):
+    """Temperature sensors plus Supermicro style fans: FAN1-4 on the CPU
+    zone, FANA, FANB... on the following zones
+
+    Returns (records, fan_zones) where fan_zones maps fan sensor number to zone.
+    """
+    records = [
+        SensorRecord(1, 0x01, "CPU Temp", SENSOR_TYPE_TEMPERATURE, unit_code=1,
+                     thresholds={"unc": 85, "ucr": 95}),
+        SensorRecord(2, 0x0B, "System Temp", SENSOR_TYPE_TEMPERATURE, unit_code=1,
+                     thresholds={"unc": 75, "ucr": 85}),
+        SensorRecord(3, 0x0C, "Peripheral Temp", SENSOR_TYPE_TEMPERATURE, unit_code=1,
+                     thresholds={"unc": 75, "ucr": 85}),
+    ]
+    fans = [(f"FAN{i + 1}", 0) for i in range(4)]
+    fans += [(f"FAN{chr(ord('A') + zone - 1)}", zone) for zone in range(1, zones)]
+    fan_zones = {}
+    for index, (name, zone) in enumerate(fans):
+        number = 0x41 + index
+        records.append(
+            SensorRecord(len(records) + 1, number, name, SENSOR_TYPE_FAN,
+                         unit_code=18, m=FAN_RPM_FACTOR,
+                         thresholds={"lnr": 2, "lcr": 3, "lnc": 4})
+        )
+        fan_zones[number] = zone
+    return records, fan_zones
+
+
+class SimulatedSession:
+    def __init__(self, console_session_id, cipher_suite, privilege):
+        self.console_session_id = console_session_id
+        self.cipher_suite = cipher_suite
+        self.max_privilege = privilege
+        self.console_random = None
+        self.managed_random = None
+        self.role = None
+        self.username = None
+        self.keys = None
+        self.sequence = 0
+        self.last_activity = time.monotonic()
+
+
+class SimulatedBMC:
+    """In-memory Supermicro BMC
+
+    handle_datagram() speaks the wire protocol, handle_request() executes a
+    decoded IPMI request and is reusable by in-process fakes.
+    """
+
+    def __init__(
+        self,
+        username="ADMIN",
+        password="ADMIN",
+        zones=2,
+        session_timeout=60,
+        guid=None,
+        firmware=(1, 73),
+        min_duty=None,
+        override_delay=2.0,
+    ):
+        self.username = username
+        self.password = password
+        self.session_timeout = session_timeout
+        self.guid = guid or os.urandom(16)
+        self.firmware = firmware
+        self.fan_mode = FAN_MODE_STANDARD
+        self.duties = {zone: 100 for zone in range(zones)}
+        # Like a board whose fans drop below their lower threshold: a duty
+        # under min_duty makes the BMC put every zone back to 100%
+        # override_delay seconds later
+        self.min_duty = min_duty
+        self.override_delay = override_delay
+        self.override_at = None
+        self.overrides = 0
+        self.sessions = {}
+        # Sensors, temperatures are set by tests or a thermal model
+        self.sensors, self.fan_zones = default_sensors(zones)
+        self.sdr = [encode_full_record(record) for record in self.sensors]
+        self.sdr_added = int(time.time())
+        self.sdr_erased = 0
+        # Largest Get SDR read the BMC answers, None means whole records
+        self.sdr_max_read = None
+        self.reservation = 0
+        self.temperatures = {"CPU Temp": 45.0, "System Temp": 30.0, "Peripheral Temp": 38.0}
+        # Fan name -> fraction of the nominal speed, below 1 for a worn fan
+        self.fan_wear = {}
+        # System Event Log: 16 byte records, timestamps of the last addition and erase
+        self.sel = []
+        self.sel_added = 0xFFFFFFFF
+        self.sel_erased = int(time.time())
+        self.sel_next_id = 1
+        self.sel_reads = 0
+        # Counters for tests and benchmarks
+        self.sessions_opened = 0
+        self.requests_handled = 0
+        self.sdr_reads = 0
+        self.lock = threading.RLock()
+        self.handlers = {
+            (NETFN_APP, CMD_GET_DEVICE_ID): self.get_device_id,
+            (NETFN_APP, CMD_GET_SYSTEM_GUID): self.get_system_guid,
+            (NETFN_APP, CMD_GET_CHANNEL_AUTH_CAPS): self.get_channel_auth_caps,
+            (NETFN_APP, CMD_SET_SESSION_PRIVILEGE): self.set_session_privilege,
+            (NETFN_STORAGE, CMD_GET_SDR_REPOSITORY_INFO): self.get_sdr_repository_info,
+            (NETFN_STORAGE, CMD_RESERVE_SDR_REPOSITORY): self.reserve_sdr_repository,
+            (NETFN_STORAGE, CMD_GET_SDR): self.get_sdr,
+            (NETFN_STORAGE, CMD_GET_SEL_INFO): self.get_sel_info,
+            # One reservation counter serves the SDR repository and the SEL
+            (NETFN_STORAGE, CMD_RESERVE_SEL): self.reserve_sdr_repository,
+            (NETFN_STORAGE, CMD_GET_SEL_ENTRY): self.get_sel_entry,
+            (NETFN_STORAGE, CMD_CLEAR_SEL): self.clear_sel,
+            (NETFN_SENSOR, CMD_GET_SENSOR_READING): self.get_sensor_reading,
+            (NETFN_SUPERMICRO, CMD_FAN_MODE): self.fan_mode_command,
+            (NETFN_SUPERMICRO, CMD_FAN_DUTY): self.fan_duty_command,
+        }
+
+    # Wire protocol
+
+    def handle_datagram(self, data):
+        """Returns the reply datagram, or None to stay silent like a real BMC"""
+        with self.lock:
+            self.expire_sessions()
+            try:
+                packet = rmcp.decode_packet(data, self._session_keys)
+            except ValueError:
+                return None
+            if packet.msg_class == rmcp.RMCP_CLASS_ASF:
+                return self._handle_asf(packet.payload)
+            if packet.auth_type == rmcp.AUTH_TYPE_NONE:
+                return self._handle_sessionless(packet.payload)
+            if packet.payload_type == rmcp.PAYLOAD_OPEN_SESSION_REQUEST:
+                return self._open_session(packet.payload)
+            if packet.payload_type == rmcp.PAYLOAD_RAKP1:
+                return self._rakp1(packet.payload)
+            if packet.payload_type == rmcp.PAYLOAD_RAKP3:
+                return self._rakp3(packet.payload)
+            if packet.payload_type == rmcp.PAYLOAD_IPMI:
+                return self._handle_session_message(packet)
+            return None
+
+    def _session_keys(self, session_id):
+        session = self.sessions.get(session_id)
+        return session.keys if session else None
+
+    def expire_sessions(self):
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_activity > self.session_timeout:
+                del self.sessions[session_id]
+
+    def _handle_asf(self, payload):
+        try:
+            msg_type, tag, _ = rmcp.parse_asf(payload)
+        except ValueError:
+            return None
+        if msg_type != rmcp.ASF_PING:
+            return None
+        return rmcp.presence_pong(tag)
+
+    def _handle_sessionless(self, message):
+        try:
+            request, seq, rq_addr = rmcp.decode_ipmi_request(message)
+        except ValueError:
+            return None
+        # Only Get Channel Authentication Capabilities is allowed outside a session
+        if (request.netfn, request.command) != (NETFN_APP, CMD_GET_CHANNEL_AUTH_CAPS):
+            return None
+        response = self.handle_request(request)
+        return rmcp.encode_v15(rmcp.encode_ipmi_response(request, seq, response, rq_addr))
+
+    def _open_session(self, payload):
+        try:
+            tag, privilege, console_id, suite = rmcp.parse_open_session_request(payload)
+        except ValueError:
+            return None
+        if suite is None or (suite == 3 and rmcp.Cipher is None):
+            reply = rmcp.open_session_response(
+                tag, rmcp.STATUS_NO_CIPHER_SUITE_MATCH, 0, console_id, 0, None
+            )
+            return rmcp.encode_v20(rmcp.PAYLOAD_OPEN_SESSION_RESPONSE, reply)
+        managed_id = struct.unpack("<I", os.urandom(4))[0] or 1
+        self.sessions[managed_id] = SimulatedSession(
+            console_id, suite, privilege or PRIVILEGE_ADMIN
+        )
+        reply = rmcp.open_session_response(
+            tag, rmcp.STATUS_OK, privilege or PRIVILEGE_ADMIN, console_id, managed_id, suite
+        )
+        return rmcp.encode_v20(rmcp.PAYLOAD_OPEN_SESSION_RESPONSE, reply)
+
+    def _rakp1(self, payload):
+        try:
+            tag, managed_id, console_random, role, username = rmcp.parse_rakp1(payload)
+        except ValueError:
+            return None
+        session = self.sessions.get(managed_id)
+        if session is None:
+            return None
+        if username != self.username:
+            reply = rmcp.rakp2(
+                tag, rmcp.STATUS_UNAUTHORIZED_NAME, session.console_session_id,
+                None, None, None,
+            )
+            return rmcp.encode_v20(rmcp.PAYLOAD_RAKP2, reply)
+        session.console_random = console_random
+        session.managed_random = os.urandom(16)
+        session.role = role
+        session.username = username
+        auth_code = rmcp.rakp2_auth_code(
+            self.password, session.console_session_id, managed_id, console_random,
+            session.managed_random, self.guid, role, username,
+        )
+        reply = rmcp.rakp2(
+            tag, rmcp.STATUS_OK, session.console_session_id, session.managed_random,
+            self.guid, auth_code,
+        )
+        return rmcp.encode_v20(rmcp.PAYLOAD_RAKP2, reply)
+
+    def _rakp3(self, payload):
+        try:
+            tag, status, managed_id, auth_code = rmcp.parse_rakp3(payload)
+        except ValueError:
+            return None
+        session = self.sessions.get(managed_id)
+        if session is None or session.managed_random is None:
+            return None
+        expected = rmcp.rakp3_auth_code(
+            self.password, session.managed_random, session.console_session_id,
+            session.role, session.username,
+        )
+        if status != rmcp.STATUS_OK or expected != auth_code:
+            del self.sessions[managed_id]
+            reply = rmcp.rakp4(
+                tag, rmcp.STATUS_INVALID_INTEGRITY_VALUE, session.console_session_id, b""
+            )
+            return rmcp.encode_v20(rmcp.PAYLOAD_RAKP4, reply)
+        sik = rmcp.session_integrity_key(
+            self.password, session.console_random, session.managed_random,
+            session.role, session.username,
+        )
+        session.keys = rmcp.SessionKeys(sik, session.cipher_suite)
+        session.last_activity = time.monotonic()
+        self.sessions_opened += 1
+        icv = rmcp.rakp4_icv(sik, session.console_random, managed_id, self.guid)
+        reply = rmcp.rakp4(tag, rmcp.STATUS_OK, session.console_session_id, icv)
+        return rmcp.encode_v20(rmcp.PAYLOAD_RAKP4, reply)
+
+    def _handle_session_message(self, packet):
+        session = self.sessions.get(packet.session_id)
+        # Unknown or not yet activated sessions are silently ignored
+        if session is None or session.keys is None:
+            return None
+        try:
+            request, seq, rq_addr = rmcp.decode_ipmi_request(packet.payload)
+        except ValueError:
+            return None
+        session.last_activity = time.monotonic()
+        if (request.netfn, request.command) == (NETFN_APP, CMD_CLOSE_SESSION):
+            del self.sessions[packet.session_id]
+            response = CC_OK
+        else:
+            response = self.handle_request(request)
+        session.sequence = (session.sequence + 1) & 0xFFFFFFFF or 1
+        return rmcp.encode_v20(
+            rmcp.PAYLOAD_IPMI,
+            rmcp.encode_ipmi_response(request, seq, response, rq_addr),
+            session.console_session_id,
+            session.sequence,
+            session.keys,
+        )
+
+    def reset(self):
+        """Simulate a BMC cold reset: all sessions and fan settings are lost"""
+        with self.lock:
+            self.sessions.clear()
+            self.fan_mode = FAN_MODE_STANDARD
+            self.duties = {zone: 100 for zone in self.duties}
+            self.override_at = None
+
+    # IPMI commands
+
+    def handle_request(self, request):
+        """Execute a request, returns the completion code followed by data"""
+        with self.lock:
+            self.requests_handled += 1
+            self.check_override()
+            handler = self.handlers.get((request.netfn, request.command))
+            if handler is None:
+                return CC_INVALID_COMMAND
+            return handler(request.data)
+
+    def check_override(self):
+        if self.override_at is not None and time.monotonic() >= self.override_at:
+            # Like the real BMC, fans below their lower critical threshold are
+            # logged before the override
+            for record in self.sensors:
+                if record.sensor_type != SENSOR_TYPE_FAN:
+                    continue
+                threshold = record.threshold("lcr")
+                value = self.sensor_value(record)
+                # Compare at the sensor's resolution, as the event reports it
+                reading = record.convert(max(0, min(255, round(value / record.m))))
+                if threshold is not None and reading < threshold:
+                    self.add_threshold_event(record, "lcr", value)
+            self.duties = {zone: 100 for zone in self.duties}
+            self.override_at = None
+            self.overrides += 1
+
+    def get_device_id(self, data):
+        major, minor = self.firmware
+        # Device ID, revision, firmware (minor in BCD), IPMI 2.0, capabilities,
+        # Supermicro IANA, product
+        minor = int(f"{minor:02d}", 16)
+        return CC_OK + bytes([0x20, 0x01, major & 0x7F, minor, 0x02, 0xBF]) + bytes(
+            [0x7C, 0x2A, 0x00, 0x09, 0x08, 0x00, 0x00, 0x00, 0x00]
+        )
+
+    def get_system_guid(self, data):
+        return CC_OK + self.guid
+
+    def get_channel_auth_caps(self, data):
+        # Channel 1, RMCP+ supported, non-null usernames, no OEM
+        return CC_OK + bytes([0x01, 0x80, 0x04, 0x02, 0x00, 0x00, 0x00, 0x00])
+
+    def set_session_privilege(self, data):
+        if not data or data[0] > PRIVILEGE_ADMIN:
+            return CC_INVALID_DATA
+        return CC_OK + bytes([data[0] or PRIVILEGE_ADMIN])
+
+    def get_sdr_repository_info(self, data):
+        return CC_OK + struct.pack(
+            "<BHHIIB", 0x51, len(self.sdr), 0xFFFF, self.sdr_added, self.sdr_erased, 0x02
+        )
+
+    def reserve_sdr_repository(self, data):
+        self.reservation = (self.reservation + 1) & 0xFFFF or 1
+        return CC_OK + struct.pack("<H", self.reservation)
+
+    def get_sdr(self, data):
+        if len(data) != 6:
+            return CC_INVALID_DATA
+        reservation, record_id, offset, length = struct.unpack("<HHBB", data)
+        # Partial reads need a valid reservation
+        if offset and reservation != self.reservation:
+            return CC_RESERVATION_CANCELED
+        index = 0 if record_id == 0 else record_id - 1
+        if index >= len(self.sdr):
+            return CC_NOT_PRESENT
+        record = self.sdr[index]
+        if length == 0xFF:
+            length = len(record) - offset
+        if self.sdr_max_read is not None and length > self.sdr_max_read:
+            return CC_CANNOT_RETURN_BYTES
+        self.sdr_reads += 1
+        next_id = index + 2 if index + 1 < len(self.sdr) else LAST_RECORD_ID
+        return CC_OK + struct.pack("<H", next_id) + record[offset : offset + length]
+
+    def add_threshold_event(self, record, threshold, value, assertion=True):
+        """Log a threshold crossing of a sensor to the SEL"""
+        names = ("lnc", "lcr", "lnr", "unc", "ucr", "unr")
+        # Lower thresholds are crossed going low, upper ones going high
+        offset = names.index(threshold) * 2 + (0 if threshold.startswith("l") else 1)
+        raw = max(0, min(255, round(value / record.m)))
+        now = int(time.time())
+        entry = struct.pack(
+            "<HBIHBBBBBBB",
+            self.sel_next_id,
+            0x02,
+            now,
+            0x0020,
+            0x04,
+            record.sensor_type,
+            record.number,
+            0x01 | (0 if assertion else 0x80),
+            # Trigger reading in event data 2, the threshold in 3 if the sensor has it
+            0x40 | (0x10 if threshold in record.thresholds else 0) | offset,
+            raw,
+            record.thresholds.get(threshold, 0),
+        )
+        with self.lock:
+            self.sel.append(entry)
+            self.sel_next_id = self.sel_next_id % 0xFFFE + 1
+            self.sel_added = now
+
+    def get_sel_info(self, data):
+        # SEL version 1.5, entries, free space, timestamps, no support flags
+        return CC_OK + struct.pack(
+            "<BHHIIB", 0x51, len(self.sel), 0xFFFF, self.sel_added, self.sel_erased, 0x00
+        )
+
+    def get_sel_entry(self, data):
+        if len(data) != 6:
+            return CC_INVALID_DATA
+        record_id = struct.unpack_from("<H", data, 2)[0]
+        if not self.sel:
+            return CC_NOT_PRESENT
+        if record_id == 0x0000:
+            index = 0
+        elif record_id == LAST_RECORD_ID:
+            index = len(self.sel) - 1
+        else:
+            ids = [struct.unpack_from("<H", entry)[0] for entry in self.sel]
+            if record_id not in ids:
+                return CC_NOT_PRESENT
+            index = ids.index(record_id)
+        self.sel_reads += 1
+        next_id = (
+            struct.unpack_from("<H", self.sel[index + 1])[0]
+            if index + 1 < len(self.sel)
+            else LAST_RECORD_ID
+        )
+        return CC_OK + struct.pack("<H", next_id) + self.sel[index]
+
+    def clear_sel(self, data):
+        # Reservation, "CLR", 0xAA initiates the erase
+        if len(data) != 6 or data[2:5] != b"CLR":
+            return CC_INVALID_DATA
+        self.sel = []
+        self.sel_erased = int(time.time())
+        # Erase completed
+        return CC_OK + b"\x01"
+
+    def sensor_value(self, record):
+        """Current value of a sensor in engineering units"""
+        if record.sensor_type == SENSOR_TYPE_FAN:
+            wear = self.fan_wear.get(record.name, 1.0)
+            return FAN_MAX_RPM * wear * self.duties[self.fan_zones[record.number]] / 100
+        return self.temperatures.get(record.name, 25.0)
+
+    def get_sensor_reading(self, data):
+        for record in self.sensors:
+            if data[:1] == bytes([record.number]):
+                value = self.sensor_value(record)
+                raw = max(0, min(255, round(value / record.m)))
+                # Scanning enabled, no threshold status
+                return CC_OK + bytes([raw, 0x40, 0x00, 0x00])
+        return CC_NOT_PRESENT
+
+    def fan_mode_command(self, data):
+        if data[:1] == b"\x00":
+            return CC_OK + bytes([self.fan_mode])
+        if len(data) == 2 and data[0] == 0x01:
+            self.fan_mode = data[1]
+            if self.fan_mode == FAN_MODE_FULL:
+                self.duties = {zone: 100 for zone in self.duties}
+            return CC_OK
+        return CC_INVALID_DATA
+
+    def fan_duty_command(self, data):
+        if len(data) < 3 or data[0] != FAN_DUTY_SUBCOMMAND:
+            return CC_INVALID_DATA
+        zone = data[2]
+        if zone not in self.duties:
+            return CC_OUT_OF_RANGE
+        if data[1] == 0x00:
+            return CC_OK + bytes([self.duties[zone]])
+        if data[1] == 0x01 and len(data) == 4:
+            if data[3] > 100:
+                return CC_OUT_OF_RANGE
+            self.duties[zone] = data[3]
+            if self.min_duty is None or min(self.duties.values()) >= self.min_duty:
+                self.override_at = None
+            elif self.override_at is None:
+                self.override_at = time.monotonic() + self.override_delay
+            return CC_OK
+        return CC_INVALID_DATA
+
+
+class SimulatedBackend(Backend):
+    """In-process backend talking straight to a SimulatedBMC, no sockets"""
+
+    name = "simulated"
+
+    def __init__(self, bmc=None):
+        super().__init__()
+        self.host = "simulated"
+        self.bmc = bmc or SimulatedBMC()
+
+    def raw(self, request, timeout=None):
+        return check_response(self.bmc.handle_request(request))
+
+
+class FakeIPMIDevice:
+    """Stand-in for the kernel's /dev/ipmi0, answered by a SimulatedBMC
+
+    Pass open and ioctl to OpenIPMIBackend. The device is a pipe that
+    becomes readable when a reply is queued, like the real character
+    device; loss is the fraction of requests that never get a reply.
+    """
+
+    def __init__(self, bmc=None, loss=0.0, seed=None):
+        self.bmc = bmc or SimulatedBMC()
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.replies = collections.deque()
+        self.read_fd = None
+        self.write_fd = None
+        self.lock = threading.Lock()
+
+    def open(self, path, flags):
+        self.read_fd, self.write_fd = os.pipe()
+        return self.read_fd
+
+    def ioctl(self, fd, request, arg, mutate=True):
+        if fd != self.read_fd:
+            raise OSError(errno.EBADF, os.strerror(errno.EBADF))
+        if request == IPMICTL_SEND_COMMAND:
+            return self._send(arg)
+        if request == IPMICTL_RECEIVE_MSG_TRUNC:
+            return self._receive(arg)
+        raise OSError(errno.ENOTTY, os.strerror(errno.ENOTTY))
+
+    def _send(self, req):
+        addr = ctypes.cast(req.addr, ctypes.POINTER(IpmiSystemInterfaceAddr)).contents
+        if addr.addr_type != IPMI_SYSTEM_INTERFACE_ADDR_TYPE:
+            raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+        msg = req.msg
+        data = bytes(msg.data[: msg.data_len])
+        response = self.bmc.handle_request(Request(msg.netfn, msg.cmd, data))
+        if self.loss and self.random.random() < self.loss:
+            return 0
+        with self.lock:
+            self.replies.append((req.msgid, msg.netfn | 1, msg.cmd, response))
+        os.write(self.write_fd, b"\x00")
+        return 0
+
+    def _receive(self, recv):
+        with self.lock:
+            if not self.replies:
+                raise OSError(errno.EAGAIN, os.strerror(errno.EAGAIN))
+            msgid, netfn, command, response = self.replies.popleft()
+        os.read(self.read_fd, 1)
+        recv.recv_type = IPMI_RESPONSE_RECV_TYPE
+        recv.msgid = msgid
+        recv.msg.netfn = netfn
+        recv.msg.cmd = command
+        length = min(len(response), recv.msg.data_len)
+        ctypes.memmove(recv.msg.data, response, length)
+        recv.msg.data_len = length
+        if length < len(response):
+            raise OSError(errno.EMSGSIZE, os.strerror(errno.EMSGSIZE))
+        return 0
+
+    def close(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+
+class SimulatorServer:
+    """Serves any number of simulated BMCs over UDP from one thread
+
+    latency (seconds) delays every reply, loss (0-1) drops that fraction of
+    incoming datagrams.
+    """
+
+    def __init__(self, latency=0.0, loss=0.0, seed=None):
+        self.latency = latency
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.selector = selectors.DefaultSelector()
+        self.endpoints = []
+        self._pending = []
+        self._counter = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, bmc, host="127.0.0.1", port=0):
+        """Bind a BMC to a UDP address, returns the bound (host, port)"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ, bmc)
+        address = sock.getsockname()
+        self.endpoints.append((address, bmc))
+        return address
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="bmc-simulator", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def serve_forever(self):
+        while not self._stop.is_set():
+            timeout = 0.1
+            if self._pending:
+                timeout = max(0.0, min(timeout, self._pending[0][0] - time.monotonic()))
+            for key, _ in self.selector.select(timeout):
+                self._receive(key.fileobj, key.data)
+            now = time.monotonic()
+            while self._pending and self._pending[0][0] <= now:
+                _, _, sock, reply, addr = heapq.heappop(self._pending)
+                self._send(sock, reply, addr)
+
+    def _receive(self, sock, bmc):
+        while True:
+            try:
+                data, addr = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if self.loss and self.random.random() < self.loss:
+                continue
+            reply = bmc.handle_datagram(data)
+            if reply is None:
+                continue
+            if self.latency:
+                self._counter += 1
+                heapq.heappush(
+                    self._pending,
+                    (time.monotonic() + self.latency, self._counter, sock, reply, addr),
+                )
+            else:
+                self._send(sock, reply, addr)
+
+    def _send(self, sock, reply, addr):
+        try:
+            sock.sendto(reply, addr)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Supermicro BMCs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6230, help="first UDP port")
+    parser.add_argument("--count", type=int, default=1, help="number of BMCs")
+    parser.add_argument("--username", default="ADMIN")
+    parser.add_argument("--password", default="ADMIN")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="0-1")
+    parser.add_argument("--session-timeout", type=float, default=60)
+    parser.add_argument("--zones", type=int, default=2, help="fan zones per BMC")
+    parser.add_argument(
+        "--min-duty", type=int, help="duties below this are overridden to 100%%"
+    )
+    parser.add_argument("--override-delay", type=float, default=2.0, help="seconds")
+    parser.add_argument("--inventory", help="write a fleet inventory JSON here")
+    parser.add_argument(
+        "--worn-fans", type=int, default=0, help="BMCs with one fan spinning 25%% slow"
+    )
+    parser.add_argument(
+        "--spread",
+        type=int,
+        default=0,
+        metavar="STEP",
+        help="bind BMC i to --host + i*STEP on --port instead of consecutive ports",
+    )
+    args = parser.parse_args()
+
+    server = SimulatorServer(latency=args.latency, loss=args.loss)
+    hosts = []
+    worn = set(random.Random(0).sample(range(args.count), min(args.worn_fans, args.count)))
+    for i in range(args.count):
+        bmc = SimulatedBMC(
+            args.username,
+            args.password,
+            zones=args.zones,
+            session_timeout=args.session_timeout,
+            min_duty=args.min_duty,
+            override_delay=args.override_delay,
+        )
+        if i in worn:
+            bmc.fan_wear["FAN2"] = 0.75
+        if args.spread:
+            address = str(ipaddress.ip_address(args.host) + i * args.spread)
+            host, port = server.add(bmc, address, args.port)
+        else:
+            host, port = server.add(bmc, args.host, args.port + i if args.port else 0)
+        hosts.append(FleetHost(host, port, args.username, args.password))
+        if args.count <= 16:
+            print(f"BMC {i} listening on {host}:{port}")
+    if args.count > 16:
+        print(f"{args.count} BMCs listening on {args.host}")
+    if args.inventory:
+        save_inventory(args.inventory, hosts)
+        print(f"Inventory written to {args.inventory}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
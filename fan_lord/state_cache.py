@@ -0,0 +1,211 @@
+"""Write elision: skip fan writes that would not change the BMC's state"""
+import threading
+import time
+
+from .backend import Backend
+from .ipmi import (
+    CMD_COLD_RESET,
+    CMD_FAN_DUTY,
+    CMD_FAN_MODE,
+    CMD_WARM_RESET,
+    FAN_DUTY_SUBCOMMAND,
+    NETFN_APP,
+    NETFN_SUPERMICRO,
+    IPMIError,
+)
+
+# Response of a successful fan write, returned for elided writes
+EMPTY = b""
+
+
+def classify(request):
+    """("duty", zone, value), ("mode", None, value) or a read with value None
+
+    Returns None for requests that neither set nor read fan state.
+    """
+    if request.netfn != NETFN_SUPERMICRO:
+        return None
+    data = request.data
+    if request.command == CMD_FAN_DUTY and len(data) >= 3 and data[0] == FAN_DUTY_SUBCOMMAND:
+        if data[1] == 0x01 and len(data) == 4:
+            return "duty", data[2], data[3]
+        if data[1] == 0x00:
+            return "duty", data[2], None
+    if request.command == CMD_FAN_MODE and data[:1] == b"\x01" and len(data) == 2:
+        return "mode", None, data[1]
+    if request.command == CMD_FAN_MODE and data[:1] == b"\x00":
+        return "mode", None, None
+    return None
+
+
+def is_reset(request):
+    return request.netfn == NETFN_APP and request.command in (CMD_COLD_RESET, CMD_WARM_RESET)
+
+
+class StateCache:
+    """Last confirmed fan mode and zone duties per host
+
+    Entries expire after ttl seconds so state changed behind our back (by
+    the BMC or another tool) is eventually re-asserted. hits counts writes
+    that were skipped, misses writes that had to be sent.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        # (host, kind, zone) -> (value, monotonic time confirmed)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, host, kind, zone=None):
+        with self.lock:
+            entry = self.entries.get((host, kind, zone))
+            if entry is None:
+                return None
+            value, confirmed = entry
+            if self.ttl and time.monotonic() - confirmed > self.ttl:
+                del self.entries[(host, kind, zone)]
+                return None
+            return value
+
+    def set(self, host, kind, zone, value):
+        with self.lock:
+            self.entries[(host, kind, zone)] = (value, time.monotonic())
+
+    def discard(self, host, kind, zone=None):
+        with self.lock:
+            self.entries.pop((host, kind, zone), None)
+
+    def invalidate(self, host=None, kind=None):
+        """Forget everything known about a host (or all hosts)"""
+        with self.lock:
+            for key in list(self.entries):
+                if (host is None or key[0] == host) and (kind is None or key[1] == kind):
+                    del self.entries[key]
+            self.invalidations += 1
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+            }
+
+
+class CachingBackend(Backend):
+    """Wraps a backend and answers redundant fan writes from a StateCache
+
+    A duty or mode write whose value the cache already holds returns at
+    once without a BMC transaction. Successful writes and read-backs update
+    the cache, failed writes drop the entry, a mode change drops the zone
+    duties (the BMC applies its own), and a new session on a backend that
+    already had one, or a BMC reset command, drops the whole host since the
+    BMC may have rebooted.
+    """
+
+    def __init__(self, backend, cache):
+        super().__init__()
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+        self.host = backend.host
+        self.exclusive = getattr(backend, "exclusive", True)
+        # Several BMCs can share an address behind port forwarding
+        port = getattr(backend, "port", None)
+        self.key = backend.host if port is None else f"{backend.host}:{port}"
+        self.sessions = getattr(backend, "sessions_opened", None)
+
+    def __getattr__(self, name):
+        # exe_path, sessions_opened, ... of the wrapped backend
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def raw(self, request, timeout=None):
+        state = classify(request)
+        if state is not None and state[2] is not None:
+            kind, zone, value = state
+            if self.cache.get(self.key, kind, zone) == value:
+                self.cache.record(True)
+                return EMPTY
+            self.cache.record(False)
+        try:
+            response = self.backend.raw(request, timeout)
+        except IPMIError:
+            self._check_session()
+            if state is not None:
+                self.cache.discard(self.key, state[0], state[1])
+            raise
+        self._check_session()
+        self._update(request, state, response)
+        return response
+
+    def raw_many(self, requests, timeout=None):
+        results = [None] * len(requests)
+        send = []
+        for index, request in enumerate(requests):
+            state = classify(request)
+            if state is not None and state[2] is not None:
+                kind, zone, value = state
+                if self.cache.get(self.key, kind, zone) == value:
+                    self.cache.record(True)
+                    results[index] = EMPTY
+                    continue
+                self.cache.record(False)
+            send.append(index)
+        if not send:
+            return results
+        responses = self.backend.raw_many([requests[i] for i in send], timeout)
+        self._check_session()
+        for index, response in zip(send, responses):
+            results[index] = response
+            state = classify(requests[index])
+            if isinstance(response, IPMIError):
+                if state is not None:
+                    self.cache.discard(self.key, state[0], state[1])
+            else:
+                self._update(requests[index], state, response)
+        return results
+
+    def _update(self, request, state, response):
+        if is_reset(request):
+            self.cache.invalidate(self.key)
+            return
+        if state is None:
+            return
+        kind, zone, value = state
+        if value is None:
+            # Read-back, the BMC's answer replaces whatever we assumed
+            if response:
+                self.cache.set(self.key, kind, zone, response[0])
+            else:
+                self.cache.discard(self.key, kind, zone)
+            return
+        if kind == "mode":
+            self.cache.invalidate(self.key, "duty")
+        self.cache.set(self.key, kind, zone, value)
+
+    def _check_session(self):
+        sessions = getattr(self.backend, "sessions_opened", None)
+        if sessions is None:
+            return
+        if self.sessions and sessions != self.sessions:
+            # Had to log in again, the BMC may have been reset
+            self.cache.invalidate(self.key)
+        self.sessions = sessions
+
+    def close(self):
+        self.backend.close()
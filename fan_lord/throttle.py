@@ -0,0 +1,67 @@
+"""Rate limiting for streams of fan targets"""
+import threading
+import time
+
+_NOTHING = object()
+
+
+class Throttle:
+    """Forwards at most `rate` values per second to send(), last value wins
+
+    Values arriving faster are held back; a timer sends the newest one as
+    soon as the interval allows, so the final value is never lost. flush()
+    sends a value immediately regardless of the rate.
+    """
+
+    def __init__(self, send, rate=4):
+        self.send = send
+        self.interval = 1.0 / rate
+        self.last_sent = float("-inf")
+        self.last_value = _NOTHING
+        self.pending = _NOTHING
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def update(self, value):
+        """Offer a new value"""
+        with self.lock:
+            self.pending = value
+            wait = self.last_sent + self.interval - time.monotonic()
+            if wait <= 0:
+                self._send_pending()
+            elif self.timer is None:
+                self.timer = threading.Timer(wait, self._on_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self, value):
+        """Send value now, dropping anything still held back"""
+        with self.lock:
+            self._cancel_timer()
+            self.pending = value
+            self._send_pending(force=True)
+
+    def cancel(self):
+        """Drop any held value"""
+        with self.lock:
+            self._cancel_timer()
+            self.pending = _NOTHING
+
+    def _on_timer(self):
+        with self.lock:
+            self.timer = None
+            if self.pending is not _NOTHING:
+                self._send_pending()
+
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _send_pending(self, force=False):
+        value, self.pending = self.pending, _NOTHING
+        if value is _NOTHING or (value == self.last_value and not force):
+            return
+        self.last_sent = time.monotonic()
+        self.last_value = value
+        self.send(value)
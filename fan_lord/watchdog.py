@@ -0,0 +1,205 @@
+"""Detects the BMC overriding zone duties and re-asserts or raises them"""
+import json
+import os
+import threading
+import time
+import traceback
+
+from .config import get_data_dir
+from .ipmi import IPMIError, get_device_id_request, get_duty_request, get_fan_mode_request
+
+OVERRIDE = "override"
+FLOOR_RAISED = "floor_raised"
+
+
+class WatchdogEvent:
+    """Something the watchdog noticed or did"""
+
+    def __init__(self, kind, zone, target, actual=None, mode=None):
+        self.kind = kind
+        self.zone = zone
+        self.target = target
+        self.actual = actual
+        self.mode = mode
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"<WatchdogEvent {self.kind} zone={self.zone} target={self.target} actual={self.actual}>"
+
+
+class DutyFloors:
+    """Lowest duty each board model keeps, learned per zone and saved as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), "duty-floors.json")
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.floors = json.load(f)
+        except (OSError, ValueError):
+            self.floors = {}
+
+    def get(self, board, zone):
+        with self.lock:
+            return self.floors.get(board, {}).get(str(zone))
+
+    def raise_floor(self, board, zone, duty):
+        with self.lock:
+            zones = self.floors.setdefault(board, {})
+            if duty <= zones.get(str(zone), 0):
+                return
+            zones[str(zone)] = duty
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.floors, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+
+
+class ZoneTarget:
+    def __init__(self, duty, interval):
+        self.duty = duty
+        self.overrides = 0
+        self.backoff = interval
+        self.next_attempt = 0.0
+
+
+class DutyWatchdog:
+    """Reads back zone duties and the fan mode every interval
+
+    When a zone no longer has the duty we set, the BMC overrode it: the
+    target is written again, with exponential backoff between attempts;
+    checks during the backoff neither count nor report anything. Once the
+    same target was re-written more than `retries` times and the BMC keeps
+    falling back to a higher duty, the board evidently won't hold it, so
+    the zone floor is raised by floor_step and remembered in DutyFloors
+    for that board model. set_target() applies the
+    learned floor to every later write.
+    """
+
+    def __init__(
+        self,
+        backend,
+        write,
+        floors=None,
+        interval=3.0,
+        retries=2,
+        floor_step=5,
+        max_backoff=60.0,
+        callback=None,
+    ):
+        self.backend = backend
+        self.write = write
+        self.floors = floors or DutyFloors()
+        self.interval = interval
+        self.retries = retries
+        self.floor_step = floor_step
+        self.max_backoff = max_backoff
+        self.listeners = [callback] if callback else []
+        self.board = None
+        self.targets = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Call callback(event) for every WatchdogEvent"""
+        self.listeners.append(callback)
+
+    def floor(self, zone):
+        if self.board is None:
+            return None
+        return self.floors.get(self.board, zone)
+
+    def set_target(self, zone, duty):
+        """Watch a zone at duty, returns the duty raised to the learned floor"""
+        floor = self.floor(zone)
+        if floor is not None and duty < floor:
+            duty = floor
+        with self.lock:
+            self.targets[zone] = ZoneTarget(duty, self.interval)
+        return duty
+
+    def clear(self):
+        """Stop watching, e.g. after handing the fans back to the BMC"""
+        with self.lock:
+            self.targets = {}
+
+    def identify(self):
+        """Board model key from Get Device ID (manufacturer and product)"""
+        device = self.backend.raw(get_device_id_request())
+        manufacturer = device[6] | device[7] << 8 | device[8] << 16
+        product = device[9] | device[10] << 8
+        self.board = f"{manufacturer:06x}-{product:04x}"
+        return self.board
+
+    def check_once(self):
+        """Read back all watched zones, returns the events raised"""
+        if self.board is None:
+            self.identify()
+        with self.lock:
+            zones = list(self.targets)
+        if not zones:
+            return []
+        responses = self.backend.raw_many(
+            [get_duty_request(zone) for zone in zones] + [get_fan_mode_request()]
+        )
+        mode = responses[-1]
+        mode = None if isinstance(mode, IPMIError) or not mode else mode[0]
+        events = []
+        now = time.monotonic()
+        for zone, response in zip(zones, responses):
+            if isinstance(response, IPMIError) or not response:
+                continue
+            with self.lock:
+                target = self.targets.get(zone)
+                if target is None or response[0] == target.duty:
+                    continue
+                if now < target.next_attempt:
+                    # Re-applied already, still backing off
+                    continue
+                target.overrides += 1
+                events.append(WatchdogEvent(OVERRIDE, zone, target.duty, response[0], mode))
+                if target.overrides > self.retries and target.duty < response[0]:
+                    # The board won't hold this duty and falls back to a higher
+                    # one, try a higher floor. The BMC resets every zone at
+                    # once, zones already above its fallback are not to blame
+                    target.duty = min(100, target.duty + self.floor_step)
+                    target.overrides = 0
+                    target.backoff = self.interval
+                    self.floors.raise_floor(self.board, zone, target.duty)
+                    events.append(WatchdogEvent(FLOOR_RAISED, zone, target.duty, response[0], mode))
+                target.next_attempt = now + target.backoff
+                target.backoff = min(self.max_backoff, target.backoff * 2)
+                duty = target.duty
+            self.write(zone, duty)
+        for event in events:
+            for listener in list(self.listeners):
+                try:
+                    listener(event)
+                except Exception:
+                    traceback.print_exc()
+        return events
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="duty-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        try:
+            self.identify()
+        except IPMIError:
+            pass
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_once()
+            except IPMIError:
+                # The sensor poller and executor report connection problems
+                pass
@@ -1,7 +1,6 @@
 import sys
 import os
 import ctypes
-import subprocess
 from datetime import datetime
 import locale
 from PyQt6.QtWidgets import (
@@ -14,19 +13,36 @@ from PyQt6.QtWidgets import (
     QPushButton,
     QFrame,
     QSlider,
-    QTextEdit,
+    QCheckBox,
     QMenuBar,
     QMenu,
     QMessageBox,
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QColor, QAction, QActionGroup
+from PyQt6.QtCore import Qt, QSize, QObject, pyqtSignal
+from PyQt6.QtGui import QIcon, QAction, QActionGroup
+
+from fan_lord import ipmi
+from fan_lord.config import load_config
+from fan_lord.core import FanControl
+from fan_lord.executor import CommandCancelled
+from fan_lord.gui.dashboard import DashboardDialog
+from fan_lord.gui.fleet_dialog import FleetDialog
+from fan_lord.gui.history_chart import HistoryChart
+from fan_lord.gui.log_view import LogView
+from fan_lord.gui.sensor_panel import SensorPanel
+from fan_lord.presets import preset_duties
+from fan_lord.resilience import CLOSED, OPEN, CircuitOpen, breaker_registry
+from fan_lord.watchdog import FLOOR_RAISED
+from fan_lord.throttle import Throttle
 
 VERSION = "v0.1.3"
 
 
 # Keep original helper functions
 def is_admin():
+    if sys.platform != "win32":
+        # No UAC, access to /dev/ipmi0 is checked when it is opened
+        return True
     try:
         return ctypes.windll.shell32.IsUserAnAdmin()
     except:
@@ -59,6 +75,7 @@ class CustomSlider(QWidget):
         self.slider = QSlider(Qt.Orientation.Horizontal)
         self.slider.setRange(0, 100)
         self.slider.valueChanged.connect(self.update_progress)
+        self.slider.valueChanged.connect(self.on_value_changed)
         self.slider.sliderReleased.connect(self.on_slider_released)
 
         layout.addWidget(self.progress_bar)
@@ -67,6 +84,8 @@ class CustomSlider(QWidget):
 
         # Add variable to store last value
         self.last_value = 0
+        # In live mode values are also emitted while dragging
+        self.live = False
 
     def update_progress(self, value):
         threshold = 30
@@ -79,16 +98,36 @@ class CustomSlider(QWidget):
     def value(self):
         return self.slider.value()
 
+    def on_value_changed(self, value):
+        """Triggered on every move, only emitted in live mode while dragging"""
+        if self.live and self.slider.isSliderDown():
+            if hasattr(self, "value_changed_live"):
+                self.value_changed_live(value)
+
     def on_slider_released(self):
         """Triggered when slider is released"""
         current_value = self.slider.value()
-        if current_value != self.last_value:
+        # Live mode always emits, the release carries the final trailing write
+        if current_value != self.last_value or self.live:
             self.last_value = current_value
             # Emit custom signal
             if hasattr(self, "value_changed_on_release"):
                 self.value_changed_on_release(current_value)
 
 
+class CommandSignals(QObject):
+    """Carries executor results from the worker thread to the GUI thread"""
+
+    finished = pyqtSignal(object)
+    # {zone: duty} written by the temperature curve
+    duties_changed = pyqtSignal(object)
+    watchdog_event = pyqtSignal(object)
+    breaker_changed = pyqtSignal(object)
+    capabilities_found = pyqtSignal(object)
+    # Fan and temperature events read from the BMC's event log
+    sel_events = pyqtSignal(object)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -101,6 +140,10 @@ class MainWindow(QMainWindow):
         # Initialize IPMI tool path
         self.init_ipmi_tool()
         self.init_ui()
+        # Start reading fan and temperature sensors
+        self.init_sensors()
+        self.discover_board()
+        self.init_events()
 
     def get_icon_path(self):
         """Get icon path"""
@@ -123,12 +166,45 @@ class MainWindow(QMainWindow):
                 "silent_mode": "静音模式",
                 "performance_mode": "性能模式",
                 "full_speed_mode": "全速模式",
+                "auto_curve": "温控曲线",
                 "manual_control": "手动控制",
                 "cpu_fan_speed": "CPU风扇转速",
                 "peripheral_fan_speed": "外设风扇转速",
+                "zone_fan_speed": "区域 {zone} 风扇转速",
+                "board_zones": "主板固件 {firmware}，风扇区域: {zones}",
+                "sel_event": "BMC 事件日志: {event}",
                 "warning_text": "注意：如果数值小于30%，BMC可能会自动重置风扇转速为全速",
                 "reset_auto": "重置为自动控制",
+                "live_control": "实时调节 (拖动时即时生效)",
+                "fleet_menu": "集群",
+                "fleet_apply": "批量应用到集群...",
+                "fleet_title": "集群风扇控制",
+                "load_inventory": "加载主机清单...",
+                "hosts_loaded": "已加载 {count} 台主机",
+                "apply": "应用",
+                "cancel": "取消",
+                "host": "主机",
+                "latency": "耗时",
+                "result": "结果",
+                "fleet_summary": "完成：{ok} 台成功，{failed} 台失败，p95 耗时 {p95} ms",
+                "dashboard_open": "集群看板...",
+                "dashboard_title": "集群看板",
+                "model_column": "型号",
+                "fan_mode": "风扇模式",
+                "hottest": "最高温度",
+                "last_seen": "更新时间",
+                "last_error": "最近错误",
+                "filter_hosts": "筛选主机、型号或错误...",
+                "errors_only": "仅显示出错主机",
+                "hosts_selected": "已选择 {count} 台主机",
+                "apply_selected": "应用到所选主机",
                 "status_info": "状态信息",
+                "sensors": "传感器",
+                "duty_override": "BMC 将区域 {zone} 的风扇从 {target}% 改为 {actual}%，正在重新应用",
+                "duty_floor_raised": "区域 {zone} 无法保持更低的转速，最低值提高到 {target}%",
+                "bmc_unreachable": "BMC {host} 无响应，暂停发送命令 {seconds} 秒",
+                "bmc_reachable": "BMC {host} 已恢复响应",
+                "history": "历史趋势",
                 "created_by": "Created by: ",
                 "this_is_a": " | This is a ",
                 "project": " opensource project",
@@ -144,12 +220,45 @@ class MainWindow(QMainWindow):
                 "silent_mode": "Silent Mode",
                 "performance_mode": "Performance Mode",
                 "full_speed_mode": "Full Speed Mode",
+                "auto_curve": "Temperature Curve",
                 "manual_control": "Manual Control",
                 "cpu_fan_speed": "CPU Fan Speed",
                 "peripheral_fan_speed": "Peripheral Fan Speed",
+                "zone_fan_speed": "Zone {zone} Fan Speed",
+                "board_zones": "Board firmware {firmware}, fan zones: {zones}",
+                "sel_event": "BMC event log: {event}",
                 "warning_text": "Note: If the value is less than 30%, BMC may automatically reset fan speed to full speed",
                 "reset_auto": "Reset to Auto Control",
+                "live_control": "Live control (apply while dragging)",
+                "fleet_menu": "Fleet",
+                "fleet_apply": "Apply to Fleet...",
+                "fleet_title": "Fleet Fan Control",
+                "load_inventory": "Load Inventory...",
+                "hosts_loaded": "{count} hosts loaded",
+                "apply": "Apply",
+                "cancel": "Cancel",
+                "host": "Host",
+                "latency": "Latency",
+                "result": "Result",
+                "fleet_summary": "Done: {ok} succeeded, {failed} failed, p95 latency {p95} ms",
+                "dashboard_open": "Fleet Dashboard...",
+                "dashboard_title": "Fleet Dashboard",
+                "model_column": "Model",
+                "fan_mode": "Fan Mode",
+                "hottest": "Hottest",
+                "last_seen": "Updated",
+                "last_error": "Last Error",
+                "filter_hosts": "Filter by host, model or error...",
+                "errors_only": "Errors only",
+                "hosts_selected": "{count} hosts selected",
+                "apply_selected": "Apply to Selected",
                 "status_info": "Status Information",
+                "sensors": "Sensors",
+                "duty_override": "BMC changed zone {zone} fans from {target}% to {actual}%, re-applying",
+                "duty_floor_raised": "Zone {zone} won't hold a lower duty, minimum raised to {target}%",
+                "bmc_unreachable": "BMC {host} is not responding, pausing commands for {seconds}s",
+                "bmc_reachable": "BMC {host} is responding again",
+                "history": "History",
                 "created_by": "Created by: ",
                 "this_is_a": " | This is a ",
                 "project": " opensource project",
@@ -165,12 +274,45 @@ class MainWindow(QMainWindow):
                 "silent_mode": "サイレントモード",
                 "performance_mode": "パフォーマンスモード",
                 "full_speed_mode": "フルスピードモード",
+                "auto_curve": "温度カーブ",
                 "manual_control": "手動制御",
                 "cpu_fan_speed": "CPUファン速度",
                 "peripheral_fan_speed": "周辺機器ファン速度",
+                "zone_fan_speed": "ゾーン {zone} ファン速度",
+                "board_zones": "ボードファームウェア {firmware}、ファンゾーン: {zones}",
+                "sel_event": "BMC イベントログ: {event}",
                 "warning_text": "注意：値が30%未満の場合、BMCが自動的にファン速度をフルスピードにリセットする可能性があります",
                 "reset_auto": "自動制御にリセット",
+                "live_control": "ライブ制御（ドラッグ中に即時反映）",
+                "fleet_menu": "フリート",
+                "fleet_apply": "フリートに適用...",
+                "fleet_title": "フリートファン制御",
+                "load_inventory": "インベントリを読み込む...",
+                "hosts_loaded": "{count} 台のホストを読み込みました",
+                "apply": "適用",
+                "cancel": "キャンセル",
+                "host": "ホスト",
+                "latency": "レイテンシ",
+                "result": "結果",
+                "fleet_summary": "完了：成功 {ok} 台、失敗 {failed} 台、p95 レイテンシ {p95} ms",
+                "dashboard_open": "フリートダッシュボード...",
+                "dashboard_title": "フリートダッシュボード",
+                "model_column": "モデル",
+                "fan_mode": "ファンモード",
+                "hottest": "最高温度",
+                "last_seen": "更新時刻",
+                "last_error": "最新エラー",
+                "filter_hosts": "ホスト、モデル、エラーで絞り込み...",
+                "errors_only": "エラーのみ",
+                "hosts_selected": "{count} 台のホストを選択中",
+                "apply_selected": "選択したホストに適用",
                 "status_info": "ステータス情報",
+                "sensors": "センサー",
+                "duty_override": "BMCがゾーン {zone} のファンを {target}% から {actual}% に変更しました。再適用します",
+                "duty_floor_raised": "ゾーン {zone} はこれより低いデューティを保持できないため、最小値を {target}% に引き上げました",
+                "bmc_unreachable": "BMC {host} が応答しません。{seconds} 秒間コマンドの送信を停止します",
+                "bmc_reachable": "BMC {host} が再び応答しています",
+                "history": "履歴",
                 "created_by": "作成者: ",
                 "this_is_a": " | これは ",
                 "project": " オープンソースプロジェクトです",
@@ -214,6 +356,9 @@ class MainWindow(QMainWindow):
 
         # Update menu bar - use class attributes directly
         self.language_menu.setTitle(lang["language_menu"])
+        self.fleet_menu.setTitle(lang["fleet_menu"])
+        self.fleet_action.setText(lang["fleet_apply"])
+        self.dashboard_action.setText(lang["dashboard_open"])
 
         # Update preset modes area
         preset_frame = self.findChild(QFrame, "preset_frame")
@@ -228,6 +373,7 @@ class MainWindow(QMainWindow):
             preset_frame.findChild(QPushButton, "full_speed_btn").setText(
                 lang["full_speed_mode"]
             )
+            self.curve_btn.setText(lang["auto_curve"])
 
         # Update manual control area
         manual_frame = self.findChild(QFrame, "manual_frame")
@@ -235,14 +381,19 @@ class MainWindow(QMainWindow):
             manual_frame.findChild(QLabel, "manual_title").setText(
                 lang["manual_control"]
             )
-            manual_frame.findChild(QLabel, "cpu_label").setText(lang["cpu_fan_speed"])
-            manual_frame.findChild(QLabel, "peripheral_label").setText(
-                lang["peripheral_fan_speed"]
-            )
+            for zone, (_, label, _) in self.zone_sliders.items():
+                label.setText(self.zone_label(zone))
             manual_frame.findChild(QLabel, "warning_label").setText(
                 lang["warning_text"]
             )
             manual_frame.findChild(QPushButton, "reset_btn").setText(lang["reset_auto"])
+            manual_frame.findChild(QCheckBox, "live_checkbox").setText(
+                lang["live_control"]
+            )
+
+        # Update sensor area
+        self.sensor_panel.set_title(lang["sensors"])
+        self.history_chart.set_title(lang["history"])
 
         # Update status information area
         status_frame = self.findChild(QFrame, "status_frame")
@@ -250,54 +401,136 @@ class MainWindow(QMainWindow):
             status_frame.findChild(QLabel, "status_title").setText(lang["status_info"])
 
     def init_ipmi_tool(self):
-        """Initialize IPMI tool path"""
-        if getattr(sys, "frozen", False):
-            # If running as executable
-            base_path = sys._MEIPASS
-        else:
-            # If running as Python script
-            base_path = os.path.dirname(os.path.abspath(__file__))
-
-        self.ipmi_exe = os.path.join(base_path, "IPMICFG-Win.exe")
+        """Initialize IPMI backend"""
+        self.config = load_config()
+        # Run commands on a worker thread, results come back through a signal
+        self.command_signals = CommandSignals()
+        self.command_signals.finished.connect(self.on_command_finished)
+        self.command_signals.duties_changed.connect(self.show_duties)
+        try:
+            self.fan_control = FanControl(
+                self.config, callback=self.command_signals.finished.emit
+            )
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", f"Invalid IPMI backend configuration: {e}")
+            sys.exit(1)
+        self.fan_control.add_curve_listener(self.command_signals.duties_changed.emit)
+        # Notice when the BMC overrides a duty we set
+        self.command_signals.watchdog_event.connect(self.on_watchdog_event)
+        self.fan_control.start_watchdog(self.command_signals.watchdog_event.emit)
+        # One status line when the BMC stops answering and one when it is back
+        self.command_signals.breaker_changed.connect(self.on_breaker_changed)
+        self.fan_control.breaker.add_listener(self.command_signals.breaker_changed.emit)
+        # Fleet hosts that stopped answering stay skipped between dialogs
+        self.fleet_breakers = breaker_registry(self.config["resilience"])
 
         # Check if IPMI tool exists
-        if not os.path.exists(self.ipmi_exe):
+        backend = self.fan_control.backend
+        if backend.name == "ipmicfg" and not os.path.exists(backend.exe_path):
             QMessageBox.critical(
-                self, "Error", f"IPMICFG-Win.exe not found at: {self.ipmi_exe}"
+                self, "Error", f"IPMICFG-Win.exe not found at: {backend.exe_path}"
             )
             sys.exit(1)
 
-    def execute_command(self, command):
-        """Execute IPMI command and update status"""
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
+    def init_sensors(self):
+        """Poll sensors in the background, readings are pushed to the sensor panel"""
         try:
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            if result.returncode == 0:
-                self.update_status(
-                    f"[{current_time}] Execute command: {command}\nCommand executed successfully!\n",
-                    "success",
-                )
-            else:
-                self.update_status(
-                    f"[{current_time}] Execute command: {command}\nCommand execution failed:\n{result.stderr}\n",
-                    "error",
-                )
-        except Exception as e:
+            self.fan_control.start_metrics()
+        except ValueError as e:
+            # Another Fan Lord already serves the port, control works without it
+            self.update_status(str(e), "error")
+        poller = self.fan_control.start_sensors(
+            callback=self.sensor_panel.readings_received.emit,
+            error_callback=self.sensor_panel.error_received.emit,
+        )
+        if poller is None:
+            self.sensor_panel.hide()
+            self.history_chart.hide()
+            # The curve needs temperatures
+            self.curve_btn.setEnabled(False)
+            return
+        self.history_chart.set_history(self.fan_control.history)
+
+    def init_events(self):
+        """Report fan and temperature events the BMC logs"""
+        self.command_signals.sel_events.connect(self.on_sel_events)
+        self.fan_control.start_events(self.command_signals.sel_events.emit)
+
+    def on_sel_events(self, events):
+        """Show new event log entries, assertions as errors"""
+        lang = self.languages[self.current_language]
+        for event in events:
+            current_time = datetime.fromtimestamp(event.timestamp).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            message = lang["sel_event"].format(event=event.description)
+            self.update_status(
+                f"[{current_time}] {message}", "error" if event.assertion else "success"
+            )
+
+    def execute_command(self, request, key=None):
+        """Queue IPMI command, commands sharing a key replace each other while queued"""
+        return self.fan_control.submit(request, key=key)
+
+    def on_command_finished(self, result):
+        """Update status with the result of an executed command"""
+        current_time = datetime.fromtimestamp(result.submitted).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        request = result.request
+
+        if result.ok:
+            self.update_status(
+                f"[{current_time}] Execute command: {request}\nCommand executed successfully!\n",
+                "success",
+            )
+        elif isinstance(result.error, (CommandCancelled, CircuitOpen)):
+            # Not sent; an open breaker is reported once by on_breaker_changed
+            return
+        elif isinstance(result.error, ipmi.IPMIError):
             self.update_status(
-                f"[{current_time}] Execute command: {command}\nError executing command:\n{str(e)}\n",
+                f"[{current_time}] Execute command: {request}\nCommand execution failed:\n{str(result.error)}\n",
                 "error",
             )
+        else:
+            self.update_status(
+                f"[{current_time}] Execute command: {request}\nError executing command:\n{str(result.error)}\n",
+                "error",
+            )
+
+    def on_watchdog_event(self, event):
+        """Report BMC overrides and move the slider when a zone floor was raised"""
+        lang = self.languages[self.current_language]
+        current_time = datetime.fromtimestamp(event.timestamp).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        if event.kind == FLOOR_RAISED:
+            message = lang["duty_floor_raised"]
+            self.show_duties({event.zone: event.target})
+        else:
+            message = lang["duty_override"]
+        self.update_status(
+            f"[{current_time}] "
+            + message.format(zone=event.zone, target=event.target, actual=event.actual),
+            "error",
+        )
+
+    def on_breaker_changed(self, breaker):
+        """Report when the BMC stops or resumes answering"""
+        lang = self.languages[self.current_language]
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if breaker.state == OPEN:
+            message = lang["bmc_unreachable"].format(
+                host=breaker.name, seconds=f"{breaker.reset_timeout:g}"
+            )
+            self.update_status(f"[{current_time}] {message}", "error")
+        elif breaker.state == CLOSED:
+            message = lang["bmc_reachable"].format(host=breaker.name)
+            self.update_status(f"[{current_time}] {message}", "success")
 
     def update_status(self, message, status_type):
         """Update status information display"""
-        color = "red" if status_type == "error" else "green"
-        self.status_text.setTextColor(QColor(color))
-        self.status_text.append(message)
-        # Scroll to bottom
-        self.status_text.verticalScrollBar().setValue(
-            self.status_text.verticalScrollBar().maximum()
-        )
+        self.status_text.append(message, "error" if status_type == "error" else "success")
 
     def init_ui(self):
         # Set window basic properties
@@ -318,6 +551,9 @@ class MainWindow(QMainWindow):
         # Create manual control area
         self.create_manual_control()
 
+        # Create sensor readings area
+        self.create_sensor_area()
+
         # Create status information area
         self.create_status_area()
 
@@ -345,6 +581,21 @@ class MainWindow(QMainWindow):
                 action.setChecked(True)
             action.triggered.connect(lambda checked, l=lang: self.change_language(l))
 
+        # Create fleet menu
+        self.fleet_menu = QMenu(self.languages[self.current_language]["fleet_menu"], self)
+        self.fleet_menu.setObjectName("fleet_menu")
+        menubar.addMenu(self.fleet_menu)
+        self.fleet_action = QAction(
+            self.languages[self.current_language]["fleet_apply"], self
+        )
+        self.fleet_action.triggered.connect(self.open_fleet_dialog)
+        self.fleet_menu.addAction(self.fleet_action)
+        self.dashboard_action = QAction(
+            self.languages[self.current_language]["dashboard_open"], self
+        )
+        self.dashboard_action.triggered.connect(self.open_dashboard)
+        self.fleet_menu.addAction(self.dashboard_action)
+
     def create_preset_modes(self):
         # Create preset modes frame
         preset_frame = QFrame()
@@ -378,10 +629,17 @@ class MainWindow(QMainWindow):
         performance_btn.clicked.connect(self.performance_mode)
         full_speed_btn.clicked.connect(self.full_speed_mode)
 
+        # Closed-loop control, follows the temperature curve on every sensor poll
+        self.curve_btn = QPushButton(self.languages[self.current_language]["auto_curve"])
+        self.curve_btn.setObjectName("curve_btn")
+        self.curve_btn.setCheckable(True)
+        self.curve_btn.toggled.connect(self.set_curve_control)
+
         # Add buttons to layout
         button_layout.addWidget(silent_btn)
         button_layout.addWidget(performance_btn)
         button_layout.addWidget(full_speed_btn)
+        button_layout.addWidget(self.curve_btn)
         button_layout.addStretch()
 
         preset_layout.addLayout(button_layout)
@@ -400,39 +658,17 @@ class MainWindow(QMainWindow):
         title.setStyleSheet("font-weight: bold;")
         manual_layout.addWidget(title)
 
-        # CPU fan control
-        cpu_control_layout = QHBoxLayout()
-        cpu_label = QLabel(self.languages[self.current_language]["cpu_fan_speed"])
-        cpu_label.setObjectName("cpu_label")
-        self.cpu_percentage = QLabel("0%")  # Add percentage label
-        cpu_control_layout.addWidget(cpu_label)
-        cpu_control_layout.addWidget(self.cpu_percentage)
-        cpu_control_layout.addStretch()
-
-        self.cpu_slider = CustomSlider()
-        self.cpu_slider.value_changed_on_release = self.on_cpu_slider_release
-        self.cpu_slider.slider.valueChanged.connect(
-            lambda value: self.cpu_percentage.setText(f"{value}%")
-        )
+        # One slider per fan zone, rebuilt once the board's zones are discovered
+        self.zone_layout = QVBoxLayout()
+        self.zone_sliders = {}
+        self.zone_throttles = {}
+        self.live_control = False
 
-        # Peripheral fan control
-        peripheral_control_layout = QHBoxLayout()
-        peripheral_label = QLabel(
-            self.languages[self.current_language]["peripheral_fan_speed"]
-        )
-        peripheral_label.setObjectName("peripheral_label")
-        self.peripheral_percentage = QLabel("0%")  # Add percentage label
-        peripheral_control_layout.addWidget(peripheral_label)
-        peripheral_control_layout.addWidget(self.peripheral_percentage)
-        peripheral_control_layout.addStretch()
-
-        self.peripheral_slider = CustomSlider()
-        self.peripheral_slider.value_changed_on_release = (
-            self.on_peripheral_slider_release
-        )
-        self.peripheral_slider.slider.valueChanged.connect(
-            lambda value: self.peripheral_percentage.setText(f"{value}%")
-        )
+        # Live control, writes are rate limited per zone while dragging
+        live_checkbox = QCheckBox(self.languages[self.current_language]["live_control"])
+        live_checkbox.setObjectName("live_checkbox")
+        live_checkbox.toggled.connect(self.set_live_control)
+        self.build_zone_sliders(self.fan_control.capabilities.zones)
 
         # Warning text
         warning_label = QLabel(self.languages[self.current_language]["warning_text"])
@@ -446,15 +682,84 @@ class MainWindow(QMainWindow):
         reset_btn.clicked.connect(self.reset_fan_control)
 
         # Add components to layout
-        manual_layout.addLayout(cpu_control_layout)
-        manual_layout.addWidget(self.cpu_slider)
-        manual_layout.addLayout(peripheral_control_layout)
-        manual_layout.addWidget(self.peripheral_slider)
+        manual_layout.addLayout(self.zone_layout)
+        manual_layout.addWidget(live_checkbox)
         manual_layout.addWidget(warning_label)
         manual_layout.addWidget(reset_btn)
 
         self.centralWidget().layout().addWidget(manual_frame)
 
+    def zone_label(self, zone):
+        lang = self.languages[self.current_language]
+        if zone == ipmi.CPU_ZONE:
+            return lang["cpu_fan_speed"]
+        if zone == ipmi.PERIPHERAL_ZONE:
+            return lang["peripheral_fan_speed"]
+        return lang["zone_fan_speed"].format(zone=zone)
+
+    def build_zone_sliders(self, zones):
+        """One label and slider per fan zone of the board"""
+        for zone, (widget, _, _) in self.zone_sliders.items():
+            self.zone_throttles.pop(zone).cancel()
+            self.zone_layout.removeWidget(widget)
+            widget.deleteLater()
+        self.zone_sliders = {}
+        for zone in zones:
+            widget = QWidget()
+            zone_layout = QVBoxLayout(widget)
+            zone_layout.setContentsMargins(0, 0, 0, 0)
+            label_layout = QHBoxLayout()
+            label = QLabel(self.zone_label(zone))
+            percentage = QLabel("0%")
+            label_layout.addWidget(label)
+            label_layout.addWidget(percentage)
+            label_layout.addStretch()
+
+            slider = CustomSlider()
+            slider.live = self.live_control
+            slider.value_changed_on_release = lambda value, zone=zone: self.on_slider_release(
+                zone, value
+            )
+            slider.value_changed_live = lambda value, zone=zone: self.on_slider_live(zone, value)
+            slider.slider.valueChanged.connect(
+                lambda value, percentage=percentage: percentage.setText(f"{value}%")
+            )
+            zone_layout.addLayout(label_layout)
+            zone_layout.addWidget(slider)
+            self.zone_layout.addWidget(widget)
+            self.zone_sliders[zone] = (widget, label, slider)
+            self.zone_throttles[zone] = Throttle(
+                lambda duty, zone=zone: self.set_zone_duty(zone, duty),
+                rate=self.config["live_rate"],
+            )
+
+    def discover_board(self):
+        """Look up the board's fan zones in the background, the sliders follow"""
+        self.command_signals.capabilities_found.connect(self.on_capabilities_found)
+        self.fan_control.discover(self.command_signals.capabilities_found.emit)
+
+    def on_capabilities_found(self, capabilities):
+        """Rebuild the sliders when the board has other zones than shown"""
+        if capabilities.zones == tuple(self.zone_sliders):
+            return
+        self.build_zone_sliders(capabilities.zones)
+        lang = self.languages[self.current_language]
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        message = lang["board_zones"].format(
+            firmware=capabilities.firmware,
+            zones=", ".join(str(zone) for zone in capabilities.zones),
+        )
+        self.update_status(f"[{current_time}] {message}", "success")
+
+    def create_sensor_area(self):
+        self.sensor_panel = SensorPanel(self.languages[self.current_language]["sensors"])
+        self.centralWidget().layout().addWidget(self.sensor_panel)
+        self.history_chart = HistoryChart(
+            self.languages[self.current_language]["history"],
+            refresh_interval=self.config["sensor_interval"] or 5.0,
+        )
+        self.centralWidget().layout().addWidget(self.history_chart)
+
     def create_status_area(self):
         # Create status information frame
         status_frame = QFrame()
@@ -468,9 +773,8 @@ class MainWindow(QMainWindow):
         title.setStyleSheet("font-weight: bold;")
         status_layout.addWidget(title)
 
-        # Status text box
-        self.status_text = QTextEdit()
-        self.status_text.setReadOnly(True)
+        # Status log, keeps the last status_log_lines entries
+        self.status_text = LogView(self.config["status_log_lines"])
         status_layout.addWidget(self.status_text)
 
         self.centralWidget().layout().addWidget(status_frame)
@@ -507,51 +811,90 @@ class MainWindow(QMainWindow):
 
         self.centralWidget().layout().addWidget(footer_frame)
 
+    def open_fleet_dialog(self):
+        """Apply presets to many BMCs at once"""
+        dialog = FleetDialog(
+            self.languages[self.current_language],
+            self.config,
+            self,
+            state_cache=self.fan_control.state_cache,
+            breakers=self.fleet_breakers,
+        )
+        dialog.exec()
+
+    def open_dashboard(self):
+        """Live status of every fleet host, with presets for selected hosts"""
+        dialog = DashboardDialog(
+            self.languages[self.current_language],
+            self.config,
+            self,
+            state_cache=self.fan_control.state_cache,
+            breakers=self.fleet_breakers,
+        )
+        dialog.exec()
+
+    def apply_preset(self, name):
+        """Queue the zone writes of a preset and move the sliders to match"""
+        self.curve_btn.setChecked(False)
+        self.fan_control.apply_preset(name)
+        # Update slider positions
+        self.show_duties(preset_duties(name, self.fan_control.capabilities.zones))
+
+    def set_zone_duty(self, zone, duty):
+        """Queue a duty cycle write, replacing any queued write to the same zone"""
+        self.fan_control.set_duty(zone, duty)
+
+    def set_curve_control(self, enabled):
+        """Start or stop following the temperature curve"""
+        self.fan_control.set_curve(enabled)
+
+    def show_duties(self, duties):
+        """Move the sliders to duties set by a preset, the temperature curve or the watchdog"""
+        for zone, duty in duties.items():
+            if zone in self.zone_sliders:
+                self.zone_sliders[zone][2].slider.setValue(duty)
+
     # Implement control function slots
     def silent_mode(self):
         """Silent mode: Set CPU and peripheral fans to 40% speed"""
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x00 0x28')
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x01 0x28')
-        # Update slider positions
-        self.cpu_slider.slider.setValue(40)
-        self.peripheral_slider.slider.setValue(40)
+        self.apply_preset("silent")
 
     def performance_mode(self):
         """Performance mode: CPU fan 50%, peripheral fan 100%"""
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x00 0x32')
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x01 0x64')
-        # Update slider positions
-        self.cpu_slider.slider.setValue(50)
-        self.peripheral_slider.slider.setValue(100)
+        self.apply_preset("performance")
 
     def full_speed_mode(self):
         """Full speed mode: All fans 100%"""
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x00 0x64')
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x01 0x64')
-        # Update slider positions
-        self.cpu_slider.slider.setValue(100)
-        self.peripheral_slider.slider.setValue(100)
-
-    def on_cpu_slider_release(self, value):
-        """CPU fan speed control - only triggered when slider is released"""
-        cpu_value = format(value, "x").zfill(2)
-        self.execute_command(
-            f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x00 0x{cpu_value}'
-        )
+        self.apply_preset("full_speed")
 
-    def on_peripheral_slider_release(self, value):
-        """Peripheral fan speed control - only triggered when slider is released"""
-        peripheral_value = format(value, "x").zfill(2)
-        self.execute_command(
-            f'"{self.ipmi_exe}" -raw 0x30 0x70 0x66 0x01 0x01 0x{peripheral_value}'
-        )
+    def set_live_control(self, enabled):
+        """Toggle streaming slider values while dragging"""
+        self.live_control = enabled
+        for _, _, slider in self.zone_sliders.values():
+            slider.live = enabled
+
+    def on_slider_release(self, zone, value):
+        """Fan speed control of a zone - only triggered when slider is released"""
+        self.curve_btn.setChecked(False)
+        self.zone_throttles[zone].flush(value)
+
+    def on_slider_live(self, zone, value):
+        """Fan speed control of a zone while dragging in live mode"""
+        self.curve_btn.setChecked(False)
+        self.zone_throttles[zone].update(value)
 
     def reset_fan_control(self):
         """Reset to automatic control mode"""
-        self.execute_command(f'"{self.ipmi_exe}" -raw 0x30 0x45 0x01 0x01')
+        self.curve_btn.setChecked(False)
+        self.fan_control.auto()
         # Reset slider positions
-        self.cpu_slider.slider.setValue(0)
-        self.peripheral_slider.slider.setValue(0)
+        for _, _, slider in self.zone_sliders.values():
+            slider.slider.setValue(0)
+
+    def closeEvent(self, event):
+        """Release the BMC session when the window closes"""
+        self.fan_control.close()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
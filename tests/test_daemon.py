@@ -0,0 +1,90 @@
+"""Daemon clients writing the same fan zone"""
+import copy
+import threading
+import time
+
+import pytest
+
+from fan_lord.config import DEFAULT_CONFIG
+from fan_lord.core import FanControl
+from fan_lord.executor import CommandCancelled
+from fan_lord.ipmi import get_duty_request
+from fan_lord.resilience import CLOSED
+from fan_lord.simulator import SimulatedBackend
+from fan_lord.state_cache import classify
+
+
+class GatedBackend(SimulatedBackend):
+    """Holds the first duty write until released, so later ones queue up"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def raw(self, request, timeout=None):
+        kind = classify(request)
+        if kind is not None and kind[0] == "duty" and kind[2] is not None:
+            self.writes.append(kind[2])
+            self.entered.set()
+            self.gate.wait(5)
+        return super().raw(request, timeout)
+
+
+def quiet_config():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["command_log"]["enabled"] = False
+    config["sensor_interval"] = 0
+    config["sel"]["interval"] = 0
+    config["watchdog"]["interval"] = 0
+    config["state_cache_ttl"] = 0
+    return config
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    from fan_lord.daemon import DaemonServer
+
+    monkeypatch.setenv("FAN_LORD_HOME", str(tmp_path))
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    backend = GatedBackend()
+    fan_control = FanControl(quiet_config(), backend=backend)
+    server = DaemonServer(fan_control, str(tmp_path / "fan-lord.sock")).start()
+    yield server, backend
+    backend.gate.set()
+    server.stop()
+    fan_control.close()
+
+
+def client(server):
+    config = quiet_config()
+    config["backend"] = "daemon"
+    config["daemon_address"] = server.address
+    return FanControl(config)
+
+
+def test_superseded_write_is_neither_retried_nor_a_breaker_failure(daemon):
+    server, backend = daemon
+    first, second = client(server), client(server)
+    try:
+        # Occupy the daemon's executor so the clients' writes queue behind it
+        server.fan_control.set_duty(0, 30)
+        assert backend.entered.wait(5)
+        stale = first.set_duty(0, 40)
+        while server.fan_control.executor.queue_depth() < 1:
+            time.sleep(0.01)
+        newest = second.set_duty(0, 50)
+        while not stale.done():
+            time.sleep(0.01)
+        backend.gate.set()
+
+        assert newest.wait(5).ok
+        assert isinstance(stale.wait(5).error, CommandCancelled)
+        assert backend.writes == [30, 50]
+        assert backend.raw(get_duty_request(0))[0] == 50
+        assert first.breaker.state == CLOSED
+        assert first.breaker.failures == 0
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,41 @@
+"""Merging discovered BMCs into existing inventories"""
+import json
+
+from fan_lord.discovery import Responder, merge_inventory
+from fan_lord.fleet import load_inventory
+
+FOUND = [Responder("10.0.0.1", 623, 0.01), Responder("10.0.0.2", 623, 0.01), Responder("10.0.0.3", 6230, 0.01)]
+CLI_DEFAULTS = {"username": "ADMIN", "password": "cli-secret"}
+
+
+def test_text_inventory_gets_lines_appended(tmp_path):
+    path = tmp_path / "hosts.txt"
+    path.write_text("# rack 1\n10.0.0.1", encoding="utf-8")
+    assert merge_inventory(str(path), FOUND, CLI_DEFAULTS) == 2
+    assert path.read_text(encoding="utf-8") == "# rack 1\n10.0.0.1\n10.0.0.2\n10.0.0.3:6230\n"
+    assert merge_inventory(str(path), FOUND, CLI_DEFAULTS) == 0
+
+
+def test_json_inventory_keeps_defaults_and_entries(tmp_path):
+    path = tmp_path / "hosts.json"
+    original = {
+        "defaults": {"username": "ops", "password": "rack-secret"},
+        "hosts": ["10.0.0.1", {"host": "10.0.0.9", "name": "db", "model": "X11"}],
+    }
+    path.write_text(json.dumps(original), encoding="utf-8")
+    assert merge_inventory(str(path), FOUND, CLI_DEFAULTS) == 2
+
+    document = json.loads(path.read_text(encoding="utf-8"))
+    assert document["defaults"] == original["defaults"]
+    assert document["hosts"][:2] == original["hosts"]
+    assert document["hosts"][2:] == [{"host": "10.0.0.2", "port": 623}, {"host": "10.0.0.3", "port": 6230}]
+    # The new hosts take the file's credentials, not the command line's
+    hosts = load_inventory(str(path))
+    assert {(h.username, h.password) for h in hosts} == {("ops", "rack-secret")}
+
+
+def test_new_json_inventory_uses_the_given_defaults(tmp_path):
+    path = tmp_path / "hosts.json"
+    assert merge_inventory(str(path), FOUND[:1], CLI_DEFAULTS) == 1
+    [host] = load_inventory(str(path))
+    assert (host.host, host.username, host.password) == ("10.0.0.1", "ADMIN", "cli-secret")
@@ -0,0 +1,27 @@
+"""Fan health on two-zone boards with several lettered fans"""
+from fan_lord.fan_health import FanSamples, fan_zone
+from fan_lord.ipmi import CPU_ZONE, PERIPHERAL_ZONE
+
+
+def test_lettered_fans_are_on_the_peripheral_zone():
+    assert fan_zone("FAN1") == CPU_ZONE
+    assert fan_zone("FANA") == PERIPHERAL_ZONE
+    assert fan_zone("FANB") == PERIPHERAL_ZONE
+
+
+def test_worn_fanb_is_found():
+    samples = FanSamples(10)
+    for cycle in range(10):
+        duties = {CPU_ZONE: 40 + cycle, PERIPHERAL_ZONE: 60 - cycle}
+        hosts = {}
+        for h in range(5):
+            wear = 0.6 if h == 2 else 1.0
+            rpms = {
+                "FAN1": 20.0 * duties[CPU_ZONE],
+                "FAN2": 20.0 * duties[CPU_ZONE],
+                "FANA": 30.0 * duties[PERIPHERAL_ZONE],
+                "FANB": 30.0 * duties[PERIPHERAL_ZONE] * wear,
+            }
+            hosts[f"host{h}"] = ("X11SPL", rpms, duties)
+        samples.add_cycle(hosts)
+    assert [(s.host, s.fan) for s in samples.analyze()] == [("host2", "FANB")]
@@ -0,0 +1,23 @@
+"""Fleet presets on boards with different fan zones"""
+from fan_lord.fleet import FleetHost, FleetRunner
+from fan_lord.simulator import SimulatedBMC, SimulatorServer
+
+
+def test_preset_covers_the_zones_of_each_host(tmp_path):
+    small = SimulatedBMC(zones=2)
+    large = SimulatedBMC(zones=4)
+    with SimulatorServer() as server:
+        hosts = [
+            FleetHost(*server.add(bmc), username="ADMIN", password="ADMIN")
+            for bmc in (small, large)
+        ]
+        runner = FleetRunner(hosts, capability_dir=str(tmp_path))
+        for preset in ("performance", "silent"):
+            results = runner.apply_preset(preset)
+            assert all(r.ok for r in results), results
+
+    assert small.duties == {0: 40, 1: 40}
+    # The extra zones take the peripheral duty, as in the GUI
+    assert large.duties == {0: 40, 1: 40, 2: 40, 3: 40}
+    # The zones were probed once per host and cached
+    assert len(list(tmp_path.glob("host-*.json"))) == 2
@@ -0,0 +1,50 @@
+"""The metrics endpoint is only served by long-running modes"""
+import copy
+import socket
+import urllib.request
+
+import pytest
+
+from fan_lord.config import DEFAULT_CONFIG
+from fan_lord.core import FanControl
+from fan_lord.simulator import SimulatedBackend
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def metrics_config(port):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["command_log"]["enabled"] = False
+    config["sensor_interval"] = 0
+    config["watchdog"]["interval"] = 0
+    config["metrics"]["port"] = port
+    return config
+
+
+def test_one_shot_commands_work_while_another_process_serves_metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAN_LORD_HOME", str(tmp_path))
+    config = metrics_config(free_port())
+    daemon = FanControl(config, backend=SimulatedBackend())
+    try:
+        server = daemon.start_metrics()
+        assert server is not None
+        # Like `fan-lord set` next to the daemon: constructing must not bind the port
+        command = FanControl(config, backend=SimulatedBackend())
+        try:
+            assert command.metrics_server is None
+            assert command.set_duty(0, 40).wait(5).ok
+            with pytest.raises(ValueError, match="Cannot serve metrics"):
+                command.start_metrics()
+        finally:
+            command.close()
+
+        assert daemon.set_duty(0, 50).wait(5).ok
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+        assert "fan_lord_" in body
+    finally:
+        daemon.close()
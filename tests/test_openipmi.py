@@ -0,0 +1,102 @@
+"""The in-band backend against a fake /dev/ipmi0"""
+import os
+
+import pytest
+
+from fan_lord.ipmi import IPMIError, IPMITimeout, Request, get_duty_request, set_duty_request
+from fan_lord.openipmi import OpenIPMIBackend
+from fan_lord.simulator import FakeIPMIDevice, SimulatedBMC
+
+
+class ScriptedDevice(FakeIPMIDevice):
+    """Lets a test reverse, hold back or inject the replies the driver queues"""
+
+    def __init__(self, bmc):
+        super().__init__(bmc)
+        self.reverse = False
+        self.holding = False
+        self.held = []
+
+    def _send(self, req):
+        super()._send(req)
+        with self.lock:
+            reply = self.replies.pop()
+            if self.holding:
+                self.held.append(reply)
+            elif self.reverse:
+                self.replies.appendleft(reply)
+            else:
+                self.replies.append(reply)
+        if self.holding:
+            os.read(self.read_fd, 1)
+        return 0
+
+    def deliver(self, replies):
+        with self.lock:
+            self.replies.extend(replies)
+        os.write(self.write_fd, b"\x00" * len(replies))
+
+
+@pytest.fixture
+def bmc():
+    bmc = SimulatedBMC(zones=2)
+    bmc.duties.update({0: 30, 1: 70})
+    return bmc
+
+
+@pytest.fixture
+def device(bmc):
+    device = ScriptedDevice(bmc)
+    yield device
+    device.close()
+
+
+@pytest.fixture
+def backend(device):
+    backend = OpenIPMIBackend("/dev/ipmi0", timeout=1.0, open_device=device.open, ioctl=device.ioctl)
+    yield backend
+    backend.close()
+
+
+def test_round_trip(bmc, backend):
+    assert backend.raw(set_duty_request(0, 45)) == b""
+    assert bmc.duties[0] == 45
+    assert backend.raw(get_duty_request(0)) == bytes([45])
+
+
+def test_raw_many_matches_replies_by_message_id(device, backend):
+    device.reverse = True
+    responses = backend.raw_many([get_duty_request(0), get_duty_request(1)])
+    assert responses == [bytes([30]), bytes([70])]
+
+
+def test_late_and_unsolicited_messages_are_dropped(device, backend):
+    device.holding = True
+    with pytest.raises(IPMITimeout):
+        backend.raw(get_duty_request(0), timeout=0.05)
+    device.holding = False
+    # The reply to the timed-out request, then one nobody asked for
+    late = device.held.pop()
+    device.deliver([late, (999, 0x31, 0x70, b"\x00\x63")])
+    assert backend.raw(get_duty_request(1)) == bytes([70])
+    assert not device.replies
+
+
+def test_completion_code_raises(backend):
+    with pytest.raises(IPMIError) as excinfo:
+        backend.raw(Request(0x30, 0x99, b""))
+    assert not isinstance(excinfo.value, IPMITimeout)
+    assert excinfo.value.completion_code == 0xC1
+
+
+def test_lost_reply_times_out(bmc):
+    device = FakeIPMIDevice(bmc, loss=1.0)
+    backend = OpenIPMIBackend("/dev/ipmi0", open_device=device.open, ioctl=device.ioctl)
+    try:
+        with pytest.raises(IPMITimeout):
+            backend.raw(get_duty_request(0), timeout=0.05)
+        responses = backend.raw_many([get_duty_request(0), get_duty_request(1)], 0.05)
+        assert all(isinstance(r, IPMITimeout) for r in responses)
+    finally:
+        backend.close()
+        device.close()
@@ -0,0 +1,31 @@
+"""SEL entries logged by the simulated BMC"""
+import time
+
+from fan_lord.ipmi import set_duty_request
+from fan_lord.sel import parse_entry
+from fan_lord.simulator import SimulatedBackend, SimulatedBMC
+
+
+def override(duty):
+    bmc = SimulatedBMC(min_duty=30, override_delay=0)
+    backend = SimulatedBackend(bmc)
+    backend.raw(set_duty_request(0, duty))
+    time.sleep(0.01)
+    # Any request lets the BMC notice the expired override delay
+    backend.raw(set_duty_request(1, 50))
+    assert bmc.overrides == 1
+    records = {r.number: r for r in bmc.sensors}
+    return [parse_entry(entry, records) for entry in bmc.sel]
+
+
+def test_override_logs_fans_below_their_lower_critical_threshold():
+    events = override(10)
+    assert {e.name for e in events} == {"FAN1", "FAN2", "FAN3", "FAN4"}
+    for event in events:
+        assert event.threshold_name == "lcr"
+        assert event.reading < event.threshold
+
+
+def test_override_of_fans_above_the_threshold_logs_nothing():
+    # 20% is below min_duty but still spins the fans at 500 RPM, above 300
+    assert override(20) == []
@@ -0,0 +1,68 @@
+"""Override detection and floor learning of the duty watchdog"""
+from fan_lord import watchdog
+from fan_lord.backend import Backend
+from fan_lord.state_cache import classify
+from fan_lord.watchdog import FLOOR_RAISED, OVERRIDE, DutyFloors, DutyWatchdog
+
+
+class FallbackBMC(Backend):
+    """Answers duty and mode reads from a dict, writes are recorded by the test"""
+
+    def __init__(self, duties):
+        super().__init__()
+        self.host = "fake"
+        self.duties = duties
+
+    def raw(self, request, timeout=None):
+        kind = classify(request)
+        if kind is None:
+            # Get Device ID
+            return bytes(6) + bytes([0x7C, 0x2A, 0x00, 0x34, 0x12])
+        if kind[0] == "mode":
+            return bytes([0x01])
+        return bytes([self.duties[kind[1]]])
+
+
+def make_watchdog(tmp_path, monkeypatch, duties, retries=2):
+    clock = [1000.0]
+    monkeypatch.setattr(watchdog.time, "monotonic", lambda: clock[0])
+    backend = FallbackBMC(duties)
+    writes = []
+    dog = DutyWatchdog(
+        backend,
+        lambda zone, duty: writes.append((zone, duty)),
+        DutyFloors(str(tmp_path / "floors.json")),
+        interval=3.0,
+        retries=retries,
+    )
+    return dog, clock, writes
+
+
+def test_checks_during_backoff_neither_count_nor_report(tmp_path, monkeypatch):
+    dog, clock, writes = make_watchdog(tmp_path, monkeypatch, {0: 100})
+    dog.set_target(0, 30)
+    assert [e.kind for e in dog.check_once()] == [OVERRIDE]
+    for _ in range(5):
+        # Well inside the 3 s backoff
+        clock[0] += 0.5
+        assert dog.check_once() == []
+    assert writes == [(0, 30)]
+    assert dog.targets[0].overrides == 1
+    assert dog.floor(0) is None
+
+
+def test_floor_rises_only_for_zones_below_the_fallback(tmp_path, monkeypatch):
+    # The BMC forced zone 0 up to 100 and the whole board to 100; zone 1 was
+    # set lower by someone else and is not to blame
+    dog, clock, writes = make_watchdog(tmp_path, monkeypatch, {0: 100, 1: 20}, retries=1)
+    dog.set_target(0, 30)
+    dog.set_target(1, 60)
+    kinds = []
+    for _ in range(2):
+        kinds += [(e.kind, e.zone) for e in dog.check_once()]
+        clock[0] += 60
+    assert (FLOOR_RAISED, 0) in kinds
+    assert (FLOOR_RAISED, 1) not in kinds
+    assert dog.floor(0) == 35
+    assert dog.floor(1) is None
+    assert writes[-2:] == [(0, 35), (1, 60)]